@@ -1,17 +1,30 @@
 #!/usr/bin/env python3
 """
 ML Threshold Adjustment Utility
-Allows easy adjustment of ML fallback threshold for production tuning
+Allows easy adjustment of ML fallback threshold for production tuning.
+Sweeps parse each corpus email twice (rules only, ML forced) and then evaluate any
+number of thresholds as a vectorized pass over those recorded outcomes
 """
 
 import json
 import logging
 import argparse
+import os
+import random
+import time
+import urllib.request
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
 from email_parser import IpruAIEmailParser
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+OUTCOME_CACHE_DIR = 'cache/threshold_outcomes'
+
 def get_current_threshold():
     """Get current ML fallback threshold"""
     try:
@@ -49,6 +62,18 @@ def set_threshold(new_threshold: float):
         logger.error(f"Error updating threshold: {e}")
         return False
 
+def notify_reload(base_url: str) -> bool:
+    """Ask a running API to hot-reload its configs (POST /admin/reload)"""
+    try:
+        request = urllib.request.Request(f"{base_url.rstrip('/')}/admin/reload", method='POST')
+        with urllib.request.urlopen(request, timeout=120) as response:
+            result = json.loads(response.read())
+        logger.info(f"API reloaded: {result}")
+        return True
+    except Exception as e:
+        logger.error(f"Reload request to {base_url} failed: {e}")
+        return False
+
 def test_threshold(threshold: float, test_cases: list = None):
     """Test the parser with a specific threshold"""
     if test_cases is None:
@@ -60,48 +85,214 @@ def test_threshold(threshold: float, test_cases: list = None):
             "all statements required"  # Ambiguous case
         ]
     
-    # Temporarily set threshold
-    original_threshold = get_current_threshold()
-    set_threshold(threshold)
+    # The threshold is passed per call, so the config file is left alone
+    parser = IpruAIEmailParser()
     
-    try:
-        # Test with new threshold
-        parser = IpruAIEmailParser()
-        
-        logger.info(f"\nTesting with ML fallback threshold: {threshold}")
-        logger.info("=" * 60)
-        
-        ml_fallback_count = 0
+    logger.info(f"\nTesting with ML fallback threshold: {threshold}")
+    logger.info("=" * 60)
+    
+    ml_fallback_count = 0
+    
+    for i, text in enumerate(test_cases, 1):
+        logger.info(f"\nTest {i}: {text}")
+        result = parser.parse_email(text, ml_threshold=threshold)
         
-        for i, text in enumerate(test_cases, 1):
-            logger.info(f"\nTest {i}: {text}")
-            result = parser.parse_email(text)
-            
-            confidence = result['confidence']
-            method = result['metadata']['parsing_method']
-            ml_used = result['metadata']['ml_fallback_used']
-            
-            if ml_used:
-                ml_fallback_count += 1
-            
-            logger.info(f"  Confidence: {confidence:.2f}")
-            logger.info(f"  Method: {method}")
-            logger.info(f"  ML Fallback: {'Yes' if ml_used else 'No'}")
-            logger.info(f"  Statements: {result['statement_types']}")
+        confidence = result['confidence']
+        method = result['metadata']['parsing_method']
+        ml_used = result['metadata']['ml_fallback_used']
         
-        logger.info(f"\nSummary: {ml_fallback_count}/{len(test_cases)} cases used ML fallback")
+        if ml_used:
+            ml_fallback_count += 1
         
-    finally:
-        # Restore original threshold
-        if original_threshold is not None:
-            set_threshold(original_threshold)
+        logger.info(f"  Confidence: {confidence:.2f}")
+        logger.info(f"  Method: {method}")
+        logger.info(f"  ML Fallback: {'Yes' if ml_used else 'No'}")
+        logger.info(f"  Statements: {result['statement_types']}")
+    
+    logger.info(f"\nSummary: {ml_fallback_count}/{len(test_cases)} cases used ML fallback")
+
+class ThresholdSweep:
+    """Per-email rule-based confidence and rule-only / ML-enhanced outcomes, recorded once"""
+
+    def __init__(self, parser: Optional[IpruAIEmailParser] = None):
+        self.parser = parser or IpruAIEmailParser()
+        self.outcomes: Dict[str, np.ndarray] = {}
+        self.source = None
+
+    def _cache_path(self, corpus_path: str) -> Optional[str]:
+        from build_corpora import load_corpus_meta
+        meta = load_corpus_meta(corpus_path)
+        if not meta.get("sha256"):
+            return None
+        name = f"{meta['sha256'][:16]}_{meta.get('reference_date')}_{self.parser.version}.npz"
+        return os.path.join(OUTCOME_CACHE_DIR, name)
+
+    def record(self, test_cases: List[Dict[str, Any]], reference_date=None) -> Dict[str, np.ndarray]:
+        """Parse every case with ML disabled and with ML forced; whether a threshold sends a case
+        to ML only depends on its rule-based confidence, so these two outcomes cover every threshold
+
+        Relative dates resolve against `reference_date`, the day the cases' expectations were computed for.
+        """
+        from comprehensive_stress_test import analyze_result
+
+        if self.parser.ml_model is None:
+            logger.warning("⚠️  No ML model loaded: ML-enhanced outcomes equal the rule-based ones")
+        rule_confidence, rule_pass, ml_pass, rule_ms, ml_ms, ml_enhanced = [], [], [], [], [], []
+        started = time.perf_counter()
+
+        for i, case in enumerate(test_cases, 1):
+            text = case["input_text"]
+            t0 = time.perf_counter()
+            rule_result = self.parser.parse_email(text, ml_threshold=float('-inf'), reference_date=reference_date)
+            t1 = time.perf_counter()
+            ml_result = self.parser.parse_email(text, ml_threshold=float('inf'), reference_date=reference_date)
+            t2 = time.perf_counter()
+
+            rule_confidence.append(rule_result["metadata"]["rule_confidence"])
+            rule_pass.append(analyze_result(case, rule_result)["overall_pass"])
+            ml_pass.append(analyze_result(case, ml_result)["overall_pass"])
+            ml_enhanced.append(ml_result["metadata"]["ml_enhanced"])
+            rule_ms.append((t1 - t0) * 1000)
+            ml_ms.append((t2 - t1) * 1000)
+            if i % 500 == 0:
+                logger.info(f"  recorded {i:,} emails ({i / (time.perf_counter() - started):.1f}/s)")
+
+        self.outcomes = {
+            "rule_confidence": np.array(rule_confidence, dtype=np.float64),
+            "rule_pass": np.array(rule_pass, dtype=bool),
+            "ml_pass": np.array(ml_pass, dtype=bool),
+            "ml_enhanced": np.array(ml_enhanced, dtype=bool),
+            "rule_ms": np.array(rule_ms, dtype=np.float64),
+            "ml_ms": np.array(ml_ms, dtype=np.float64)
+        }
+        logger.info(f"✅ Recorded outcomes for {len(rule_confidence):,} emails in "
+                    f"{time.perf_counter() - started:.1f}s")
+        return self.outcomes
+
+    def record_corpus(self, corpus_path: str, limit: Optional[int] = None, use_cache: bool = True):
+        """Record outcomes for a seeded corpus, reusing them while the corpus and parser version match"""
+        from build_corpora import iter_corpus, load_corpus_meta
+
+        self.source = corpus_path
+        cache_path = self._cache_path(corpus_path) if use_cache and limit is None else None
+        if cache_path and os.path.exists(cache_path):
+            with np.load(cache_path) as cached:
+                self.outcomes = {key: cached[key] for key in cached.files}
+            logger.info(f"♻️  Loaded recorded outcomes from {cache_path}")
+            return self.outcomes
+
+        self.record(list(iter_corpus(corpus_path, limit)), load_corpus_meta(corpus_path).get("reference_date"))
+        if cache_path:
+            os.makedirs(OUTCOME_CACHE_DIR, exist_ok=True)
+            tmp_path = cache_path[:-len(".npz")] + ".tmp.npz"
+            np.savez(tmp_path, **self.outcomes)
+            os.replace(tmp_path, cache_path)
+        return self.outcomes
+
+    def record_generated(self, size: int, seed: int = 42):
+        """Record outcomes for freshly generated real-life cases (no corpus file)"""
+        from comprehensive_stress_test import ComprehensiveStressTest
+
+        self.source = f"generated:{size}:seed{seed}"
+        today = date.today()
+        cases = ComprehensiveStressTest().generate_real_life_test_cases(size, rng=random.Random(seed), today=today)
+        return self.record(cases, today)
+
+    def evaluate(self, thresholds) -> Dict[str, np.ndarray]:
+        """Fallback rate, accuracy and latency for every threshold at once (thresholds x emails)"""
+        thresholds = np.asarray(thresholds, dtype=np.float64)
+        o = self.outcomes
+        uses_ml = o["rule_confidence"][None, :] < thresholds[:, None]
+        # Same rule: ML runs when rule-based confidence < threshold
+        passed = np.where(uses_ml, o["ml_pass"][None, :], o["rule_pass"][None, :])
+        latency = np.where(uses_ml, o["ml_ms"][None, :], o["rule_ms"][None, :])
+        return {
+            "threshold": thresholds,
+            "fallback_rate": uses_ml.mean(axis=1),
+            "ml_enhanced_rate": (uses_ml & o["ml_enhanced"][None, :]).mean(axis=1),
+            "accuracy": passed.mean(axis=1),
+            "expected_latency_ms": latency.mean(axis=1),
+            "p99_latency_ms": np.percentile(latency, 99, axis=1)
+        }
+
+    @staticmethod
+    def best_threshold(curves: Dict[str, np.ndarray], latency_budget_ms: Optional[float] = None) -> Optional[int]:
+        """Index of the most accurate threshold (within the latency budget), preferring less ML on ties"""
+        candidates = np.arange(len(curves["threshold"]))
+        if latency_budget_ms is not None:
+            candidates = candidates[curves["expected_latency_ms"] <= latency_budget_ms]
+        if len(candidates) == 0:
+            return None
+        order = np.lexsort((curves["fallback_rate"][candidates], -curves["accuracy"][candidates]))
+        return int(candidates[order[0]])
+
+    def report(self, curves: Dict[str, np.ndarray], best: Optional[int] = None, output: Optional[str] = None) -> str:
+        logger.info(f"\n{'Threshold':>9} {'Fallback':>9} {'Accuracy':>9} {'Mean ms':>9} {'p99 ms':>9}")
+        for i, threshold in enumerate(curves["threshold"]):
+            marker = "  <- best" if i == best else ""
+            logger.info(f"{threshold:>9.1f} {curves['fallback_rate'][i]:>9.2%} {curves['accuracy'][i]:>9.2%} "
+                        f"{curves['expected_latency_ms'][i]:>9.2f} {curves['p99_latency_ms'][i]:>9.2f}{marker}")
+
+        if not output:
+            output = f"benchmarks/threshold_sweep_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+        with open(output, 'w') as f:
+            json.dump({
+                "source": self.source,
+                "parser_version": self.parser.version,
+                "emails": int(len(self.outcomes["rule_confidence"])),
+                "best_threshold": float(curves["threshold"][best]) if best is not None else None,
+                "curves": [{key: float(values[i]) for key, values in curves.items()}
+                           for i in range(len(curves["threshold"]))],
+                "created_at": datetime.now().isoformat()
+            }, f, indent=2)
+        logger.info(f"💾 Sweep written to {output}")
+        return output
+
+def run_sweep(args) -> Optional[float]:
+    """Record outcomes once, evaluate the requested threshold grid and report; returns the best threshold"""
+    # Two parses per email would otherwise log every ML enhancement
+    logging.getLogger('IpruAI.Parser').setLevel(logging.WARNING)
+    sweep = ThresholdSweep()
+    if args.corpus:
+        sweep.record_corpus(args.corpus, limit=args.size, use_cache=not args.no_cache)
+    else:
+        sweep.record_generated(args.size or 1000, seed=args.seed)
+
+    if args.thresholds:
+        thresholds = args.thresholds
+    else:
+        production = sweep.parser.model_config.get('production', {})
+        thresholds = np.arange(production.get('min_threshold', 30.0),
+                               production.get('max_threshold', 80.0) + args.step / 2, args.step)
+
+    started = time.perf_counter()
+    curves = sweep.evaluate(thresholds)
+    best = sweep.best_threshold(curves, args.latency_budget_ms)
+    logger.info(f"⚡ Evaluated {len(curves['threshold'])} thresholds in {(time.perf_counter() - started) * 1000:.1f} ms")
+    sweep.report(curves, best, args.output)
+
+    if best is None:
+        logger.warning(f"No threshold meets the {args.latency_budget_ms} ms latency budget")
+        return None
+    return float(curves["threshold"][best])
 
 def main():
     parser = argparse.ArgumentParser(description='Adjust ML fallback threshold')
     parser.add_argument('--get', action='store_true', help='Get current threshold')
     parser.add_argument('--set', type=float, help='Set new threshold (30-80)')
     parser.add_argument('--test', type=float, help='Test with specific threshold')
-    parser.add_argument('--optimize', action='store_true', help='Find optimal threshold')
+    parser.add_argument('--sweep', action='store_true', help='Fallback rate / accuracy / latency curves over thresholds')
+    parser.add_argument('--optimize', action='store_true', help='Find optimal threshold (runs a sweep)')
+    parser.add_argument('--corpus', help='Seeded corpus to sweep over (see build_corpora.py)')
+    parser.add_argument('--size', type=int, help='Emails to use (generated cases when no --corpus; default 1000)')
+    parser.add_argument('--seed', type=int, default=42, help='Seed for generated cases')
+    parser.add_argument('--thresholds', type=float, nargs='+', help='Explicit thresholds (default production range)')
+    parser.add_argument('--step', type=float, default=1.0, help='Threshold grid step')
+    parser.add_argument('--latency-budget-ms', type=float, help='Only consider thresholds within this mean latency')
+    parser.add_argument('--no-cache', action='store_true', help='Re-parse the corpus even if outcomes are cached')
+    parser.add_argument('--output', help='Sweep JSON path (default benchmarks/threshold_sweep_<timestamp>.json)')
+    parser.add_argument('--reload-url', help='After --set, hot-reload a running API, e.g. http://localhost:5000')
     
     args = parser.parse_args()
     
@@ -115,67 +306,24 @@ def main():
     elif args.set:
         if set_threshold(args.set):
             print(f"Threshold set to {args.set}")
+            if args.reload_url:
+                notify_reload(args.reload_url)
         else:
             print("Failed to set threshold")
     
     elif args.test:
         test_threshold(args.test)
     
+    elif args.sweep:
+        run_sweep(args)
+    
     elif args.optimize:
         logger.info("Finding optimal threshold...")
+        best_threshold = run_sweep(args)
+        if best_threshold is None:
+            return
         
-        test_cases = [
-            "send statement",
-            "Please send PMS statement for PAN ABCDE1234F",
-            "I need portfolio appraisal for DI D0131848 as on 31-Mar-2024",
-            "AIF report needed",
-            "all statements required",
-            "pls send soa",
-            "I need report for account 12345678",
-            "Please provide AIF statement for folio 6700000071"
-        ]
-        
-        best_threshold = 60.0
-        best_score = 0
-        
-        for threshold in range(40, 81, 5):  # Test thresholds from 40 to 80
-            logger.info(f"\nTesting threshold: {threshold}")
-            
-            # Set threshold temporarily
-            original_threshold = get_current_threshold()
-            set_threshold(threshold)
-            
-            try:
-                parser = IpruAIEmailParser()
-                total_confidence = 0
-                ml_usage = 0
-                
-                for text in test_cases:
-                    result = parser.parse_email(text)
-                    total_confidence += result['confidence']
-                    if result['metadata']['ml_fallback_used']:
-                        ml_usage += 1
-                
-                avg_confidence = total_confidence / len(test_cases)
-                ml_usage_rate = ml_usage / len(test_cases)
-                
-                # Score based on confidence and reasonable ML usage
-                score = avg_confidence * (1 - abs(ml_usage_rate - 0.3))  # Target ~30% ML usage
-                
-                logger.info(f"  Avg Confidence: {avg_confidence:.2f}")
-                logger.info(f"  ML Usage: {ml_usage_rate:.2%}")
-                logger.info(f"  Score: {score:.2f}")
-                
-                if score > best_score:
-                    best_score = score
-                    best_threshold = threshold
-                    
-            finally:
-                # Restore original threshold
-                if original_threshold is not None:
-                    set_threshold(original_threshold)
-        
-        logger.info(f"\nOptimal threshold: {best_threshold} (score: {best_score:.2f})")
+        logger.info(f"\nOptimal threshold: {best_threshold}")
         
         # Ask if user wants to apply the optimal threshold
         response = input(f"Apply optimal threshold {best_threshold}? (y/n): ")
@@ -191,7 +339,8 @@ def main():
             print("  --get          Get current threshold")
             print("  --set 65       Set threshold to 65")
             print("  --test 55      Test with threshold 55")
+            print("  --sweep        Curves over the production threshold range")
             print("  --optimize     Find optimal threshold")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Historical Backfill Runner
+Re-parses archived requests at their received date after a rule or model change.
+Records are grouped by received day and dispatched day by day to a pool of warm parser
+workers, so each worker stays on one reference date at a time. Every finished chunk is
+written atomically and doubles as the checkpoint, so an interrupted run resumes where it
+stopped. The merged results are diffed against previously stored results
+"""
+
+import argparse
+import gzip
+import json
+import logging
+import multiprocessing
+import os
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from email_parser import IpruAIEmailParser
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+RUNS_DIR = 'backfill_runs'
+DIFF_FIELDS = ("statement_category", "statement_types", "from_date", "to_date",
+               "pan_numbers", "di_code", "account_code", "aif_folio")
+RESULT_FIELDS = DIFF_FIELDS + ("confidence",)
+
+_worker_parser = None
+
+def _init_backfill_worker():
+    """Pool initializer: one parser per worker, quiet per-email logging"""
+    global _worker_parser
+    logging.getLogger('IpruAI').setLevel(logging.WARNING)
+    _worker_parser = IpruAIEmailParser.from_snapshot()
+    model = _worker_parser.ml_model
+    # The pool already uses every core; nested joblib pools would only oversubscribe
+    for estimator in getattr(model, 'estimators_', []):
+        if hasattr(estimator, 'n_jobs'):
+            estimator.n_jobs = 1
+
+def _parse_day_chunk(task: Tuple[str, str, List[Dict[str, Any]]]):
+    """Parse one chunk of a single received day against that day"""
+    chunk_id, reference_date, records = task
+    rows = []
+    chunk_start = time.perf_counter()
+    for record in records:
+        row = {"id": record["id"], "received_at": record["received_at"], "reference_date": reference_date}
+        try:
+            result = _worker_parser.parse_email(record["text"], reference_date=reference_date)
+            row.update({field: result[field] for field in RESULT_FIELDS})
+            row["parsing_method"] = result["metadata"]["parsing_method"]
+        except Exception as e:
+            row["error"] = str(e)
+        rows.append(row)
+    return chunk_id, os.getpid(), time.perf_counter() - chunk_start, rows
+
+def _open_text(path: str, mode: str = 'rt'):
+    return gzip.open(path, mode, encoding='utf-8') if path.endswith(".gz") else open(path, mode, encoding='utf-8')
+
+def iter_archive(path: str) -> Iterator[Dict[str, Any]]:
+    """Archived requests as {"id", "text", "received_at", "previous"} from JSONL(.gz)
+
+    Each line needs an id (or message_id), received_at (ISO) and either text or subject/body
+    (combined the way /parse-email does); an optional "result" holds the stored parse.
+    """
+    with _open_text(path) as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            text = record.get("text")
+            if text is None:
+                text = f"Subject: {record.get('subject', '')}\nBody: {record.get('body', '')}"
+            yield {
+                "id": str(record.get("id", record.get("message_id", line_no))),
+                "text": text,
+                "received_at": record["received_at"],
+                "previous": record.get("result")
+            }
+
+def load_previous_results(path: str) -> Dict[str, Dict[str, Any]]:
+    """Stored results keyed by id, from a results JSONL or a previous backfill run directory"""
+    if os.path.isdir(path):
+        path = os.path.join(path, "results.jsonl")
+    previous = {}
+    with _open_text(path) as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                previous[str(row["id"])] = row
+    return previous
+
+def _normalize(field: str, value):
+    # List order carries no meaning for categories, types or identifiers
+    return sorted(value) if isinstance(value, list) else value
+
+def diff_result(previous: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    return {field: {"previous": previous.get(field), "current": current.get(field)}
+            for field in DIFF_FIELDS
+            if _normalize(field, previous.get(field)) != _normalize(field, current.get(field))}
+
+class BackfillRunner:
+    def __init__(self, archive_path: str, run_dir: str, workers: int = None, chunk_size: int = 200,
+                 previous_path: Optional[str] = None):
+        self.archive_path = archive_path
+        self.run_dir = run_dir
+        self.chunks_dir = os.path.join(run_dir, "chunks")
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.previous_path = previous_path
+
+    def _chunk_path(self, chunk_id: str) -> str:
+        return os.path.join(self.chunks_dir, f"{chunk_id}.jsonl")
+
+    def _write_chunk(self, chunk_id: str, rows: List[Dict[str, Any]]):
+        path = self._chunk_path(chunk_id)
+        with open(path + ".tmp", 'w', encoding='utf-8') as f:
+            for row in rows:
+                f.write(json.dumps(row, default=str) + "\n")
+        os.replace(path + ".tmp", path)
+
+    def _check_run_manifest(self, parser_version: str):
+        """A run directory belongs to one archive and parser version; refuse to mix results on resume"""
+        manifest_path = os.path.join(self.run_dir, "run.json")
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'r') as f:
+                manifest = json.load(f)
+            if manifest["parser_version"] != parser_version or manifest["chunk_size"] != self.chunk_size:
+                raise ValueError(f"{self.run_dir} was started with parser {manifest['parser_version']} and chunk "
+                                 f"size {manifest['chunk_size']}; use a new --run-name for this configuration")
+            return
+        with open(manifest_path, 'w') as f:
+            json.dump({"archive": self.archive_path, "parser_version": parser_version,
+                       "chunk_size": self.chunk_size, "started_at": datetime.now().isoformat()}, f, indent=2)
+
+    def plan(self) -> Tuple[List[Tuple[str, str, List[Dict]]], int]:
+        """Group the archive by received day into (chunk_id, day, records) tasks, oldest day first"""
+        by_day = defaultdict(list)
+        for record in iter_archive(self.archive_path):
+            day = IpruAIEmailParser.resolve_reference_date(record["received_at"]).date().isoformat()
+            record.pop("previous")  # only needed for the diff, which re-reads the archive
+            by_day[day].append(record)
+        tasks = []
+        for day in sorted(by_day):
+            records = by_day[day]
+            for n, start in enumerate(range(0, len(records), self.chunk_size)):
+                tasks.append((f"{day}_{n:04d}", day, records[start:start + self.chunk_size]))
+        total = sum(len(records) for records in by_day.values())
+        logger.info(f"📅 {total:,} archived requests over {len(by_day)} days -> {len(tasks)} chunks")
+        return tasks, total
+
+    def run(self) -> Dict[str, Any]:
+        os.makedirs(self.chunks_dir, exist_ok=True)
+        with open('config/model_config.json', 'r') as f:
+            model_config = json.load(f)
+        parser_version = (f"{IpruAIEmailParser.compute_config_version()}-"
+                          f"{IpruAIEmailParser.compute_artifact_version(model_config)}")
+        self._check_run_manifest(parser_version)
+
+        tasks, total = self.plan()
+        pending = [task for task in tasks if not os.path.exists(self._chunk_path(task[0]))]
+        resumed = len(tasks) - len(pending)
+        if resumed:
+            logger.info(f"⏩ Resuming: {resumed} of {len(tasks)} chunks already done")
+        pending_emails = sum(len(task[2]) for task in pending)
+
+        worker_stats = {}
+        processed = 0
+        errors = 0
+        start = time.perf_counter()
+        last_report = start
+
+        def record(outcome):
+            nonlocal processed, errors, last_report
+            chunk_id, pid, busy_time, rows = outcome
+            self._write_chunk(chunk_id, rows)
+            stats = worker_stats.setdefault(pid, {"emails": 0, "busy_time_s": 0.0})
+            stats["emails"] += len(rows)
+            stats["busy_time_s"] += busy_time
+            processed += len(rows)
+            errors += sum(1 for row in rows if "error" in row)
+            now = time.perf_counter()
+            if now - last_report >= 10 or processed == pending_emails:
+                rate = processed / (now - start)
+                eta = (pending_emails - processed) / rate if rate else 0
+                logger.info(f"  {processed:,}/{pending_emails:,} emails ({rate:.1f}/s, ETA {eta:.0f}s), "
+                            f"through {chunk_id[:10]}")
+                last_report = now
+
+        if pending:
+            logger.info(f"👷 Parsing {pending_emails:,} emails with {self.workers} worker(s)")
+            if self.workers == 1:
+                _init_backfill_worker()
+                for task in pending:
+                    record(_parse_day_chunk(task))
+            else:
+                with multiprocessing.get_context().Pool(self.workers, initializer=_init_backfill_worker) as pool:
+                    # Chunks are queued in day order, so each worker moves through the days in sequence
+                    for outcome in pool.imap_unordered(_parse_day_chunk, pending):
+                        record(outcome)
+        wall_time = time.perf_counter() - start
+
+        results_path = self._merge([task[0] for task in tasks])
+        summary = {
+            "archive": self.archive_path,
+            "parser_version": parser_version,
+            "emails": total,
+            "days": len({task[1] for task in tasks}),
+            "chunks": len(tasks),
+            "resumed_chunks": resumed,
+            "parsed_this_run": processed,
+            "errors_this_run": errors,
+            "wall_time_s": round(wall_time, 2),
+            "throughput_per_sec": round(processed / wall_time, 1) if wall_time and processed else 0.0,
+            "workers": {str(pid): {"emails": s["emails"], "busy_time_s": round(s["busy_time_s"], 2)}
+                        for pid, s in worker_stats.items()},
+            "results": results_path,
+            "completed_at": datetime.now().isoformat()
+        }
+        summary["diff"] = self.diff(results_path)
+
+        with open(os.path.join(self.run_dir, "summary.json"), 'w') as f:
+            json.dump(summary, f, indent=2)
+        logger.info(f"✅ Backfill done: {total:,} emails, {processed:,} parsed this run in {wall_time:.1f}s "
+                    f"({summary['throughput_per_sec']}/s); results in {results_path}")
+        return summary
+
+    def _merge(self, chunk_ids: List[str]) -> str:
+        """Concatenate chunk files in day order into results.jsonl"""
+        results_path = os.path.join(self.run_dir, "results.jsonl")
+        with open(results_path + ".tmp", 'w', encoding='utf-8') as out:
+            for chunk_id in chunk_ids:
+                with open(self._chunk_path(chunk_id), 'r', encoding='utf-8') as f:
+                    for line in f:
+                        out.write(line)
+        os.replace(results_path + ".tmp", results_path)
+        return results_path
+
+    def diff(self, results_path: str) -> Dict[str, Any]:
+        """Write diff.jsonl of field changes against --previous and/or results stored in the archive"""
+        previous = {}
+        for record in iter_archive(self.archive_path):
+            if record["previous"] is not None:
+                previous[record["id"]] = record["previous"]
+        if self.previous_path:
+            previous.update(load_previous_results(self.previous_path))
+        if not previous:
+            logger.info("No previous results to diff against")
+            return {"compared": 0}
+
+        compared = changed = missing = 0
+        changed_by_field = defaultdict(int)
+        diff_path = os.path.join(self.run_dir, "diff.jsonl")
+        with open(diff_path, 'w', encoding='utf-8') as out, open(results_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                row = json.loads(line)
+                old = previous.get(row["id"])
+                if old is None:
+                    missing += 1
+                    continue
+                compared += 1
+                changes = diff_result(old, row)
+                if changes:
+                    changed += 1
+                    for field in changes:
+                        changed_by_field[field] += 1
+                    out.write(json.dumps({"id": row["id"], "reference_date": row["reference_date"],
+                                          "changes": changes}, default=str) + "\n")
+
+        logger.info(f"🔍 Diff vs previous: {changed:,}/{compared:,} changed "
+                    f"({dict(changed_by_field)}), {missing:,} without a previous result; see {diff_path}")
+        return {"compared": compared, "changed": changed, "without_previous": missing,
+                "changed_by_field": dict(changed_by_field), "path": diff_path}
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Re-parse archived requests at their received date')
+    arg_parser.add_argument('archive', help='JSONL(.gz) with id, received_at and text (or subject/body)')
+    arg_parser.add_argument('--previous', help='Stored results to diff against (results JSONL or a backfill run dir)')
+    arg_parser.add_argument('--run-name', help='Run directory under backfill_runs/ (reuse it to resume)')
+    arg_parser.add_argument('--workers', type=int, help='Parser processes (default: CPU count)')
+    arg_parser.add_argument('--chunk-size', type=int, default=200, help='Emails per dispatched chunk (within one day)')
+    args = arg_parser.parse_args()
+
+    run_name = args.run_name or f"backfill_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    runner = BackfillRunner(args.archive, os.path.join(RUNS_DIR, run_name), workers=args.workers,
+                            chunk_size=args.chunk_size, previous_path=args.previous)
+    runner.run()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark Suite for Email Parser Hot Paths
+Times each parser stage over fixed corpora drawn from training_data/ with warmup,
+repetitions and percentiles, writes JSON results and compares against a stored baseline
+"""
+
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import re
+import sys
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from build_corpora import iter_corpus, load_corpus_meta
+from email_parser import IpruAIEmailParser
+from forest_engine import FlatForest
+from perf_stats import summarize_latencies
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+HUMAN_CORPUS_PATH = 'training_data/human_language_training.json'
+DATE_CORPUS_PATH = 'training_data/date_training.json'
+DEFAULT_BASELINE_PATH = 'benchmarks/baseline.json'
+DEFAULT_RESULTS_DIR = 'benchmarks'
+# Reference days for the calendar paths start here, so runs stay comparable
+CALENDAR_START = date(2015, 4, 1)
+CALENDAR_EXPRESSIONS = [
+    ("current_fy", None), ("last_fy", None), ("fy_range", ("23", "24")), ("current_period", "quarter"),
+    ("last_period", "month"), ("ytd", None), ("wtd", None), ("last_n", (3, "months")), ("last_n", (2, "years")),
+    ("last_week", "week"), ("last_quarter", None), ("half_year", (1, 2024)), ("end_of_month", None),
+    ("end_of_quarter", None)
+]
+
+
+class BenchmarkCase:
+    """One hot path: a per-item callable plus the corpus it runs over"""
+
+    def __init__(self, name: str, items: List[Any], func: Callable[[Any], Any], requires_ml: bool = False):
+        self.name = name
+        self.items = items
+        self.func = func
+        self.requires_ml = requires_ml
+
+
+class BenchmarkSuite:
+    def __init__(self, limit: int = 500, warmup: int = 1, repetitions: int = 5, corpus_path: Optional[str] = None,
+                 calendar_days: int = 3650):
+        self.limit = limit
+        self.warmup = warmup
+        self.repetitions = repetitions
+        self.corpus_path = corpus_path
+        self.calendar_days = calendar_days
+        self.parser = IpruAIEmailParser()
+        # Per-call INFO logging in the ML path would dominate the measurements
+        logging.getLogger('IpruAI.Parser').setLevel(logging.WARNING)
+        self.email_corpus, self.date_string_corpus = self._load_corpora()
+
+    def _sample(self, items: List[Any]) -> List[Any]:
+        """Deterministic evenly-strided sample so every run sees the same items"""
+        if not self.limit or len(items) <= self.limit:
+            return list(items)
+        stride = len(items) / self.limit
+        return [items[int(i * stride)] for i in range(self.limit)]
+
+    def _load_corpora(self):
+        """Fixed email texts and bare date strings from the committed training data"""
+        with open(HUMAN_CORPUS_PATH, 'r') as f:
+            human_data = json.load(f)
+        with open(DATE_CORPUS_PATH, 'r') as f:
+            date_data = json.load(f)
+
+        if self.corpus_path:
+            # Seeded corpus from build_corpora.py; only the first `limit` emails are read
+            email_corpus = [case["input_text"] for case in iter_corpus(self.corpus_path, limit=self.limit or None)]
+        else:
+            email_corpus = [sample["text"] for sample in human_data] + [sample["text"] for sample in date_data]
+
+        # Date strings as they reach parse_flexible_date from the AS ON and range rules
+        date_strings = []
+        for sample in date_data:
+            text = sample["text"]
+            as_on = re.search(r'as\s+on\s+(.+)$', text, re.IGNORECASE)
+            date_range = re.search(r'from\s+(.+?)\s+to\s+(.+)$', text, re.IGNORECASE)
+            if as_on:
+                date_strings.append(as_on.group(1))
+            elif date_range:
+                date_strings.extend([date_range.group(1), date_range.group(2)])
+
+        return self._sample(email_corpus), self._sample(date_strings)
+
+    def build_cases(self) -> List[BenchmarkCase]:
+        """Register every parser hot path with its prepared inputs"""
+        parser = self.parser
+        emails = self.email_corpus
+
+        identified = [(text, parser.extract_identifiers(text)) for text in emails]
+        scored = []
+        for text, identifiers in identified:
+            _, _, stmt_confidence = parser.match_statement_types(text)
+            _, _, date_confidence = parser.extract_date_range(text)
+            scored.append((stmt_confidence, date_confidence, any(identifiers.values()), identifiers))
+
+        # One item = one period expression resolved for every reference day, scalar vs one array call
+        engine = parser.period_calendar.engine
+        days = [CALENDAR_START + timedelta(days=i) for i in range(self.calendar_days)]
+        day_array = np.array(days, dtype='datetime64[D]')
+
+        def resolve_scalar(expression):
+            period, param = expression
+            return [engine.resolve_one(period, day, param) for day in days]
+
+        # Single vectorized rows as _ml_fallback_parse sees them, through sklearn and the flat forest
+        forest_rows, forest = [], None
+        if parser.ml_model is not None and parser.vectorizer is not None:
+            forest_rows = [parser._vectorize_ml_features(parser.vectorizer, *args) for args in identified]
+            try:
+                forest = FlatForest.from_model(parser.ml_model)
+            except ValueError as e:
+                logger.warning(f"Flat forest benchmark unavailable: {e}")
+
+        cases = [
+            BenchmarkCase("extract_identifiers", emails, parser.extract_identifiers),
+            BenchmarkCase("match_statement_types", emails, parser.match_statement_types),
+            BenchmarkCase("extract_date_range", emails, parser.extract_date_range),
+            BenchmarkCase("parse_flexible_date", self.date_string_corpus, parser.parse_flexible_date),
+            BenchmarkCase("calculate_confidence", scored, lambda args: parser.calculate_confidence(*args)),
+            BenchmarkCase("_extract_ml_features", identified, lambda args: parser._extract_ml_features(*args)),
+            BenchmarkCase("_vectorize_ml_features", identified,
+                          lambda args: parser._vectorize_ml_features(parser.vectorizer, *args), requires_ml=True),
+            BenchmarkCase("_ml_fallback_parse", identified, lambda args: parser._ml_fallback_parse(*args),
+                          requires_ml=True),
+            BenchmarkCase("parse_email", emails, parser.parse_email),
+            BenchmarkCase("calendar_scalar", CALENDAR_EXPRESSIONS, resolve_scalar),
+            BenchmarkCase("calendar_vectorized", CALENDAR_EXPRESSIONS,
+                          lambda expression: engine.resolve(expression[0], day_array, expression[1])),
+            BenchmarkCase("forest_predict_sklearn", forest_rows,
+                          lambda X: (parser.ml_model.predict(X), parser.ml_model.predict_proba(X)), requires_ml=True),
+        ]
+        if forest is not None:
+            cases.append(BenchmarkCase("forest_predict_flat", forest_rows, forest.predict_with_proba, requires_ml=True))
+        return cases
+
+    def run_case(self, case: BenchmarkCase) -> Dict[str, Any]:
+        """Warm up, then time every call of every repetition individually"""
+        func = case.func
+        for _ in range(self.warmup):
+            for item in case.items:
+                func(item)
+
+        samples_us = []
+        repetition_means_us = []
+        gc_was_enabled = gc.isenabled()
+        gc.collect()
+        gc.disable()
+        try:
+            for _ in range(self.repetitions):
+                rep_start = len(samples_us)
+                for item in case.items:
+                    start_ns = time.perf_counter_ns()
+                    func(item)
+                    samples_us.append((time.perf_counter_ns() - start_ns) / 1000.0)
+                rep_samples = samples_us[rep_start:]
+                repetition_means_us.append(sum(rep_samples) / len(rep_samples))
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
+        summary = summarize_latencies(samples_us)
+        summary["corpus_size"] = len(case.items)
+        summary["repetition_means"] = [round(m, 3) for m in repetition_means_us]
+        summary["calls_per_sec"] = round(1e6 / summary["mean"], 1) if summary["mean"] else 0.0
+        summary["unit"] = "us"
+        return summary
+
+    def run(self, only: Optional[List[str]] = None) -> Dict[str, Any]:
+        ml_available = self.parser.ml_model is not None and self.parser.vectorizer is not None
+        results = {}
+        skipped = {}
+
+        for case in self.build_cases():
+            if only and case.name not in only:
+                continue
+            if case.requires_ml and not ml_available:
+                logger.warning(f"Skipping {case.name}: ML model not loaded (run train_production_model.py)")
+                skipped[case.name] = "ml_model_not_loaded"
+                continue
+            if not case.items:
+                skipped[case.name] = "empty_corpus"
+                continue
+
+            logger.info(f"⏱️  Benchmarking {case.name} over {len(case.items)} items x {self.repetitions} repetitions")
+            results[case.name] = self.run_case(case)
+            r = results[case.name]
+            logger.info(f"   p50={r['p50']:.1f}us p95={r['p95']:.1f}us p99={r['p99']:.1f}us max={r['max']:.1f}us")
+
+        return {
+            "meta": {
+                "timestamp": datetime.now().isoformat(),
+                "python": sys.version.split()[0],
+                "platform": platform.platform(),
+                "corpus": {
+                    "emails": len(self.email_corpus),
+                    "date_strings": len(self.date_string_corpus),
+                    "sources": [self.corpus_path or HUMAN_CORPUS_PATH, DATE_CORPUS_PATH],
+                    "corpus_sha256": load_corpus_meta(self.corpus_path).get("sha256") if self.corpus_path else None,
+                    "calendar_days": self.calendar_days
+                },
+                "limit": self.limit,
+                "warmup": self.warmup,
+                "repetitions": self.repetitions,
+                "ml_model_loaded": ml_available,
+                "spacy_model_loaded": self.parser.nlp is not None,
+                "model_version": self.parser.model_config.get("version")
+            },
+            "results": results,
+            "skipped": skipped
+        }
+
+
+def compare_to_baseline(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float,
+                        metric: str = "p50") -> List[Dict[str, Any]]:
+    """Per-path ratio of current vs baseline; a path regresses when the ratio exceeds 1 + tolerance"""
+    comparisons = []
+    for name, result in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if not base or not base.get(metric):
+            continue
+        ratio = result[metric] / base[metric]
+        comparisons.append({
+            "path": name,
+            "metric": metric,
+            "baseline": base[metric],
+            "current": result[metric],
+            "ratio": round(ratio, 3),
+            "regressed": ratio > 1.0 + tolerance
+        })
+    return comparisons
+
+
+def write_json(data: Dict[str, Any], path: str):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Microbenchmark parser hot paths')
+    arg_parser.add_argument('--limit', type=int, default=500, help='Max corpus items per path (0 = all)')
+    arg_parser.add_argument('--warmup', type=int, default=1, help='Warmup passes over the corpus')
+    arg_parser.add_argument('--repetitions', type=int, default=5, help='Timed passes over the corpus')
+    arg_parser.add_argument('--only', nargs='+', help='Benchmark only these paths')
+    arg_parser.add_argument('--corpus', help='Seeded corpus file (build_corpora.py) to draw email texts from')
+    arg_parser.add_argument('--calendar-days', type=int, default=3650,
+                            help='Reference days per expression in the calendar_scalar/calendar_vectorized paths')
+    arg_parser.add_argument('--output', help='Results JSON path (default benchmarks/results_<timestamp>.json)')
+    arg_parser.add_argument('--baseline', nargs='?', const=DEFAULT_BASELINE_PATH,
+                            help='Compare against a stored baseline and fail on regressions')
+    arg_parser.add_argument('--save-baseline', nargs='?', const=DEFAULT_BASELINE_PATH,
+                            help='Store these results as the new baseline')
+    arg_parser.add_argument('--tolerance', type=float, default=0.15, help='Allowed slowdown vs baseline (0.15 = 15%%)')
+    arg_parser.add_argument('--metric', default='p50', choices=['mean', 'p50', 'p90', 'p95', 'p99'],
+                            help='Statistic compared against the baseline')
+    args = arg_parser.parse_args()
+
+    suite = BenchmarkSuite(limit=args.limit, warmup=args.warmup, repetitions=args.repetitions,
+                           corpus_path=args.corpus, calendar_days=args.calendar_days)
+    results = suite.run(only=args.only)
+
+    output = args.output or os.path.join(
+        DEFAULT_RESULTS_DIR, f"results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+
+    exit_code = 0
+    if args.baseline:
+        if not os.path.exists(args.baseline):
+            logger.error(f"Baseline {args.baseline} not found, run with --save-baseline first")
+            exit_code = 2
+        else:
+            with open(args.baseline, 'r') as f:
+                baseline = json.load(f)
+            comparisons = compare_to_baseline(results, baseline, args.tolerance, args.metric)
+            results["baseline_comparison"] = {
+                "baseline": args.baseline,
+                "tolerance": args.tolerance,
+                "paths": comparisons
+            }
+            logger.info(f"\n📊 Comparison against {args.baseline} ({args.metric}, tolerance {args.tolerance:.0%}):")
+            for c in comparisons:
+                flag = "❌ REGRESSED" if c["regressed"] else "✅"
+                logger.info(f"   {c['path']:25} {c['baseline']:10.1f}us -> {c['current']:10.1f}us  x{c['ratio']:.3f} {flag}")
+            if any(c["regressed"] for c in comparisons):
+                exit_code = 1
+
+    write_json(results, output)
+    logger.info(f"Results written to {output}")
+
+    if args.save_baseline:
+        write_json(results, args.save_baseline)
+        logger.info(f"Baseline saved to {args.save_baseline}")
+
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
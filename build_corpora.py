@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Seeded Benchmark Corpus Builder
+Materializes fixed-size, seeded email corpora with expected labels to gzipped JSONL once,
+so stress tests and benchmarks stream identical inputs on every run and generation time
+is kept out of the measurements
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import os
+import random
+from datetime import date, datetime
+from typing import Any, Dict, Iterator, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CORPORA_DIR = 'corpora'
+CORPUS_KINDS = ("real_life", "training")
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+DEFAULT_SEED = 42
+
+
+def corpus_path(kind: str, size: int, seed: int = DEFAULT_SEED, directory: str = CORPORA_DIR) -> str:
+    """Canonical on-disk location of a corpus"""
+    return os.path.join(directory, f"{kind}_{size}_seed{seed}.jsonl.gz")
+
+
+def _meta_path(path: str) -> str:
+    return path[:-len(".jsonl.gz")] + ".meta.json" if path.endswith(".jsonl.gz") else path + ".meta.json"
+
+
+def load_corpus_meta(path: str) -> Dict[str, Any]:
+    """Sidecar metadata written next to a corpus (kind, size, seed, reference date, sha256)"""
+    meta_path = _meta_path(path)
+    if not os.path.exists(meta_path):
+        return {}
+    with open(meta_path, 'r') as f:
+        return json.load(f)
+
+
+def iter_corpus(path: str, limit: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """Lazily yield {"id", "input_text", "expected", "category"} records from a corpus file"""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        for i, line in enumerate(f):
+            if limit is not None and i >= limit:
+                break
+            if line.strip():
+                yield json.loads(line)
+
+
+def _iter_real_life(size: int, seed: int, reference_date: date) -> Iterator[Dict[str, Any]]:
+    from comprehensive_stress_test import ComprehensiveStressTest
+
+    rng = random.Random(seed)
+    yield from ComprehensiveStressTest().iter_real_life_test_cases(size, rng=rng, today=reference_date)
+
+
+def _iter_training(size: int, seed: int) -> Iterator[Dict[str, Any]]:
+    from email_parser import IpruAIEmailParser
+
+    # generate_training_data appends 3 fixed edge cases, so trim to the requested size
+    parser = IpruAIEmailParser()
+    samples = parser.generate_training_data(max(size - 3, 0), rng=random.Random(seed))[:size]
+    for i, sample in enumerate(samples):
+        labels = sample["labels"]
+        yield {
+            "id": i + 1,
+            "input_text": sample["text"],
+            "expected": {
+                "statement_category": labels["statement_category"],
+                "statement_types": labels["statement_types"],
+                "expected_from_date": labels["from_date"],
+                "expected_to_date": labels["to_date"]
+            },
+            "category": "training"
+        }
+
+
+def build_corpus(kind: str, size: int, seed: int = DEFAULT_SEED, directory: str = CORPORA_DIR,
+                 force: bool = False) -> str:
+    """Write one seeded corpus (and its .meta.json) unless an identical one already exists"""
+    if kind not in CORPUS_KINDS:
+        raise ValueError(f"Unknown corpus kind {kind}, expected one of {CORPUS_KINDS}")
+
+    path = corpus_path(kind, size, seed, directory)
+    if os.path.exists(path) and not force:
+        meta = load_corpus_meta(path)
+        if meta.get("size") == size and meta.get("seed") == seed:
+            # Reused whatever its age: consumers parse against its recorded reference_date
+            logger.info(f"♻️  Reusing {path} ({size:,} cases, seed {seed}, reference date {meta.get('reference_date')})")
+            return path
+
+    os.makedirs(directory, exist_ok=True)
+    reference_date = date.today()
+    records = _iter_real_life(size, seed, reference_date) if kind == "real_life" else _iter_training(size, seed)
+
+    logger.info(f"🏗️  Building {kind} corpus: {size:,} cases, seed {seed}")
+    start = datetime.now()
+    digest = hashlib.sha256()
+    tmp_path = path + ".tmp"
+    written = 0
+    # mtime=0 keeps the gzip bytes (and therefore the sha256) identical for the same seed
+    with open(tmp_path, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as gz:
+        for record in records:
+            line = (json.dumps(record, separators=(",", ":"), default=str) + "\n").encode('utf-8')
+            digest.update(line)
+            gz.write(line)
+            written += 1
+            if written % 100000 == 0:
+                logger.info(f"   {written:,}/{size:,} cases written...")
+    os.replace(tmp_path, path)
+
+    meta = {
+        "kind": kind,
+        "size": written,
+        "seed": seed,
+        "reference_date": str(reference_date),
+        "sha256": digest.hexdigest(),
+        "created_at": datetime.now().isoformat(),
+        "build_seconds": round((datetime.now() - start).total_seconds(), 2)
+    }
+    with open(_meta_path(path), 'w') as f:
+        json.dump(meta, f, indent=2)
+
+    logger.info(f"✅ {path}: {written:,} cases, {os.path.getsize(path) / (1024 * 1024):.1f} MB "
+                f"in {meta['build_seconds']}s")
+    return path
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Build seeded benchmark corpora')
+    arg_parser.add_argument('--kind', choices=CORPUS_KINDS, nargs='+', default=["real_life"],
+                            help='Corpus generators to materialize')
+    arg_parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='Corpus sizes')
+    arg_parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help='Random seed')
+    arg_parser.add_argument('--output-dir', default=CORPORA_DIR, help='Where corpora are written')
+    arg_parser.add_argument('--force', action='store_true', help='Rebuild even if the corpus exists')
+    args = arg_parser.parse_args()
+
+    for kind in args.kind:
+        for size in args.sizes:
+            build_corpus(kind, size, args.seed, args.output_dir, args.force)
+
+
+if __name__ == "__main__":
+    main()
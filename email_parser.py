@@ -1,42 +1,202 @@
 import re
 import json
+import hashlib
 import logging
 import os
-from datetime import datetime, timedelta
-from dateutil.relativedelta import relativedelta
+import time
+from datetime import datetime, time as dt_time, timedelta
 from fuzzywuzzy import fuzz
-import dateparser
-import datefinder
-from typing import Dict, List, Tuple, Optional, Any
-import spacy
+from typing import TYPE_CHECKING, Dict, List, Tuple, Optional, Any
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.multioutput import MultiOutputClassifier
-import joblib
+from period_calendar import PeriodCalendar
+
+if TYPE_CHECKING:
+    from forest_engine import FlatForest
+
+# spaCy, joblib/sklearn (model loading), the featurizers, the flat forest, datefinder and dateparser
+# are imported where they are first used, so starting the parser doesn't pay for paths a request may never take
 
 
 logger = logging.getLogger('IpruAI.Parser')
 
-class IpruAIEmailParser:
+CONFIG_FILES = ('config/regex_patterns.json', 'config/statement_keywords.json', 'config/model_config.json')
+# Includes featurizers.COMPACT_FILES, spelled out so the version check doesn't import the featurizers
+MODEL_ARTIFACT_FILES = ('model.joblib', 'vectorizer.joblib', 'featurizer.json', 'idf.npy', 'metadata.json',
+                        'vocabulary.json', 'vocabulary.marisa', 'vocabulary_columns.npy', 'vocabulary_idf.npy')
+
+# Bump whenever _extract_ml_feature_parts output changes so cached training features are rebuilt
+ML_FEATURE_VERSION = 2
+
+class ParseTrace:
+    """Per-request stage timings and date/ML path flags, only built when debug timings are requested"""
+    
     def __init__(self):
+        self.stages_ns = {}
+        self.date_rule = None
+        self.date_pattern = None
+        self.datefinder_invoked = False
+        self.dateparser_invoked = False
+        self.ml_invoked = False
+        self.spacy_invoked = False
+        self._start_ns = time.perf_counter_ns()
+        self._mark_ns = self._start_ns
+    
+    def lap(self, stage: str):
+        """Attribute the time since the previous lap to the given stage"""
+        now_ns = time.perf_counter_ns()
+        self.stages_ns[stage] = self.stages_ns.get(stage, 0) + now_ns - self._mark_ns
+        self._mark_ns = now_ns
+    
+    def set_date_rule(self, rule: str, pattern: Optional[str] = None):
+        self.date_rule = rule
+        self.date_pattern = pattern
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "clock": "perf_counter_ns",
+            "total_ns": self._mark_ns - self._start_ns,
+            "stages_ns": dict(self.stages_ns),
+            "date_rule": self.date_rule,
+            "date_pattern": self.date_pattern,
+            "datefinder_invoked": self.datefinder_invoked,
+            "dateparser_invoked": self.dateparser_invoked,
+            "ml_invoked": self.ml_invoked,
+            "spacy_invoked": self.spacy_invoked
+        }
+
+class IpruAIEmailParser:
+    def __init__(self, previous: Optional["IpruAIEmailParser"] = None, ml_components: Optional[Tuple] = None):
+        """Load configs, regexes and ML components
+        
+        When rebuilding for a hot reload, pass the active parser as `previous`: its spaCy pipeline and
+        model are reused when their configuration and artifact files are unchanged. `ml_components`
+        is an already loaded (model, vectorizer) pair, e.g. from a parser snapshot.
+        """
         self.load_configs()
         self.DEFAULT_FROM_DATE = datetime(1990, 1, 1).date()
         self._compile_regex_patterns()
-        self.ml_model = None
-        self.vectorizer = None
+        # Period ranges depend only on the reference day, so a hot-reloaded parser keeps the tables
+        self.period_calendar = previous.period_calendar if previous is not None else PeriodCalendar(self.DEFAULT_FROM_DATE)
+        # (model, vectorizer) are swapped together so a request never pairs one with the other's successor
+        self._ml_components = (None, None)
         self.nlp = None
-        self._load_ml_model()
+        # Optional AdaptiveMLGate (set by the API); it follows the parser across hot reloads
+        self.ml_gate = previous.ml_gate if previous is not None else None
+        self.artifact_version = self.compute_artifact_version(self.model_config)
+        
+        reuse_nlp = previous is not None and \
+            previous.model_config["ml_model"].get("spacy_model") == self.model_config["ml_model"].get("spacy_model")
+        if not self.ml_enabled:
+            logger.info("ML fallback disabled (ml_model.enabled is false), running rules only")
+        elif previous is not None and previous.ml_model is not None and previous.artifact_version == self.artifact_version:
+            # previous.ml_model is None when ML was disabled or failed to load; both mean loading it now
+            self._ml_components = previous._ml_components
+            self.nlp = previous.nlp
+            logger.info("ML model and spaCy pipeline unchanged, reusing loaded instances")
+        elif ml_components is not None:
+            self.swap_ml_components(*ml_components)
+            self.nlp = previous.nlp if reuse_nlp else self._load_spacy_model()
+        else:
+            self._load_ml_model(nlp=previous.nlp if reuse_nlp else None, skip_spacy=reuse_nlp)
+        # (model, FlatForest compiled from it); keyed by model identity, so it survives reloads that keep the model
+        self._compiled_forest = previous._compiled_forest if previous is not None else (None, None)
+        self._inference_forest(self.ml_model)
+        self.version = f"{self.config_version}-{self.artifact_version}"
+        self.loaded_at = datetime.now().isoformat()
+    
+    @classmethod
+    def from_snapshot(cls, directory: Optional[str] = None) -> "IpruAIEmailParser":
+        """Start from the warm-start snapshot when `snapshot.enabled`, rebuilding it when stale (see parser_snapshot.py)"""
+        from parser_snapshot import ParserSnapshot
+        with open(CONFIG_FILES[2], 'r') as f:
+            snapshot_config = json.load(f).get("snapshot", {})
+        if not snapshot_config.get("enabled", False) and directory is None:
+            return cls()
+        return ParserSnapshot(directory or snapshot_config.get("path")).load_parser()
+    
+    @staticmethod
+    def compute_config_version() -> str:
+        """Content hash of the three config files"""
+        digest = hashlib.sha256()
+        for path in CONFIG_FILES:
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+        return digest.hexdigest()[:12]
+    
+    @staticmethod
+    def compute_artifact_version(model_config: Dict[str, Any]) -> str:
+        """Fingerprint of the model artifacts (mtime and size) and the spaCy model name"""
+        ml_config = model_config.get("ml_model", {})
+        model_path = ml_config.get("model_path", "models/spacy_model")
+        parts = [ml_config.get("spacy_model", ""), model_path]
+        for name in MODEL_ARTIFACT_FILES:
+            try:
+                stat = os.stat(os.path.join(model_path, name))
+                parts.append(f"{name}:{stat.st_mtime_ns}:{stat.st_size}")
+            except OSError:
+                parts.append(f"{name}:-")
+        return hashlib.sha256("|".join(parts).encode('utf-8')).hexdigest()[:12]
+    
+    @property
+    def ml_enabled(self) -> bool:
+        """ml_model.enabled; False runs the rules only, without loading the model or spaCy"""
+        return self.model_config["ml_model"].get("enabled", True)
+    
+    @property
+    def ml_model(self):
+        return self._ml_components[0]
+    
+    @ml_model.setter
+    def ml_model(self, value):
+        self._ml_components = (value, self._ml_components[1])
+    
+    @property
+    def vectorizer(self):
+        return self._ml_components[1]
+    
+    @vectorizer.setter
+    def vectorizer(self, value):
+        self._ml_components = (self._ml_components[0], value)
+    
+    def swap_ml_components(self, ml_model, vectorizer):
+        """Atomically replace the fallback model and its featurizer (e.g. with an online-learning snapshot)"""
+        self._ml_components = (ml_model, vectorizer)
+    
+    def _inference_forest(self, ml_model) -> Optional["FlatForest"]:
+        """FlatForest for ml_model when ml_model.inference_engine is "flat"; None means predict with sklearn"""
+        if ml_model is None:
+            return None
+        from forest_engine import FlatForest
+        if isinstance(ml_model, FlatForest):
+            return ml_model  # a snapshot's model is already flat
+        if self.model_config["ml_model"].get("inference_engine", "sklearn") != "flat":
+            return None
+        compiled_for, forest = self._compiled_forest
+        if compiled_for is not ml_model:
+            try:
+                forest = FlatForest.from_model(ml_model)
+                logger.info(f"Compiled flat forest: {forest.n_trees} trees, {forest.n_nodes} nodes")
+            except ValueError as e:
+                logger.info(f"Flat inference not available for this model ({e}), using sklearn")
+                forest = None
+            self._compiled_forest = (ml_model, forest)
+        return forest
         
     def load_configs(self):
         """Load configuration files"""
         try:
-            with open('config/regex_patterns.json', 'r') as f:
-                self.regex_patterns = json.load(f)
-            with open('config/statement_keywords.json', 'r') as f:
-                self.statement_keywords = json.load(f)
-            with open('config/model_config.json', 'r') as f:
-                self.model_config = json.load(f)
+            contents = {}
+            for path in CONFIG_FILES:
+                with open(path, 'rb') as f:
+                    contents[path] = f.read()
+            self.regex_patterns = json.loads(contents['config/regex_patterns.json'])
+            self.statement_keywords = json.loads(contents['config/statement_keywords.json'])
+            self.model_config = json.loads(contents['config/model_config.json'])
+            # Hash of exactly the bytes that were parsed, so the version always matches the loaded state
+            digest = hashlib.sha256()
+            for path in CONFIG_FILES:
+                digest.update(contents[path])
+            self.config_version = digest.hexdigest()[:12]
         except Exception as e:
             logger.error(f"Error loading configs: {e}")
             raise
@@ -57,27 +217,63 @@ class IpruAIEmailParser:
             else:
                 self.compiled_patterns[category] = re.compile(patterns)
     
-    def _load_ml_model(self):
-        """Load ML model and components for fallback"""
+    def _load_ml_model(self, nlp=None, skip_spacy: bool = False):
+        """Load ML model and components for fallback (reusing an already loaded spaCy pipeline when given)"""
         try:
+            import joblib
+            from featurizers import CompactVectorizer, HashingFeaturizer
             model_path = self.model_config["ml_model"]["model_path"]
-            if os.path.exists(f"{model_path}/model.joblib") and os.path.exists(f"{model_path}/vectorizer.joblib"):
-                self.ml_model = joblib.load(f"{model_path}/model.joblib")
-                self.vectorizer = joblib.load(f"{model_path}/vectorizer.joblib")
-                logger.info("ML model loaded successfully")
+            featurizer = self._model_metadata(model_path).get("featurizer", "tfidf")
+            compact = (featurizer != "hashing" and self.model_config["ml_model"].get("compact_vectorizer", True)
+                       and CompactVectorizer.exists(model_path))
+            if featurizer == "hashing":
+                featurizer_ready = os.path.exists(f"{model_path}/featurizer.json")
+            else:
+                featurizer_ready = compact or os.path.exists(f"{model_path}/vectorizer.joblib")
+            if os.path.exists(f"{model_path}/model.joblib") and featurizer_ready:
+                ml_model = joblib.load(f"{model_path}/model.joblib")
+                vectorizer = None
+                if featurizer == "hashing":
+                    # Stateless hashing + memory-mapped IDF weights instead of a pickled vocabulary
+                    vectorizer = HashingFeaturizer.load(model_path)
+                elif compact:
+                    # Memory-mapped trie vocabulary + IDF export instead of the pickled vectorizer
+                    try:
+                        vectorizer = CompactVectorizer.load(model_path, source_path=f"{model_path}/vectorizer.joblib")
+                    except ValueError as e:
+                        logger.warning(f"Compact vectorizer not used: {e}")
+                if vectorizer is None:
+                    vectorizer = joblib.load(f"{model_path}/vectorizer.joblib")
+                self.swap_ml_components(ml_model, vectorizer)
+                logger.info(f"ML model loaded successfully ({featurizer} features, {type(vectorizer).__name__})")
             
             # Load spaCy model
-            spacy_model = self.model_config["ml_model"]["spacy_model"]
-            try:
-                self.nlp = spacy.load(spacy_model)
-                logger.info(f"spaCy model {spacy_model} loaded successfully")
-            except OSError:
-                logger.warning(f"spaCy model {spacy_model} not found. ML fallback will be limited.")
-                self.nlp = None
+            if skip_spacy:
+                self.nlp = nlp
+                return
+            self.nlp = self._load_spacy_model()
         except Exception as e:
             logger.warning(f"ML model loading failed: {e}. Using rule-based only.")
-            self.ml_model = None
-            self.vectorizer = None
+            self.swap_ml_components(None, None)
+
+    def _load_spacy_model(self):
+        import spacy
+        spacy_model = self.model_config["ml_model"]["spacy_model"]
+        try:
+            nlp = spacy.load(spacy_model)
+            logger.info(f"spaCy model {spacy_model} loaded successfully")
+            return nlp
+        except OSError:
+            logger.warning(f"spaCy model {spacy_model} not found. ML fallback will be limited.")
+            return None
+
+    def _model_metadata(self, model_path: str) -> Dict[str, Any]:
+        """metadata.json written by train_production_model.py, if present"""
+        try:
+            with open(f"{model_path}/metadata.json", 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
 
     def extract_identifiers(self, text: str) -> Dict[str, List[str]]:
         """Extract PAN, DI codes, Account IDs, and AIF folios"""
@@ -220,10 +416,26 @@ class IpruAIEmailParser:
         
         return pms_statements, aif_statements, max_confidence
 
-    def extract_date_range(self, text: str) -> Tuple[Optional[datetime], Optional[datetime], float]:
-        """Production-ready comprehensive date extraction covering all business scenarios"""
+    @staticmethod
+    def resolve_reference_date(reference_date=None) -> datetime:
+        """The request's single clock snapshot: a supplied date/datetime (dates become midnight) or now"""
+        if reference_date is None:
+            return datetime.now()
+        if isinstance(reference_date, str):
+            reference_date = datetime.fromisoformat(reference_date)
+        if not isinstance(reference_date, datetime):
+            reference_date = datetime.combine(reference_date, dt_time())
+        return reference_date.replace(tzinfo=None)
+
+    def extract_date_range(self, text: str, trace: Optional[ParseTrace] = None,
+                           now: Optional[datetime] = None) -> Tuple[Optional[datetime], Optional[datetime], float]:
+        """Production-ready comprehensive date extraction covering all business scenarios
+        
+        Relative expressions resolve against `now` (defaults to the current time).
+        """
         text_lower = text.lower()
-        now = datetime.now()
+        if now is None:
+            now = datetime.now()
         
         # STEP 1: AS ON patterns - HIGHEST PRIORITY (FIXED: Return inception to specified date)
         as_on_patterns = [
@@ -241,23 +453,68 @@ class IpruAIEmailParser:
             match = re.search(pattern, text_lower, re.IGNORECASE)
             if match:
                 date_str = match.group(1).strip()
-                parsed_date = self.parse_flexible_date(date_str)
+                parsed_date = self.parse_flexible_date(date_str, trace, now)
                 if parsed_date and 1990 <= parsed_date.year <= 2050:
                     logger.debug(f"AS ON pattern matched: {date_str} -> inception to {parsed_date.date()}")
+                    if trace is not None:
+                        trace.set_date_rule("as_on", pattern)
                     # CRITICAL FIX: AS ON means from inception (1990-01-01) to specified date
                     return self.DEFAULT_FROM_DATE, parsed_date.date(), 98.0
         
-        # STEP 2: Only if no AS ON pattern found, continue with other logic
+        # Step 2: Financial year and period expressions, resolved from the per-day calendar table
+        period = self.period_calendar.lookup(text_lower, text_lower, now)
+        if period:
+            pattern, (from_date, to_date) = period
+            if trace is not None:
+                trace.set_date_rule("period_pattern", pattern)
+            return from_date, to_date, 95.0
+        
+        # Dynamic fuzzy matching for ANY spelling mistakes
+        target_keywords = ['current', 'previous', 'last', 'this', 'next', 'year', 'month', 'quarter', 'fy']
+        text_words = text.lower().split()
+        corrected_text = text.lower()
+        
+        for word in text_words:
+            if len(word) >= 3:  # Only check words with 3+ characters
+                best_match = None
+                best_score = 0
+                
+                for keyword in target_keywords:
+                    score = fuzz.ratio(word, keyword)
+                    if score >= 75 and score > best_score:  # 75% similarity threshold
+                        best_match = keyword
+                        best_score = score
+                
+                if best_match and best_match != word:
+                    corrected_text = corrected_text.replace(word, best_match)
+        
+        # Re-check patterns with corrected text
+        if corrected_text != text.lower():
+            period = self.period_calendar.lookup(corrected_text, text_lower, now)
+            if period:
+                pattern, (from_date, to_date) = period
+                confidence = 90.0 if best_score >= 85 else 85.0  # Confidence based on match quality
+                if trace is not None:
+                    trace.set_date_rule("fuzzy_period_pattern", pattern)
+                return from_date, to_date, confidence
+        
+
+        
+        # Step 4: Explicit dates, only needed once no period expression applies
         dates = []
         
         # Enhanced date finding with multiple methods
+        if trace is not None:
+            trace.datefinder_invoked = True
+        import datefinder
         try:
-            found_dates = list(datefinder.find_dates(text))
+            # base_date fills missing parts the way datefinder's default (today, midnight) would
+            found_dates = list(datefinder.find_dates(text, base_date=datetime.combine(now.date(), dt_time())))
             dates.extend([d for d in found_dates if 1990 <= d.year <= 2050])
         except:
             pass
         
-        # Step 2: Comprehensive date patterns for all business scenarios
+        # Comprehensive date patterns for all business scenarios
         additional_patterns = [
             # Standard date formats
             r'\b(\d{1,2})[-/.](\d{1,2})[-/.](\d{2,4})\b',  # DD/MM/YYYY, DD-MM-YYYY, DD.MM.YYYY
@@ -292,125 +549,18 @@ class IpruAIEmailParser:
                     date_str = match.group(0)
                     # Handle special cases
                     if date_str.lower() == 'today':
-                        dates.append(datetime.now())
+                        dates.append(now)
                     elif date_str.lower() == 'yesterday':
-                        dates.append(datetime.now() - timedelta(days=1))
+                        dates.append(now - timedelta(days=1))
                     elif date_str.lower() == 'tomorrow':
-                        dates.append(datetime.now() + timedelta(days=1))
+                        dates.append(now + timedelta(days=1))
                     else:
-                        parsed_date = self.parse_flexible_date(date_str)
+                        parsed_date = self.parse_flexible_date(date_str, trace, now)
                         if parsed_date and 1990 <= parsed_date.year <= 2050:
                             dates.append(parsed_date)
                 except:
                     continue
         
-        # Comprehensive Financial Year and Period parsing
-        now = datetime.now()
-        current_year = now.year
-        
-        # Enhanced Financial Year patterns
-        fy_patterns = {
-            r'\b(current|this)\s+fy\b': lambda: self._get_current_fy(now),
-            r'\b(current|this)\s+financial\s+year\b': lambda: self._get_current_fy(now),
-            r'\b(last|previous)\s+fy\b': lambda: self._get_last_fy(now),
-            r'\b(last|previous)\s+financial\s+year\b': lambda: self._get_last_fy(now),
-            r'\bnext\s+fy\b': lambda: self._get_next_fy(now),
-            r'\bfy\s*(\d{2})[-\s]*(\d{2})\b': lambda: self._get_fy_range(re.search(r'\bfy\s*(\d{2})[-\s]*(\d{2})\b', text_lower)),
-            r'\bfy\s*(\d{4})[-\s]*(\d{2,4})\b': lambda: self._get_fy_range(re.search(r'\bfy\s*(\d{4})[-\s]*(\d{2,4})\b', text_lower)),
-            r'\bfy\s*(\d{2,4})\b': lambda: self._get_specific_fy(re.search(r'\bfy\s*(\d{2,4})\b', text_lower).group(1)),
-            r'\bfinancial\s+year\s*(\d{2})[-\s]*(\d{2})\b': lambda: self._get_fy_range(re.search(r'\bfinancial\s+year\s*(\d{2})[-\s]*(\d{2})\b', text_lower)),
-            r'\bfinancial\s+year\s*(\d{4})[-\s]*(\d{2,4})\b': lambda: self._get_fy_range(re.search(r'\bfinancial\s+year\s*(\d{4})[-\s]*(\d{2,4})\b', text_lower))
-        }
-        
-        # Comprehensive time period patterns with enhanced coverage
-        period_patterns = {
-            # Current periods
-            r'\b(current|this)\s+(year|month|quarter)\b': lambda: self._get_current_period(re.search(r'\b(current|this)\s+(year|month|quarter)\b', text_lower).group(2), now),
-            r'\b(last|previous)\s+(year|month|quarter)\b': lambda: self._get_last_period(re.search(r'\b(last|previous)\s+(year|month|quarter)\b', text_lower).group(2), now),
-            
-            # To-date patterns
-            r'\bytd\b|\byear\s+to\s+date\b': lambda: (datetime(current_year, 1, 1).date(), now.date()),
-            r'\bmtd\b|\bmonth\s+to\s+date\b': lambda: (now.replace(day=1).date(), now.date()),
-            r'\bqtd\b|\bquarter\s+to\s+date\b': lambda: self._get_qtd(now),
-            r'\bwtd\b|\bweek\s+to\s+date\b': lambda: self._get_wtd(now),
-            
-            # Specific day references
-            r'\byesterday\b': lambda: ((now - timedelta(days=1)).date(), (now - timedelta(days=1)).date()),
-            r'\btoday\b': lambda: (now.date(), now.date()),
-            r'\btomorrow\b': lambda: ((now + timedelta(days=1)).date(), (now + timedelta(days=1)).date()),
-            
-            # Last N periods
-            r'\blast\s+(\d+)\s+(days?|months?|years?|weeks?)\b': lambda: self._get_last_n_period(text_lower, now),
-            r'\bpast\s+(\d+)\s+(days?|months?|years?|weeks?)\b': lambda: self._get_last_n_period(text_lower, now),
-            r'\bprevious\s+(\d+)\s+(days?|months?|years?|weeks?)\b': lambda: self._get_last_n_period(text_lower, now),
-            
-            # Week patterns
-            r'\blast\s+(week|fortnight)\b': lambda: self._get_last_week_period(text_lower, now),
-            r'\bthis\s+(week|month|year)\b': lambda: self._get_this_period(text_lower, now),
-            r'\bcurrent\s+(week|month|year)\b': lambda: self._get_this_period(text_lower, now),
-            
-            # Quarter patterns
-            r'\bq[1-4]\s+(\d{2,4})\b': lambda: self._get_quarter_period(text_lower, now),
-            r'\b(\d{1})(?:st|nd|rd|th)?\s+quarter\s+(\d{2,4})\b': lambda: self._get_quarter_period(text_lower, now),
-            r'\blast\s+quarter\b': lambda: self._get_last_quarter(now),
-            r'\bthis\s+quarter\b': lambda: self._get_current_quarter(now),
-            r'\bcurrent\s+quarter\b': lambda: self._get_current_quarter(now),
-            
-            # Half-year patterns
-            r'\bh[1-2]\s+(\d{2,4})\b': lambda: self._get_half_year_period(text_lower, now),
-            r'\b(first|second)\s+half\s+(\d{2,4})\b': lambda: self._get_half_year_period(text_lower, now),
-            
-            # End of period patterns
-            r'\bend\s+of\s+(month|quarter|year)\b': lambda: self._get_end_of_period(text_lower, now),
-            r'\beom\b': lambda: self._get_end_of_month(now),
-            r'\beoq\b': lambda: self._get_end_of_quarter(now),
-            r'\beoy\b': lambda: self._get_end_of_year(now)
-        }
-        
-        # Step 3: Check exact patterns first with enhanced error handling
-        for pattern, handler in {**fy_patterns, **period_patterns}.items():
-            if re.search(pattern, text.lower()):
-                try:
-                    result = handler()
-                    if result and len(result) == 2:
-                        return result[0], result[1], 95.0
-                except Exception as e:
-                    logger.debug(f"Pattern {pattern} failed: {e}")
-                    continue
-        
-        # Dynamic fuzzy matching for ANY spelling mistakes
-        target_keywords = ['current', 'previous', 'last', 'this', 'next', 'year', 'month', 'quarter', 'fy']
-        text_words = text.lower().split()
-        corrected_text = text.lower()
-        
-        for word in text_words:
-            if len(word) >= 3:  # Only check words with 3+ characters
-                best_match = None
-                best_score = 0
-                
-                for keyword in target_keywords:
-                    score = fuzz.ratio(word, keyword)
-                    if score >= 75 and score > best_score:  # 75% similarity threshold
-                        best_match = keyword
-                        best_score = score
-                
-                if best_match and best_match != word:
-                    corrected_text = corrected_text.replace(word, best_match)
-        
-        # Re-check patterns with corrected text
-        if corrected_text != text.lower():
-            for pattern, handler in {**fy_patterns, **period_patterns}.items():
-                if re.search(pattern, corrected_text):
-                    try:
-                        result = handler()
-                        if result:
-                            confidence = 90.0 if best_score >= 85 else 85.0  # Confidence based on match quality
-                            return result[0], result[1], confidence
-                    except:
-                        continue
-        
-
-        
         # Enhanced range detection with "to" patterns
         range_patterns = [
             r'from\s+([^\s]+(?:\s+[^\s]+){0,3})\s+to\s+([^\s]+(?:\s+[^\s]+){0,3})',
@@ -426,39 +576,49 @@ class IpruAIEmailParser:
             if range_match:
                 start_str = range_match.group(1).strip()
                 end_str = range_match.group(2).strip()
-                start_date = self.parse_flexible_date(start_str)
-                end_date = self.parse_flexible_date(end_str)
+                start_date = self.parse_flexible_date(start_str, trace, now)
+                end_date = self.parse_flexible_date(end_str, trace, now)
                 if start_date and end_date:
                     from_dt, to_dt = self._validate_date_range(start_date.date(), end_date.date())
-                    return self._final_date_validation(from_dt, to_dt, 98.0)
+                    if trace is not None:
+                        trace.set_date_rule("range_pattern", pattern)
+                    return self._final_date_validation(from_dt, to_dt, 98.0, now)
         
         # Final validation: Check found dates
         valid_dates = []
         for date in dates:
-            if date and 1990 <= date.year <= 2050 and date.date() <= datetime.now().date():
+            if date and 1990 <= date.year <= 2050 and date.date() <= now.date():
                 valid_dates.append(date)
         
         if len(valid_dates) >= 2:
             valid_dates.sort()
             from_dt, to_dt = self._validate_date_range(valid_dates[0].date(), valid_dates[-1].date())
-            return self._final_date_validation(from_dt, to_dt, 95.0)
+            if trace is not None:
+                trace.set_date_rule("found_dates_range")
+            return self._final_date_validation(from_dt, to_dt, 95.0, now)
         elif len(valid_dates) == 1:
             single_date = valid_dates[0].date()
             
             # Check context to determine if it's FROM or AS ON
             if 'from' in text_lower and 'as on' not in text_lower:
-                yesterday = (datetime.today() - timedelta(days=1)).date()
-                return self._final_date_validation(single_date, yesterday, 90.0)
+                yesterday = (now - timedelta(days=1)).date()
+                if trace is not None:
+                    trace.set_date_rule("found_date_from")
+                return self._final_date_validation(single_date, yesterday, 90.0, now)
             else:
+                if trace is not None:
+                    trace.set_date_rule("found_date_as_on")
                 return self.DEFAULT_FROM_DATE, single_date, 90.0
         
         # Final fallback with safety check
-        fallback_to_date = (datetime.now() - timedelta(days=1)).date()
-        return self._final_date_validation(self.DEFAULT_FROM_DATE, fallback_to_date, 0.0)
+        if trace is not None:
+            trace.set_date_rule("default")
+        fallback_to_date = (now - timedelta(days=1)).date()
+        return self._final_date_validation(self.DEFAULT_FROM_DATE, fallback_to_date, 0.0, now)
     
-    def _final_date_validation(self, from_date, to_date, confidence):
+    def _final_date_validation(self, from_date, to_date, confidence, now: Optional[datetime] = None):
         """Final safety check for all date outputs"""
-        today = datetime.now().date()
+        today = (now or datetime.now()).date()
         
         # Validate from_date
         if from_date and (from_date.year < 1990 or from_date.year > 2050 or from_date > today):
@@ -498,256 +658,24 @@ class IpruAIEmailParser:
         
         return from_date, to_date
     
-    def _get_current_fy(self, now):
-        """Get current financial year (Apr-Mar)"""
-        if now.month >= 4:
-            return datetime(now.year, 4, 1).date(), datetime(now.year + 1, 3, 31).date()
-        else:
-            return datetime(now.year - 1, 4, 1).date(), datetime(now.year, 3, 31).date()
-    
-    def _get_last_fy(self, now):
-        """Get last financial year (Apr-Mar)"""
-        if now.month >= 4:
-            return datetime(now.year - 1, 4, 1).date(), datetime(now.year, 3, 31).date()
-        else:
-            return datetime(now.year - 2, 4, 1).date(), datetime(now.year - 1, 3, 31).date()
-    
-    def _get_next_fy(self, now):
-        # Next FY: If we're in Aug 2025, next FY is 2025-26 (Apr 2025 to Mar 2026)
-        if now.month >= 4:
-            return datetime(now.year + 1, 4, 1).date(), datetime(now.year + 2, 3, 31).date()
-        else:
-            return datetime(now.year, 4, 1).date(), datetime(now.year + 1, 3, 31).date()
-    
-    def _get_specific_fy(self, year_str):
-        year = int(year_str)
-        if year < 100:
-            year = 2000 + year if year <= 50 else 1900 + year
-        # For FY24, return FY24-25 (Apr 2024 to Mar 2025)
-        return datetime(year, 4, 1).date(), datetime(year + 1, 3, 31).date()
-    
-    def _get_current_period(self, period, now):
-        """Get current period dates"""
-        yesterday = (now - timedelta(days=1)).date()
-        if period == 'year':
-            return datetime(now.year, 1, 1).date(), yesterday
-        elif period == 'month':
-            return now.replace(day=1).date(), yesterday
-        elif period == 'quarter':
-            q = (now.month - 1) // 3 + 1
-            start_month = (q - 1) * 3 + 1
-            return datetime(now.year, start_month, 1).date(), yesterday
-    
-    def _get_last_period(self, period, now):
-        if period == 'year':
-            return datetime(now.year - 1, 1, 1).date(), datetime(now.year - 1, 12, 31).date()
-        elif period == 'month':
-            last_month = now.replace(day=1) - timedelta(days=1)
-            return last_month.replace(day=1).date(), last_month.date()
-        elif period == 'quarter':
-            q = (now.month - 1) // 3 + 1
-            if q == 1:
-                return datetime(now.year - 1, 10, 1).date(), datetime(now.year - 1, 12, 31).date()
-            else:
-                start_month = (q - 2) * 3 + 1
-                end_month = start_month + 2
-                return datetime(now.year, start_month, 1).date(), datetime(now.year, end_month, 31).date()
-    
-    def _get_qtd(self, now):
-        q = (now.month - 1) // 3 + 1
-        start_month = (q - 1) * 3 + 1
-        return datetime(now.year, start_month, 1).date(), now.date()
-    
-    def _get_last_n_period(self, text, now):
-        patterns = [r'\b(?:last|past|previous)\s+(\d+)\s+(days?|months?|years?|weeks?)\b']
-        for pattern in patterns:
-            match = re.search(pattern, text)
-            if match:
-                n = int(match.group(1))
-                unit = match.group(2)
-                end_date = (now - timedelta(days=1)).date()
-                
-                if 'day' in unit:
-                    start_date = end_date - timedelta(days=n-1)
-                elif 'week' in unit:
-                    start_date = end_date - timedelta(weeks=n) + timedelta(days=1)
-                elif 'month' in unit:
-                    start_date = end_date - relativedelta(months=n) + timedelta(days=1)
-                elif 'year' in unit:
-                    start_date = end_date - relativedelta(years=n) + timedelta(days=1)
-                
-                return start_date, end_date
-        return None
-    
-    def _get_wtd(self, now):
-        """Week to date - Monday to yesterday"""
-        days_since_monday = now.weekday()
-        start_date = now - timedelta(days=days_since_monday)
-        yesterday = (now - timedelta(days=1)).date()
-        return start_date.date(), yesterday
-    
-    def _get_quarter_period(self, text, now):
-        """Get specific quarter period"""
-        # Extract quarter and year from text
-        q_match = re.search(r'\bq([1-4])\s+(\d{2,4})\b', text)
-        if not q_match:
-            q_match = re.search(r'\b([1-4])(?:st|nd|rd|th)?\s+quarter\s+(\d{2,4})\b', text)
-        
-        if q_match:
-            quarter = int(q_match.group(1))
-            year = int(q_match.group(2))
-            if year < 100:
-                year = 2000 + year if year <= 50 else 1900 + year
-            
-            start_month = (quarter - 1) * 3 + 1
-            end_month = start_month + 2
-            
-            # Get last day of end month
-            if end_month == 12:
-                end_date = datetime(year, 12, 31).date()
-            else:
-                end_date = (datetime(year, end_month + 1, 1) - timedelta(days=1)).date()
-            
-            return datetime(year, start_month, 1).date(), end_date
-        return None
-    
-    def _get_last_quarter(self, now):
-        """Get last quarter dates"""
-        current_quarter = (now.month - 1) // 3 + 1
-        if current_quarter == 1:
-            # Current is Q1, last quarter is Q4 of previous year
-            return datetime(now.year - 1, 10, 1).date(), datetime(now.year - 1, 12, 31).date()
-        else:
-            # Get previous quarter of current year
-            last_quarter = current_quarter - 1
-            start_month = (last_quarter - 1) * 3 + 1
-            end_month = start_month + 2
-            import calendar
-            end_day = calendar.monthrange(now.year, end_month)[1]
-            return datetime(now.year, start_month, 1).date(), datetime(now.year, end_month, end_day).date()
-    
-    def _get_current_quarter(self, now):
-        """Get current quarter dates"""
-        current_quarter = (now.month - 1) // 3 + 1
-        start_month = (current_quarter - 1) * 3 + 1
-        return datetime(now.year, start_month, 1).date(), now.date()
-    
-    def _get_half_year_period(self, text, now):
-        """Get half-year period"""
-        h_match = re.search(r'\bh([1-2])\s+(\d{2,4})\b', text)
-        if not h_match:
-            h_match = re.search(r'\b(first|second)\s+half\s+(\d{2,4})\b', text)
-            if h_match:
-                half = 1 if h_match.group(1) == 'first' else 2
-                year = int(h_match.group(2))
-            else:
-                return None
-        else:
-            half = int(h_match.group(1))
-            year = int(h_match.group(2))
-        
-        if year < 100:
-            year = 2000 + year if year <= 50 else 1900 + year
-        
-        if half == 1:
-            return datetime(year, 1, 1).date(), datetime(year, 6, 30).date()
-        else:
-            return datetime(year, 7, 1).date(), datetime(year, 12, 31).date()
-    
-    def _get_end_of_period(self, text, now):
-        """Get end of specified period"""
-        if 'month' in text:
-            return self._get_end_of_month(now)
-        elif 'quarter' in text:
-            return self._get_end_of_quarter(now)
-        elif 'year' in text:
-            return self._get_end_of_year(now)
-        return None
-    
-    def _get_end_of_month(self, now):
-        """Get end of current month"""
-        if now.month == 12:
-            end_date = datetime(now.year, 12, 31).date()
-        else:
-            end_date = (datetime(now.year, now.month + 1, 1) - timedelta(days=1)).date()
-        return self.DEFAULT_FROM_DATE, end_date
-    
-    def _get_end_of_quarter(self, now):
-        """Get end of current quarter"""
-        current_quarter = (now.month - 1) // 3 + 1
-        end_month = current_quarter * 3
-        if end_month == 12:
-            end_date = datetime(now.year, 12, 31).date()
-        else:
-            end_date = (datetime(now.year, end_month + 1, 1) - timedelta(days=1)).date()
-        return self.DEFAULT_FROM_DATE, end_date
-    
-    def _get_end_of_year(self, now):
-        """Get end of current year"""
-        return self.DEFAULT_FROM_DATE, datetime(now.year, 12, 31).date()
-    
-    def _get_last_week_period(self, text, now):
-        if 'week' in text:
-            # Last week: Monday to Sunday of previous week
-            days_since_monday = now.weekday()
-            this_monday = now - timedelta(days=days_since_monday)
-            last_monday = this_monday - timedelta(weeks=1)
-            last_sunday = last_monday + timedelta(days=6)
-            return last_monday.date(), last_sunday.date()
-        elif 'fortnight' in text:
-            start_date = now - timedelta(weeks=2)
-            return start_date.date(), now.date()
-        return None
-    
-    def _get_this_period(self, text, now):
-        yesterday = (now - timedelta(days=1)).date()
-        if 'week' in text:
-            # Start of current week (Monday)
-            days_since_monday = now.weekday()
-            start_date = now - timedelta(days=days_since_monday)
-            return start_date.date(), yesterday
-        elif 'month' in text:
-            return now.replace(day=1).date(), yesterday
-        elif 'year' in text:
-            return datetime(now.year, 1, 1).date(), yesterday
-        return None
-    
-    def _get_fy_range(self, match):
-        if not match:
-            return None
-        
-        year1_str = match.group(1)
-        year2_str = match.group(2) if match.lastindex >= 2 else None
-        
-        year1 = int(year1_str)
-        if year2_str:
-            year2 = int(year2_str)
-            # Handle 2-digit years
-            if year1 < 100:
-                year1 = 2000 + year1 if year1 <= 50 else 1900 + year1
-            if year2 < 100:
-                year2 = 2000 + year2 if year2 <= 50 else 1900 + year2
-            # For FY23-24, return Apr 2023 to Mar 2024
-            return datetime(year1, 4, 1).date(), datetime(year2, 3, 31).date()
-        else:
-            # Single year FY
-            return self._get_specific_fy(year1_str)
-
-    def parse_flexible_date(self, date_str: str) -> Optional[datetime]:
+    def parse_flexible_date(self, date_str: str, trace: Optional[ParseTrace] = None,
+                            now: Optional[datetime] = None) -> Optional[datetime]:
         """Advanced date parser with strict validation and year inference fixes"""
         if not date_str:
             return None
         
         date_str = date_str.strip().lower()
-        current_year = datetime.now().year
+        if now is None:
+            now = datetime.now()
+        current_year = now.year
         
         # Handle special cases first
         if date_str == 'today':
-            return datetime.now()
+            return now
         elif date_str == 'yesterday':
-            return datetime.now() - timedelta(days=1)
+            return now - timedelta(days=1)
         elif date_str == 'tomorrow':
-            return datetime.now() + timedelta(days=1)
+            return now + timedelta(days=1)
         
         # Method 1: Manual parsing for common formats with year validation
         manual_patterns = [
@@ -769,14 +697,20 @@ class IpruAIEmailParser:
                     continue
         
         # Method 2: dateparser with enhanced year validation
+        if trace is not None:
+            trace.dateparser_invoked = True
+        import dateparser
         # Extract explicit year first
         year_match = re.search(r'\b(20\d{2})\b', date_str)
         explicit_year = int(year_match.group(1)) if year_match else None
         
+        # dateparser caches a Settings object per distinct settings dict, so the base is the reference
+        # day at midnight (one entry per day) rather than the exact timestamp
+        reference_day = datetime.combine(now.date(), dt_time())
         settings_list = [
             {'DATE_ORDER': 'DMY', 'PREFER_DATES_FROM': 'future', 'RELATIVE_BASE': datetime(current_year, 1, 1)},
-            {'DATE_ORDER': 'MDY', 'PREFER_DATES_FROM': 'future'},
-            {'DATE_ORDER': 'DMY', 'STRICT_PARSING': False},
+            {'DATE_ORDER': 'MDY', 'PREFER_DATES_FROM': 'future', 'RELATIVE_BASE': reference_day},
+            {'DATE_ORDER': 'DMY', 'STRICT_PARSING': False, 'RELATIVE_BASE': reference_day},
         ]
         
         for settings in settings_list:
@@ -832,29 +766,61 @@ class IpruAIEmailParser:
         
         return min(100.0, base_confidence)
 
-    def parse_email(self, text: str) -> Dict[str, Any]:
-        """Main parsing function with ML fallback"""
+    def parse_email(self, text: str, debug_timings: bool = False,
+                    ml_threshold: Optional[float] = None, reference_date=None) -> Dict[str, Any]:
+        """Main parsing function with ML fallback (ml_threshold overrides the configured threshold for this call)
+        
+        Relative dates ("yesterday", "last quarter", the default to_date) resolve against `reference_date`
+        (a date, datetime or ISO string, e.g. an archived email's received date); it defaults to now and is
+        read once, so every date helper sees the same clock and results are replayable.
+        """
+        now = self.resolve_reference_date(reference_date)
+        # Stage timings are only collected on request so the default path stays untouched
+        trace = ParseTrace() if debug_timings else None
+        
         # Extract identifiers
         identifiers = self.extract_identifiers(text)
+        if trace is not None:
+            trace.lap("extract_identifiers")
         
         # Rule-based parsing
         pms_statements, aif_statements, stmt_confidence = self.match_statement_types(text)
-        from_date, to_date, date_confidence = self.extract_date_range(text)
+        if trace is not None:
+            trace.lap("match_statement_types")
+        from_date, to_date, date_confidence = self.extract_date_range(text, trace, now)
+        if trace is not None:
+            trace.lap("extract_date_range")
         
         has_identifiers = any(identifiers.values())
         overall_confidence = self.calculate_confidence(stmt_confidence, date_confidence, has_identifiers, identifiers)
+        if trace is not None:
+            trace.lap("calculate_confidence")
         
         parsing_method = "rule_based"
+        ml_invoked = False
         
         # Business logic validation and statement category determination
         statement_category = []
         all_statements = []
         
         # ML Enhancement if confidence is below threshold (enhance, don't replace)
-        ml_threshold = self.model_config.get("ml_fallback_threshold", 60.0)
-        if overall_confidence < ml_threshold and self.ml_model is not None:
+        # An explicit ml_threshold (e.g. from a threshold sweep) bypasses load-adaptive gating
+        ml_gate = self.ml_gate if ml_threshold is None else None
+        if ml_threshold is None:
+            ml_threshold = self.model_config.get("ml_fallback_threshold", 60.0)
+        rule_confidence = overall_confidence
+        ml_skipped = None
+        if overall_confidence < ml_threshold and self.ml_model is not None and ml_gate is not None:
+            ml_skipped = ml_gate.admit(overall_confidence, ml_threshold)
+            if ml_skipped:
+                logger.info(f"Rule-based confidence {overall_confidence:.2f} < {ml_threshold}, ML skipped ({ml_skipped})")
+        if overall_confidence < ml_threshold and self.ml_model is not None and ml_skipped is None:
             logger.info(f"Rule-based confidence {overall_confidence:.2f} < {ml_threshold}, enhancing with ML")
-            ml_result = self._ml_fallback_parse(text, identifiers)
+            ml_invoked = True
+            ml_started = time.perf_counter()
+            ml_result = self._ml_fallback_parse(text, identifiers, trace, now)
+            if ml_gate is not None:
+                ml_gate.record_ml((time.perf_counter() - ml_started) * 1000, ok=ml_result is not None)
             if ml_result:
                 # Enhance rule-based results with ML predictions
                 ml_pms = ml_result.get("pms_statements", [])
@@ -886,6 +852,8 @@ class IpruAIEmailParser:
                     overall_confidence = min(95.0, overall_confidence + confidence_boost)
                     parsing_method = "rule_based_ml_enhanced"
                     logger.info(f"ML enhanced confidence from {overall_confidence-confidence_boost:.2f} to {overall_confidence:.2f}")
+            if trace is not None:
+                trace.lap("ml_merge")
         has_aif_folio = len(identifiers["aif_folio"]) > 0
         has_pan = len(identifiers["pan_numbers"]) > 0
         has_di = len(identifiers["di_code"]) > 0
@@ -927,7 +895,7 @@ class IpruAIEmailParser:
                 all_statements = ["Portfolio_Appraisal"]
             logger.info(f"Applied default fallback: {all_statements}")
         
-        return {
+        result = {
             "statement_category": statement_category,
             "statement_types": all_statements,
             "aif_folio": identifiers["aif_folio"],
@@ -944,32 +912,56 @@ class IpruAIEmailParser:
                 "has_identifiers": has_identifiers,
                 "business_logic_applied": True,
                 "ml_fallback_used": parsing_method in ["ml_fallback", "rule_based_ml_enhanced"],
-                "ml_enhanced": parsing_method == "rule_based_ml_enhanced"
+                "ml_invoked": ml_invoked,
+                "ml_enhanced": parsing_method == "rule_based_ml_enhanced",
+                "rule_confidence": round(rule_confidence, 2),
+                "reference_date": str(now.date()),
+                "ml_skipped": ml_skipped
             },
             "raw_text": text
         }
+        
+        if trace is not None:
+            trace.lap("business_logic")
+            result["metadata"]["timings"] = trace.to_dict()
+        
+        return result
     
-    def _ml_fallback_parse(self, text: str, identifiers: Dict) -> Optional[Dict]:
+    def _ml_fallback_parse(self, text: str, identifiers: Dict, trace: Optional[ParseTrace] = None,
+                           now: Optional[datetime] = None) -> Optional[Dict]:
         """Production-ready ML fallback parsing when rule-based confidence is low"""
-        if not self.ml_model or not self.vectorizer:
+        ml_model, vectorizer = self._ml_components
+        if not ml_model or not vectorizer:
             logger.debug("ML model or vectorizer not available")
             return None
         
+        if trace is not None:
+            trace.ml_invoked = True
         try:
             # Enhanced feature extraction
-            features = self._extract_ml_features(text, identifiers)
-            X = self.vectorizer.transform([features])
+            X = self._vectorize_ml_features(vectorizer, text, identifiers, trace)
+            if trace is not None:
+                trace.lap("ml_vectorize")
             
             # Get predictions and probabilities
-            predictions = self.ml_model.predict(X)[0]
-            probabilities = self.ml_model.predict_proba(X)
+            forest = self._inference_forest(ml_model)
+            if forest is not None:
+                predictions, probabilities = forest.predict_with_proba(X)
+                predictions = predictions[0]
+            else:
+                predictions = ml_model.predict(X)[0]
+                probabilities = ml_model.predict_proba(X)
+            if trace is not None:
+                trace.lap("ml_predict")
             
             # Parse predictions with enhanced logic
             pms_statements = self._decode_statement_predictions(predictions[:10])  # First 10 for PMS
             aif_statements = self._decode_aif_predictions(predictions[10:11])     # Next 1 for AIF
             
             # Enhanced date prediction using rule-based as fallback
-            from_date, to_date = self._predict_dates_ml(text)
+            from_date, to_date = self._predict_dates_ml(text, now)
+            if trace is not None:
+                trace.lap("ml_dates")
             
             # Calculate ML confidence with multiple factors
             ml_confidence = self._calculate_ml_confidence(probabilities, predictions, identifiers)
@@ -992,14 +984,29 @@ class IpruAIEmailParser:
             logger.error(f"ML fallback failed: {e}")
             return None
     
-    def _extract_ml_features(self, text: str, identifiers: Dict) -> str:
-        """Enhanced feature extraction for ML model with comprehensive text analysis"""
+    def _vectorize_ml_features(self, vectorizer, text: str, identifiers: Dict, trace: Optional[ParseTrace] = None):
+        """One feature row: (text, tokens) straight into a featurizer that takes parts, a joined string otherwise"""
+        if getattr(vectorizer, "takes_parts", False):
+            return vectorizer.transform([self._extract_ml_feature_parts(text, identifiers, trace)])
+        return vectorizer.transform([self._extract_ml_features(text, identifiers, trace)])
+    
+    def _extract_ml_features(self, text: str, identifiers: Dict, trace: Optional[ParseTrace] = None,
+                             doc=None) -> str:
+        """Lowercased text followed by the synthetic feature tokens, as one string for TF-IDF/hashing"""
+        text_lower, features = self._extract_ml_feature_parts(text, identifiers, trace, doc)
+        return " ".join([text_lower, *features])
+    
+    def _extract_ml_feature_parts(self, text: str, identifiers: Dict, trace: Optional[ParseTrace] = None,
+                                  doc=None) -> Tuple[str, List[str]]:
+        """Enhanced feature extraction for ML model with comprehensive text analysis
+        
+        Returns the lowercased text and the synthetic tokens (identifier counts, request words,
+        length bucket, spaCy entities and POS tags). A spaCy doc already produced for this text
+        (e.g. by nlp.pipe) can be passed to skip the nlp() call.
+        """
         features = []
         text_lower = text.lower()
         
-        # Core text features
-        features.append(text_lower)
-        
         # Identifier features with counts
         pan_count = len(identifiers.get("pan_numbers", []))
         di_count = len(identifiers.get("di_code", []))
@@ -1034,10 +1041,16 @@ class IpruAIEmailParser:
         else:
             features.append("long_text")
         
+        if trace is not None:
+            trace.lap("ml_features")
+        
         # spaCy features with enhanced entity extraction
-        if self.nlp:
+        if self.nlp or doc is not None:
+            if trace is not None:
+                trace.spacy_invoked = True
             try:
-                doc = self.nlp(text)
+                if doc is None:
+                    doc = self.nlp(text)
                 entity_counts = {}
                 
                 for ent in doc.ents:
@@ -1054,8 +1067,26 @@ class IpruAIEmailParser:
                         
             except Exception as e:
                 logger.debug(f"spaCy processing failed: {e}")
+            if trace is not None:
+                trace.lap("spacy")
+        
+        return text_lower, features
+    
+    def _extract_ml_features_batch(self, texts: List[str], identifiers_list: List[Dict],
+                                   batch_size: int = 256, n_process: int = 1) -> List[Tuple[str, List[str]]]:
+        """_extract_ml_feature_parts for many texts with a single batched nlp.pipe pass"""
+        if not self.nlp:
+            return [self._extract_ml_feature_parts(text, identifiers)
+                    for text, identifiers in zip(texts, identifiers_list)]
         
-        return " ".join(features)
+        try:
+            docs = self.nlp.pipe(texts, batch_size=batch_size, n_process=n_process)
+            return [self._extract_ml_feature_parts(text, identifiers, doc=doc)
+                    for text, identifiers, doc in zip(texts, identifiers_list, docs)]
+        except Exception as e:
+            logger.warning(f"Batched spaCy processing failed, falling back to per-text: {e}")
+            return [self._extract_ml_feature_parts(text, identifiers)
+                    for text, identifiers in zip(texts, identifiers_list)]
     
     def _decode_statement_predictions(self, predictions) -> List[str]:
         """Decode PMS statement predictions with confidence thresholding"""
@@ -1068,15 +1099,17 @@ class IpruAIEmailParser:
         threshold = 0.3  # Lower threshold for ML fallback
         return ["AIF_Statement"] if predictions[0] > threshold else []
     
-    def _predict_dates_ml(self, text: str) -> Tuple[Optional[datetime], Optional[datetime]]:
+    def _predict_dates_ml(self, text: str, now: Optional[datetime] = None) -> Tuple[Optional[datetime], Optional[datetime]]:
         """Enhanced date prediction for ML fallback using rule-based extraction"""
+        if now is None:
+            now = datetime.now()
         # Use existing comprehensive date extraction
-        from_date, to_date, confidence = self.extract_date_range(text)
+        from_date, to_date, confidence = self.extract_date_range(text, now=now)
         
         # If no dates found, provide sensible defaults
         if not from_date or not to_date:
             from_date = self.DEFAULT_FROM_DATE
-            to_date = (datetime.now() - timedelta(days=1)).date()
+            to_date = (now - timedelta(days=1)).date()
         
         return from_date, to_date
     
@@ -1135,8 +1168,9 @@ class IpruAIEmailParser:
         
         return pms_statements, aif_statements
     
-    def generate_training_data(self, size: int = 1000) -> List[Dict]:
-        """Generate comprehensive synthetic training data covering all business scenarios"""
+    def generate_training_data(self, size: int = 1000, rng=None) -> List[Dict]:
+        """Generate comprehensive synthetic training data covering all business scenarios; pass a
+        seeded random.Random for a reproducible set that leaves the global random state alone"""
         training_data = []
         
         # Enhanced statement type templates with more variety
@@ -1231,6 +1265,7 @@ class IpruAIEmailParser:
         # Generate comprehensive samples
         import random
         from datetime import date, timedelta
+        rng = rng or random
         
         # Ensure balanced representation of all statement types
         pms_keys = list(self.statement_keywords["pms"].keys())
@@ -1247,50 +1282,50 @@ class IpruAIEmailParser:
                 guaranteed_samples[stmt_type] += 1
                 
                 if stmt_type == "AIF_Statement":
-                    template = random.choice(aif_templates)
+                    template = rng.choice(aif_templates)
                     statement_category = ["AIF"]
                     statement_types = ["AIF_Statement"]
                 else:
-                    template = random.choice(pms_templates)
+                    template = rng.choice(pms_templates)
                     statement_category = ["PMS"]
                     statement_types = [stmt_type]
             else:
                 # Then generate with normal distribution
-                if random.random() < 0.75:  # 75% PMS, 25% AIF
-                    template = random.choice(pms_templates)
+                if rng.random() < 0.75:  # 75% PMS, 25% AIF
+                    template = rng.choice(pms_templates)
                     statement_category = ["PMS"]
                     
                     # Sometimes generate multiple statement types for "all" requests
                     if "all" in template.lower() or "complete" in template.lower():
-                        if random.random() < 0.3:  # 30% chance for multiple statements
-                            statement_types = random.sample(pms_keys, random.randint(2, 4))
+                        if rng.random() < 0.3:  # 30% chance for multiple statements
+                            statement_types = rng.sample(pms_keys, rng.randint(2, 4))
                         else:
-                            statement_types = [random.choice(pms_keys)]
+                            statement_types = [rng.choice(pms_keys)]
                     else:
-                        statement_types = [random.choice(pms_keys)]
+                        statement_types = [rng.choice(pms_keys)]
                 else:
-                    template = random.choice(aif_templates)
+                    template = rng.choice(aif_templates)
                     statement_category = ["AIF"]
                     statement_types = ["AIF_Statement"]
             
             # Generate realistic identifiers
-            pan = self._generate_pan()
-            di_code = self._generate_di_code()
-            account = f"{random.randint(10000000, 99999999)}"
-            aif_folio = f"{random.choice([5,6,7,8,9])}{random.randint(100000000, 999999999)}"
+            pan = self._generate_pan(rng)
+            di_code = self._generate_di_code(rng)
+            account = f"{rng.randint(10000000, 99999999)}"
+            aif_folio = f"{rng.choice([5,6,7,8,9])}{rng.randint(100000000, 999999999)}"
             
             # Generate varied date ranges
-            base_date = date.today() - timedelta(days=random.randint(1, 730))  # Up to 2 years back
-            from_date = base_date - timedelta(days=random.randint(30, 365))
+            base_date = date.today() - timedelta(days=rng.randint(1, 730))  # Up to 2 years back
+            from_date = base_date - timedelta(days=rng.randint(30, 365))
             to_date = base_date
             
             # Choose date format randomly
-            date_format = random.choice(date_formats)
+            date_format = rng.choice(date_formats)
             
             # Sometimes use period expressions instead of specific dates
-            if random.random() < 0.3 and "{date}" in template:
+            if rng.random() < 0.3 and "{date}" in template:
                 # Replace date with period expression
-                period_expr = random.choice(period_expressions)
+                period_expr = rng.choice(period_expressions)
                 template = template.replace("as on {date}", f"for {period_expr}")
                 template = template.replace("for {date}", f"for {period_expr}")
                 
@@ -1316,12 +1351,12 @@ class IpruAIEmailParser:
                 )
             
             # Add some natural variations
-            if random.random() < 0.1:  # 10% chance to add extra words
+            if rng.random() < 0.1:  # 10% chance to add extra words
                 variations = ["Thanks", "Regards", "Please confirm", "Urgent", "ASAP"]
-                text += f" {random.choice(variations)}"
+                text += f" {rng.choice(variations)}"
             
             # Add some typos occasionally for robustness
-            if random.random() < 0.05:  # 5% chance for minor typos
+            if rng.random() < 0.05:  # 5% chance for minor typos
                 typos = {
                     "statement": "statment",
                     "please": "plz",
@@ -1329,7 +1364,7 @@ class IpruAIEmailParser:
                     "required": "requird"
                 }
                 for correct, typo in typos.items():
-                    if correct in text.lower() and random.random() < 0.5:
+                    if correct in text.lower() and rng.random() < 0.5:
                         text = text.replace(correct, typo)
                         break
             
@@ -1343,7 +1378,7 @@ class IpruAIEmailParser:
                 confidence += 2  # Boost for single clear statement type
             
             # Add some randomness
-            confidence += random.uniform(-3, 5)
+            confidence += rng.uniform(-3, 5)
             confidence = min(98.0, max(80.0, confidence))
             
             training_data.append({
@@ -1456,35 +1491,37 @@ class IpruAIEmailParser:
         logger.info(f"Training data validation complete: {len(validated_data)} valid samples")
         return validated_data
     
-    def _generate_pan(self) -> str:
+    def _generate_pan(self, rng=None) -> str:
         """Generate realistic PAN format following actual patterns"""
         import random
         import string
+        rng = rng or random
         
         # First 3 letters often follow patterns (company/person type)
         first_patterns = ['ABC', 'DEF', 'GHI', 'JKL', 'MNO', 'PQR', 'STU', 'VWX', 'YZA']
-        first_three = random.choice(first_patterns)
+        first_three = rng.choice(first_patterns)
         
         # Next 2 letters
-        next_two = ''.join(random.choices(string.ascii_uppercase, k=2))
+        next_two = ''.join(rng.choices(string.ascii_uppercase, k=2))
         
         # 4 digits
-        digits = ''.join(random.choices(string.digits, k=4))
+        digits = ''.join(rng.choices(string.digits, k=4))
         
         # Last letter (check digit)
-        last_letter = random.choice(string.ascii_uppercase)
+        last_letter = rng.choice(string.ascii_uppercase)
         
         return f"{first_three}{next_two}{digits}{last_letter}"
     
-    def _generate_di_code(self) -> str:
+    def _generate_di_code(self, rng=None) -> str:
         """Generate realistic DI code format"""
         import random
         import string
+        rng = rng or random
         
         # DI codes can be D followed by 7 alphanumeric or DI followed by 6
-        if random.random() < 0.7:  # 70% D + 7 chars
-            code = 'D' + ''.join(random.choices(string.digits + string.ascii_uppercase, k=7))
+        if rng.random() < 0.7:  # 70% D + 7 chars
+            code = 'D' + ''.join(rng.choices(string.digits + string.ascii_uppercase, k=7))
         else:  # 30% DI + 6 chars
-            code = 'DI' + ''.join(random.choices(string.digits + string.ascii_uppercase, k=6))
+            code = 'DI' + ''.join(rng.choices(string.digits + string.ascii_uppercase, k=6))
         
         return code
\ No newline at end of file
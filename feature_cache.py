@@ -0,0 +1,109 @@
+"""
+Content-addressed on-disk cache of training features
+Feature strings and labels are keyed on the corpus hash, ML_FEATURE_VERSION and the spaCy
+model; the fitted vectorizer and sparse X are additionally keyed on the vectorizer params,
+so repeat trainings and hyperparameter sweeps skip generation-side work and go straight to fitting
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import joblib
+import numpy as np
+import scipy.sparse
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = 'cache/features'
+
+
+def _digest(payload: Any) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:16]
+
+
+class FeatureCache:
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR):
+        self.cache_dir = cache_dir
+
+    @staticmethod
+    def corpus_hash(texts: List[str], label_rows: List[Any]) -> str:
+        """Hash of every training text and its labels, in order"""
+        digest = hashlib.sha256()
+        for text, labels in zip(texts, label_rows):
+            digest.update(text.encode('utf-8'))
+            digest.update(b"\0")
+            digest.update(json.dumps(labels, sort_keys=True).encode('utf-8'))
+            digest.update(b"\n")
+        return digest.hexdigest()
+
+    @staticmethod
+    def feature_key(corpus_hash: str, feature_version: int, spacy_model: Optional[str],
+                    label_names: List[str], regex_patterns: Dict[str, Any],
+                    spacy_version: Optional[str] = None) -> str:
+        """The identifier tokens come from the regex config and the entity tokens from the installed
+        spaCy model, so both are part of the key along with the corpus and feature code version"""
+        return _digest({"corpus": corpus_hash, "feature_version": feature_version,
+                        "spacy_model": spacy_model, "spacy_version": spacy_version, "labels": label_names,
+                        "regex_patterns": _digest(regex_patterns)})
+
+    @staticmethod
+    def matrix_key(vectorizer_params: Dict[str, Any]) -> str:
+        return _digest(vectorizer_params)
+
+    def _entry_dir(self, feature_key: str) -> str:
+        return os.path.join(self.cache_dir, feature_key)
+
+    def load_features(self, feature_key: str) -> Optional[Tuple[List[str], np.ndarray]]:
+        entry = self._entry_dir(feature_key)
+        features_path = os.path.join(entry, "features.json.gz")
+        labels_path = os.path.join(entry, "labels.npy")
+        if not (os.path.exists(features_path) and os.path.exists(labels_path)):
+            return None
+        with gzip.open(features_path, 'rt', encoding='utf-8') as f:
+            features = json.load(f)
+        labels = np.load(labels_path)
+        logger.info(f"♻️  Feature cache hit {feature_key}: {len(features)} samples")
+        return features, labels
+
+    def store_features(self, feature_key: str, features: List[str], labels: np.ndarray, meta: Dict[str, Any]):
+        entry = self._entry_dir(feature_key)
+        os.makedirs(entry, exist_ok=True)
+        # Write to temp names and rename so an interrupted run never leaves a half-written entry
+        features_path = os.path.join(entry, "features.json.gz")
+        with gzip.open(features_path + ".tmp", 'wt', encoding='utf-8') as f:
+            json.dump(features, f)
+        with open(os.path.join(entry, "labels.tmp.npy"), 'wb') as f:
+            np.save(f, labels)
+        os.replace(features_path + ".tmp", features_path)
+        os.replace(os.path.join(entry, "labels.tmp.npy"), os.path.join(entry, "labels.npy"))
+        with open(os.path.join(entry, "meta.json"), 'w') as f:
+            json.dump({**meta, "samples": len(features), "created_at": datetime.now().isoformat()}, f, indent=2)
+        logger.info(f"💾 Cached features {feature_key}: {len(features)} samples")
+
+    def load_matrix(self, feature_key: str, matrix_key: str):
+        """(fitted vectorizer, sparse X) for these features and vectorizer params, or None"""
+        entry = self._entry_dir(feature_key)
+        x_path = os.path.join(entry, f"X_{matrix_key}.npz")
+        vectorizer_path = os.path.join(entry, f"vectorizer_{matrix_key}.joblib")
+        if not (os.path.exists(x_path) and os.path.exists(vectorizer_path)):
+            return None
+        X = scipy.sparse.load_npz(x_path)
+        vectorizer = joblib.load(vectorizer_path)
+        logger.info(f"♻️  Matrix cache hit {feature_key}/{matrix_key}: {X.shape}")
+        return vectorizer, X
+
+    def store_matrix(self, feature_key: str, matrix_key: str, vectorizer, X):
+        entry = self._entry_dir(feature_key)
+        os.makedirs(entry, exist_ok=True)
+        x_path = os.path.join(entry, f"X_{matrix_key}.npz")
+        vectorizer_path = os.path.join(entry, f"vectorizer_{matrix_key}.joblib")
+        scipy.sparse.save_npz(x_path + ".tmp.npz", scipy.sparse.csr_matrix(X))
+        joblib.dump(vectorizer, vectorizer_path + ".tmp")
+        os.replace(x_path + ".tmp.npz", x_path)
+        os.replace(vectorizer_path + ".tmp", vectorizer_path)
+        logger.info(f"💾 Cached matrix {feature_key}/{matrix_key}: {X.shape}")
@@ -0,0 +1,375 @@
+"""
+Text featurizers for the ML fallback
+HashingFeaturizer replaces the fitted TfidfVectorizer: n-grams are hashed into a fixed
+number of columns, so there is no vocabulary_ or stop_words_ to pickle and load; the only
+fitted state is an optional dense IDF array.
+StructuredFeaturizer takes the email text and the synthetic indicator tokens separately
+(see IpruAIEmailParser._extract_ml_feature_parts) and writes their columns straight into a
+CSR row, instead of joining them into one string for a vectorizer to re-tokenize.
+CompactVectorizer is an inference-only export of a fitted TfidfVectorizer or
+StructuredFeaturizer: the n-gram vocabulary in a memory-mapped marisa trie and the
+column/IDF arrays in memory-mappable .npy files, without the pickled stop_words_ set
+"""
+
+import hashlib
+import json
+import os
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+import marisa_trie
+import numpy as np
+import scipy.sparse
+from sklearn.feature_extraction.text import CountVectorizer, HashingVectorizer
+from sklearn.preprocessing import normalize
+
+FEATURIZER_TYPES = ("tfidf", "hashing", "structured")
+HASHING_PARAMS_FILE = "featurizer.json"
+HASHING_IDF_FILE = "idf.npy"
+COMPACT_PARAMS_FILE = "vocabulary.json"
+COMPACT_TRIE_FILE = "vocabulary.marisa"
+COMPACT_COLUMNS_FILE = "vocabulary_columns.npy"
+COMPACT_IDF_FILE = "vocabulary_idf.npy"
+COMPACT_FILES = (COMPACT_PARAMS_FILE, COMPACT_TRIE_FILE, COMPACT_COLUMNS_FILE, COMPACT_IDF_FILE)
+
+
+class HashingFeaturizer:
+    """TF-IDF over hashed 1-4 grams with the same tokenization, stop words and sublinear tf as the
+    TfidfVectorizer; min_df/max_df pruning is reproduced by zeroing those columns' IDF weights"""
+
+    def __init__(self, n_features: int = 2 ** 18, ngram_range: Tuple[int, int] = (1, 4),
+                 stop_words: str = 'english', min_df: int = 2, max_df: float = 0.95,
+                 sublinear_tf: bool = True, use_idf: bool = True):
+        self.n_features = n_features
+        self.ngram_range = tuple(ngram_range)
+        self.stop_words = stop_words
+        self.min_df = min_df
+        self.max_df = max_df
+        self.sublinear_tf = sublinear_tf
+        self.use_idf = use_idf
+        self.idf_ = None
+        self._hasher = self._build_hasher()
+
+    def _build_hasher(self) -> HashingVectorizer:
+        return HashingVectorizer(n_features=self.n_features, ngram_range=self.ngram_range,
+                                 stop_words=self.stop_words, alternate_sign=False, norm=None,
+                                 dtype=np.float32)
+
+    def get_params(self, deep: bool = True) -> Dict[str, Any]:
+        return {
+            "n_features": self.n_features,
+            "ngram_range": list(self.ngram_range),
+            "stop_words": self.stop_words,
+            "min_df": self.min_df,
+            "max_df": self.max_df,
+            "sublinear_tf": self.sublinear_tf,
+            "use_idf": self.use_idf
+        }
+
+    def fit(self, texts: List[str]) -> "HashingFeaturizer":
+        counts = self._hasher.transform(texts).tocsc()
+        n_docs = counts.shape[0]
+        df = np.diff(counts.indptr).astype(np.float64)
+        if self.use_idf:
+            # sklearn's smooth idf: ln((1 + n) / (1 + df)) + 1
+            idf = np.log((1.0 + n_docs) / (1.0 + df)) + 1.0
+        else:
+            idf = np.ones(self.n_features)
+        max_doc_count = self.max_df if isinstance(self.max_df, int) else self.max_df * n_docs
+        min_doc_count = self.min_df if isinstance(self.min_df, int) else self.min_df * n_docs
+        idf[(df < min_doc_count) | (df > max_doc_count)] = 0.0
+        self.idf_ = idf.astype(np.float32)
+        return self
+
+    def transform(self, texts: List[str]) -> scipy.sparse.csr_matrix:
+        X = self._hasher.transform(texts).tocsr()
+        if self.sublinear_tf:
+            np.log(X.data, out=X.data)
+            X.data += 1.0
+        if self.idf_ is not None:
+            X = X.multiply(self.idf_).tocsr()
+            X.eliminate_zeros()
+        return normalize(X, norm='l2', copy=False)
+
+    def fit_transform(self, texts: List[str]) -> scipy.sparse.csr_matrix:
+        return self.fit(texts).transform(texts)
+
+    def save(self, directory: str):
+        """Params as JSON and the IDF weights as a raw .npy (memory-mappable)"""
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, HASHING_PARAMS_FILE), 'w') as f:
+            json.dump(self.get_params(), f, indent=2)
+        if self.idf_ is not None:
+            np.save(os.path.join(directory, HASHING_IDF_FILE), self.idf_)
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> "HashingFeaturizer":
+        with open(os.path.join(directory, HASHING_PARAMS_FILE), 'r') as f:
+            featurizer = cls(**json.load(f))
+        idf_path = os.path.join(directory, HASHING_IDF_FILE)
+        if os.path.exists(idf_path):
+            featurizer.idf_ = np.load(idf_path, mmap_mode='r' if mmap else None)
+        return featurizer
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("_hasher", None)
+        if state.get("idf_") is not None:
+            state["idf_"] = np.asarray(state["idf_"])
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._hasher = self._build_hasher()
+
+
+def join_feature_parts(parts: Iterable[Tuple[str, Sequence[str]]]) -> List[str]:
+    """(text, tokens) pairs as the single strings the TF-IDF and hashing featurizers take"""
+    return [" ".join([text, *tokens]) for text, tokens in parts]
+
+
+class StructuredFeaturizer:
+    """TF-IDF over (text, indicator tokens) pairs: 1-4 grams of the text with the TfidfVectorizer's
+    tokenization, stop words and vocabulary pruning, plus one column per indicator token
+    (has_pan_1, entity_date_2, long_text, ...) that never takes part in an n-gram"""
+
+    takes_parts = True
+
+    def __init__(self, max_features: int = 8000, ngram_range: Tuple[int, int] = (1, 4),
+                 stop_words: str = 'english', min_df: int = 2, max_df: float = 0.95,
+                 sublinear_tf: bool = True):
+        self.max_features = max_features
+        self.ngram_range = tuple(ngram_range)
+        self.stop_words = stop_words
+        self.min_df = min_df
+        self.max_df = max_df
+        self.sublinear_tf = sublinear_tf
+        self.vocabulary_ = None
+        self.token_vocabulary_ = None
+        self.idf_ = None
+        self._analyzer = self._build_analyzer()
+
+    def _build_counter(self) -> CountVectorizer:
+        return CountVectorizer(max_features=self.max_features, ngram_range=self.ngram_range,
+                               stop_words=self.stop_words, min_df=self.min_df, max_df=self.max_df)
+
+    def _build_analyzer(self):
+        return self._build_counter().build_analyzer()
+
+    def get_params(self, deep: bool = True) -> Dict[str, Any]:
+        return {
+            "max_features": self.max_features,
+            "ngram_range": list(self.ngram_range),
+            "stop_words": self.stop_words,
+            "min_df": self.min_df,
+            "max_df": self.max_df,
+            "sublinear_tf": self.sublinear_tf
+        }
+
+    @property
+    def n_features(self) -> int:
+        return len(self.vocabulary_) + len(self.token_vocabulary_)
+
+    def get_feature_names_out(self) -> np.ndarray:
+        names = sorted(self.vocabulary_, key=self.vocabulary_.get) + sorted(
+            self.token_vocabulary_, key=self.token_vocabulary_.get)
+        return np.asarray(names, dtype=object)
+
+    def fit(self, parts: Sequence[Tuple[str, Sequence[str]]]) -> "StructuredFeaturizer":
+        counter = self._build_counter()
+        text_counts = counter.fit_transform([text for text, _ in parts]).tocsc()
+        self.vocabulary_ = {term: int(column) for term, column in counter.vocabulary_.items()}
+        token_df: Dict[str, int] = {}
+        for _, tokens in parts:
+            for token in set(tokens):
+                token_df[token] = token_df.get(token, 0) + 1
+        tokens = sorted(token_df)
+        self.token_vocabulary_ = {token: len(self.vocabulary_) + i for i, token in enumerate(tokens)}
+
+        df = np.concatenate([np.diff(text_counts.indptr), [token_df[token] for token in tokens]]).astype(np.float64)
+        # sklearn's smooth idf: ln((1 + n) / (1 + df)) + 1
+        self.idf_ = np.log((1.0 + len(parts)) / (1.0 + df)) + 1.0
+        return self
+
+    def transform(self, parts: Sequence[Tuple[str, Sequence[str]]]) -> scipy.sparse.csr_matrix:
+        vocabulary, token_vocabulary, analyze = self.vocabulary_, self.token_vocabulary_, self._analyzer
+        indptr, indices, data = [0], [], []
+        for text, tokens in parts:
+            counts: Dict[int, int] = {}
+            for term in analyze(text):
+                column = vocabulary.get(term)
+                if column is not None:
+                    counts[column] = counts.get(column, 0) + 1
+            for token in tokens:
+                column = token_vocabulary.get(token)
+                if column is not None:
+                    counts[column] = counts.get(column, 0) + 1
+            indices.extend(counts)
+            data.extend(counts.values())
+            indptr.append(len(indices))
+
+        indices = np.asarray(indices, dtype=np.int32)
+        data = np.asarray(data, dtype=np.float64)
+        if self.sublinear_tf:
+            np.log(data, out=data)
+            data += 1.0
+        data *= self.idf_[indices]
+        X = scipy.sparse.csr_matrix((data, indices, np.asarray(indptr, dtype=np.int32)),
+                                    shape=(len(parts), self.n_features))
+        X.sort_indices()
+        return normalize(X, norm='l2', copy=False)
+
+    def fit_transform(self, parts: Sequence[Tuple[str, Sequence[str]]]) -> scipy.sparse.csr_matrix:
+        return self.fit(parts).transform(parts)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("_analyzer", None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._analyzer = self._build_analyzer()
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_fingerprint(path: str) -> Dict[str, int]:
+    """Size and mtime of a file: a stat() instead of reading it"""
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+class CompactVectorizer:
+    """Inference-only TF-IDF transform over an exported vocabulary
+
+    N-grams are looked up in a marisa trie whose ids map to the original columns through
+    `columns`; indicator tokens of a StructuredFeaturizer export keep a small dict. Loaded with
+    mmap, the trie and arrays are read-only pages shared by every process using the same files.
+    """
+
+    def __init__(self, params: Dict[str, Any], trie: marisa_trie.Trie, columns: np.ndarray, idf: np.ndarray):
+        self.params = params
+        self.trie = trie
+        self.columns = columns
+        self.idf_ = idf
+        self.token_vocabulary_ = params.get("tokens") or {}
+        self.takes_parts = params["structured"]
+        self.n_features = params["n_features"]
+        self._analyzer = CountVectorizer(**params["analyzer"]).build_analyzer()
+
+    @staticmethod
+    def export(vectorizer, directory: str, source_path: str = None) -> Dict[str, Any]:
+        """Write the trie, column map, IDF weights and params of a fitted TfidfVectorizer or StructuredFeaturizer
+
+        `source_path` is the pickle `vectorizer` came from; its sha256 and stat fingerprint are recorded
+        so load() can tell whether the export still matches it.
+        """
+        structured = isinstance(vectorizer, StructuredFeaturizer)
+        if structured:
+            analyzer = {"ngram_range": list(vectorizer.ngram_range), "stop_words": vectorizer.stop_words}
+            tfidf = {"sublinear_tf": vectorizer.sublinear_tf, "norm": "l2", "binary": False}
+            tokens = vectorizer.token_vocabulary_
+        else:
+            if vectorizer.analyzer != 'word' or any(callable(getattr(vectorizer, name)) for name in
+                                                    ("tokenizer", "preprocessor", "stop_words")):
+                raise ValueError("Only word analyzers without custom callables can be exported")
+            stop_words = vectorizer.stop_words
+            analyzer = {
+                "ngram_range": list(vectorizer.ngram_range),
+                "stop_words": stop_words if stop_words is None or isinstance(stop_words, str) else sorted(stop_words),
+                "lowercase": vectorizer.lowercase,
+                "strip_accents": vectorizer.strip_accents,
+                "token_pattern": vectorizer.token_pattern
+            }
+            tfidf = {"sublinear_tf": vectorizer.sublinear_tf, "norm": vectorizer.norm, "binary": vectorizer.binary}
+            tokens = {}
+        terms = list(vectorizer.vocabulary_)
+        trie = marisa_trie.Trie(terms)
+        columns = np.empty(len(terms), dtype=np.int32)
+        for term in terms:
+            columns[trie[term]] = vectorizer.vocabulary_[term]
+        n_features = len(vectorizer.vocabulary_) + len(tokens)
+        idf = np.asarray(vectorizer.idf_, dtype=np.float64) if getattr(vectorizer, "use_idf", True) \
+            else np.ones(n_features)
+
+        params = {"structured": structured, "n_features": n_features, "analyzer": analyzer, **tfidf,
+                  "tokens": {token: int(column) for token, column in tokens.items()},
+                  "source": type(vectorizer).__name__,
+                  "source_sha256": file_sha256(source_path) if source_path else None,
+                  "source_fingerprint": file_fingerprint(source_path) if source_path else None}
+        os.makedirs(directory, exist_ok=True)
+        trie.save(os.path.join(directory, COMPACT_TRIE_FILE))
+        np.save(os.path.join(directory, COMPACT_COLUMNS_FILE), columns)
+        np.save(os.path.join(directory, COMPACT_IDF_FILE), idf)
+        # Params last: its presence marks a complete export
+        with open(os.path.join(directory, COMPACT_PARAMS_FILE), 'w') as f:
+            json.dump(params, f, indent=2)
+        return params
+
+    @staticmethod
+    def exists(directory: str) -> bool:
+        return all(os.path.exists(os.path.join(directory, name)) for name in COMPACT_FILES)
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True, source_path: str = None) -> "CompactVectorizer":
+        """Load an export; ValueError when `source_path` is not the vectorizer it was exported from
+
+        An unchanged size and mtime is a match without reading the pickle; the sha256 is only
+        compared when they differ (e.g. a copied model directory).
+        """
+        with open(os.path.join(directory, COMPACT_PARAMS_FILE), 'r') as f:
+            params = json.load(f)
+        if source_path and os.path.exists(source_path) and \
+                params.get("source_fingerprint") != file_fingerprint(source_path) and \
+                params.get("source_sha256") != file_sha256(source_path):
+            raise ValueError(f"{COMPACT_PARAMS_FILE} was exported from a different {os.path.basename(source_path)}")
+        trie = marisa_trie.Trie()
+        if mmap:
+            trie.mmap(os.path.join(directory, COMPACT_TRIE_FILE))
+        else:
+            trie.load(os.path.join(directory, COMPACT_TRIE_FILE))
+        mode = 'r' if mmap else None
+        return cls(params, trie, np.load(os.path.join(directory, COMPACT_COLUMNS_FILE), mmap_mode=mode),
+                   np.load(os.path.join(directory, COMPACT_IDF_FILE), mmap_mode=mode))
+
+    def transform(self, docs: Sequence) -> scipy.sparse.csr_matrix:
+        """Strings for a TfidfVectorizer export, (text, tokens) pairs for a StructuredFeaturizer export"""
+        get, analyze, token_vocabulary = self.trie.get, self._analyzer, self.token_vocabulary_
+        indptr, indices, data = [0], [], []
+        for doc in docs:
+            text, tokens = doc if self.takes_parts else (doc, ())
+            counts: Dict[int, int] = {}
+            for term in analyze(text):
+                term_id = get(term)
+                if term_id is not None:
+                    counts[term_id] = counts.get(term_id, 0) + 1
+            if counts:
+                indices.extend(self.columns[list(counts)].tolist())
+                data.extend(counts.values())
+            token_counts: Dict[int, int] = {}
+            for token in tokens:
+                column = token_vocabulary.get(token)
+                if column is not None:
+                    token_counts[column] = token_counts.get(column, 0) + 1
+            indices.extend(token_counts)
+            data.extend(token_counts.values())
+            indptr.append(len(indices))
+
+        indices = np.asarray(indices, dtype=np.int32)
+        data = np.asarray(data, dtype=np.float64)
+        if self.params["binary"]:
+            data[:] = 1.0
+        if self.params["sublinear_tf"]:
+            np.log(data, out=data)
+            data += 1.0
+        data *= self.idf_[indices]
+        X = scipy.sparse.csr_matrix((data, indices, np.asarray(indptr, dtype=np.int32)),
+                                    shape=(len(docs), self.n_features))
+        X.sort_indices()
+        return normalize(X, norm=self.params["norm"], copy=False) if self.params["norm"] else X
@@ -0,0 +1,342 @@
+"""
+Vectorized financial calendar
+Resolves a period expression ("current_fy", "last_quarter", "last_n", ...) for an array of
+reference days in one call with numpy datetime64[D] arithmetic. Every period returns
+(from, to, valid): two datetime64[D] arrays and a mask that is False wherever the scalar
+datetime arithmetic raised (e.g. the 31st of a 30-day month in "last quarter" via
+_get_last_period, or a range outside years 1-9999); masked entries are NaT
+"""
+
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+DAY = 'datetime64[D]'
+MONTH = 'datetime64[M]'
+MIN_DAY = np.datetime64('0001-01-01', 'D')
+MAX_DAY = np.datetime64('9999-12-31', 'D')
+NAT = np.datetime64('NaT', 'D')
+# Longest span timedelta accepts; larger "last N ..." counts raise in the scalar code
+MAX_SPAN = 999999999
+
+Resolved = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+def _parts(days: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    months = days.astype(MONTH)
+    year = months.astype(np.int64) // 12 + 1970
+    month = months.astype(np.int64) % 12 + 1
+    day = (days - months.astype(DAY)).astype(np.int64) + 1
+    return year, month, day
+
+
+def _month_start(year, month) -> np.ndarray:
+    return ((np.asarray(year, np.int64) - 1970) * 12 + np.asarray(month, np.int64) - 1).astype(MONTH)
+
+
+def _month_length(year, month) -> np.ndarray:
+    start = _month_start(year, month)
+    return ((start + 1).astype(DAY) - start.astype(DAY)).astype(np.int64)
+
+
+def _date(year, month, day) -> Tuple[np.ndarray, np.ndarray]:
+    """datetime64[D] for year/month/day arrays and where datetime(year, month, day) would accept them"""
+    year, month, day = np.broadcast_arrays(np.asarray(year, np.int64), np.asarray(month, np.int64),
+                                           np.asarray(day, np.int64))
+    valid = (year >= 1) & (year <= 9999) & (day >= 1) & (day <= _month_length(year, month))
+    return _month_start(year, month).astype(DAY) + (day - 1), valid
+
+
+def _in_range(days: np.ndarray) -> np.ndarray:
+    return (days >= MIN_DAY) & (days <= MAX_DAY)
+
+
+def _weekday(days: np.ndarray) -> np.ndarray:
+    # 1970-01-01 was a Thursday; Monday is 0 as in datetime.weekday()
+    return (days.astype(np.int64) + 3) % 7
+
+
+def _quarter_start_month(month: np.ndarray) -> np.ndarray:
+    return (month - 1) // 3 * 3 + 1
+
+
+def _full_year(year: int) -> int:
+    if year < 100:
+        year = 2000 + year if year <= 50 else 1900 + year
+    return year
+
+
+def _minus_months(days: np.ndarray, n_months: int) -> Tuple[np.ndarray, np.ndarray]:
+    """days - relativedelta(months=n_months): same day of month, clipped to the target month's length"""
+    year, month, day = _parts(days)
+    total = year * 12 + (month - 1) - n_months
+    target_year, target_month = total // 12, total % 12 + 1
+    valid = (target_year >= 1) & (target_year <= 9999)
+    safe_year = np.where(valid, target_year, 2000)
+    clipped = np.minimum(day, _month_length(safe_year, target_month))
+    result, _ = _date(safe_year, target_month, clipped)
+    return result, valid
+
+
+class FinancialCalendar:
+    """Period boundaries for arrays of reference days; end-of-period ranges start at default_from_date"""
+
+    def __init__(self, default_from_date: date = date(1990, 1, 1)):
+        self.DEFAULT_FROM_DATE = default_from_date
+        self.default_from = np.datetime64(default_from_date, 'D')
+        self.periods: Dict[str, Callable[..., Resolved]] = {
+            "current_fy": self.current_fy,
+            "last_fy": self.last_fy,
+            "next_fy": self.next_fy,
+            "specific_fy": self.specific_fy,
+            "fy_range": self.fy_range,
+            "current_period": self.current_period,
+            "last_period": self.last_period,
+            "ytd": self.ytd,
+            "mtd": self.mtd,
+            "qtd": self.qtd,
+            "wtd": self.wtd,
+            "yesterday": self.yesterday,
+            "today": self.today,
+            "tomorrow": self.tomorrow,
+            "last_n": self.last_n,
+            "last_week": self.last_week,
+            "this_period": self.this_period,
+            "quarter": self.quarter,
+            "last_quarter": self.last_quarter,
+            "current_quarter": self.current_quarter,
+            "half_year": self.half_year,
+            "end_of_period": self.end_of_period,
+            "end_of_month": self.end_of_month,
+            "end_of_quarter": self.end_of_quarter,
+            "end_of_year": self.end_of_year
+        }
+
+    def resolve(self, period: str, days, param: Any = None) -> Resolved:
+        """(from, to, valid) of `period` for every reference day in `days`"""
+        days = np.asarray(days, dtype=DAY)
+        start, end, valid = self.periods[period](days, param)
+        start, end = np.broadcast_to(start, days.shape), np.broadcast_to(end, days.shape)
+        valid = np.broadcast_to(valid, days.shape) & _in_range(start) & _in_range(end)
+        return np.where(valid, start, NAT), np.where(valid, end, NAT), valid
+
+    def resolve_one(self, period: str, now: Optional[datetime] = None,
+                    param: Any = None) -> Optional[Tuple[date, date]]:
+        """Scalar form: (from_date, to_date) as datetime.date, or None where the range does not exist"""
+        day = np.datetime64(now.date() if isinstance(now, datetime) else (now or '1970-01-01'), 'D')
+        start, end, valid = self.resolve(period, np.array([day]), param)
+        if not valid[0]:
+            return None
+        return start[0].item(), end[0].item()
+
+    def _invalid(self, days: np.ndarray) -> Resolved:
+        return days, days, np.zeros(days.shape, dtype=bool)
+
+    # Financial years (Apr-Mar)
+
+    def _fy(self, start_year) -> Resolved:
+        start, start_ok = _date(start_year, 4, 1)
+        end, end_ok = _date(np.asarray(start_year) + 1, 3, 31)
+        return start, end, start_ok & end_ok
+
+    def current_fy(self, days, param=None) -> Resolved:
+        year, month, _ = _parts(days)
+        return self._fy(np.where(month >= 4, year, year - 1))
+
+    def last_fy(self, days, param=None) -> Resolved:
+        year, month, _ = _parts(days)
+        return self._fy(np.where(month >= 4, year - 1, year - 2))
+
+    def next_fy(self, days, param=None) -> Resolved:
+        year, month, _ = _parts(days)
+        return self._fy(np.where(month >= 4, year + 1, year))
+
+    def specific_fy(self, days, year_str) -> Resolved:
+        # For FY24, return FY24-25 (Apr 2024 to Mar 2025)
+        return self._fy(_full_year(int(year_str)))
+
+    def fy_range(self, days, years) -> Resolved:
+        if not years:
+            return self._invalid(days)
+        year1_str, year2_str = years
+        if not year2_str:
+            return self.specific_fy(days, year1_str)
+        # For FY23-24, return Apr 2023 to Mar 2024
+        start, start_ok = _date(_full_year(int(year1_str)), 4, 1)
+        end, end_ok = _date(_full_year(int(year2_str)), 3, 31)
+        return start, end, start_ok & end_ok
+
+    # Calendar periods
+
+    def current_period(self, days, period) -> Resolved:
+        year, month, _ = _parts(days)
+        yesterday = days - 1
+        if period == 'year':
+            start, valid = _date(year, 1, 1)
+        elif period == 'month':
+            start, valid = days.astype(MONTH).astype(DAY), True
+        elif period == 'quarter':
+            start, valid = _date(year, _quarter_start_month(month), 1)
+        else:
+            return self._invalid(days)
+        return start, yesterday, valid & _in_range(yesterday)
+
+    def last_period(self, days, period) -> Resolved:
+        year, month, _ = _parts(days)
+        if period == 'year':
+            start, start_ok = _date(year - 1, 1, 1)
+            end, end_ok = _date(year - 1, 12, 31)
+            return start, end, start_ok & end_ok
+        if period == 'month':
+            end = days.astype(MONTH).astype(DAY) - 1
+            return end.astype(MONTH).astype(DAY), end, _in_range(end)
+        if period == 'quarter':
+            q = (month - 1) // 3 + 1
+            start_month = np.where(q == 1, 10, (q - 2) * 3 + 1)
+            start_year = np.where(q == 1, year - 1, year)
+            # Always day 31 of the quarter's last month, which does not exist for June and September
+            start, start_ok = _date(start_year, start_month, 1)
+            end, end_ok = _date(start_year, start_month + 2, 31)
+            return start, end, start_ok & end_ok
+        return self._invalid(days)
+
+    def ytd(self, days, param=None) -> Resolved:
+        year, _, _ = _parts(days)
+        start, valid = _date(year, 1, 1)
+        return start, days, valid
+
+    def mtd(self, days, param=None) -> Resolved:
+        return days.astype(MONTH).astype(DAY), days, True
+
+    def qtd(self, days, param=None) -> Resolved:
+        year, month, _ = _parts(days)
+        start, valid = _date(year, _quarter_start_month(month), 1)
+        return start, days, valid
+
+    def wtd(self, days, param=None) -> Resolved:
+        """Week to date - Monday to yesterday"""
+        monday, yesterday = days - _weekday(days), days - 1
+        return monday, yesterday, _in_range(monday) & _in_range(yesterday)
+
+    def yesterday(self, days, param=None) -> Resolved:
+        yesterday = days - 1
+        return yesterday, yesterday, _in_range(yesterday)
+
+    def today(self, days, param=None) -> Resolved:
+        return days, days, True
+
+    def tomorrow(self, days, param=None) -> Resolved:
+        tomorrow = days + 1
+        return tomorrow, tomorrow, _in_range(tomorrow)
+
+    def last_n(self, days, n_unit) -> Resolved:
+        """Last N days/weeks/months/years ending yesterday"""
+        if not n_unit:
+            return self._invalid(days)
+        n, unit = n_unit
+        end = days - 1
+        valid = _in_range(end)
+        if n > MAX_SPAN:
+            return self._invalid(days)
+        if 'day' in unit:
+            start = end - (n - 1)
+            valid &= _in_range(start)
+        elif 'week' in unit:
+            before = end - 7 * n
+            start = before + 1
+            valid &= _in_range(before)
+        elif 'month' in unit or 'year' in unit:
+            before, ok = _minus_months(end, n if 'month' in unit else 12 * n)
+            start = before + 1
+            valid &= ok
+        else:
+            return self._invalid(days)
+        return start, end, valid
+
+    def last_week(self, days, period) -> Resolved:
+        if period == 'week':
+            # Monday to Sunday of the previous week
+            last_monday = days - _weekday(days) - 7
+            return last_monday, last_monday + 6, _in_range(last_monday)
+        if period == 'fortnight':
+            start = days - 14
+            return start, days, _in_range(start)
+        return self._invalid(days)
+
+    def this_period(self, days, period) -> Resolved:
+        yesterday = days - 1
+        if period == 'week':
+            start, valid = days - _weekday(days), True
+        elif period == 'month':
+            start, valid = days.astype(MONTH).astype(DAY), True
+        elif period == 'year':
+            year, _, _ = _parts(days)
+            start, valid = _date(year, 1, 1)
+        else:
+            return self._invalid(days)
+        return start, yesterday, valid & _in_range(start) & _in_range(yesterday)
+
+    # Quarters and halves
+
+    def quarter(self, days, quarter_year) -> Resolved:
+        """Specific quarter, e.g. (3, 24) for "q3 24\""""
+        if not quarter_year:
+            return self._invalid(days)
+        quarter, year = quarter_year
+        year = _full_year(year)
+        start_month = (quarter - 1) * 3 + 1
+        start, valid = _date(year, start_month, 1)
+        end = start.astype(MONTH) + 3
+        return start, end.astype(DAY) - 1, valid
+
+    def last_quarter(self, days, param=None) -> Resolved:
+        year, month, _ = _parts(days)
+        q = (month - 1) // 3 + 1
+        start_year = np.where(q == 1, year - 1, year)
+        start_month = np.where(q == 1, 10, (q - 2) * 3 + 1)
+        start, valid = _date(start_year, start_month, 1)
+        return start, (start.astype(MONTH) + 3).astype(DAY) - 1, valid
+
+    def current_quarter(self, days, param=None) -> Resolved:
+        year, month, _ = _parts(days)
+        start, valid = _date(year, _quarter_start_month(month), 1)
+        return start, days, valid
+
+    def half_year(self, days, half_year) -> Resolved:
+        if not half_year:
+            return self._invalid(days)
+        half, year = half_year
+        year = _full_year(year)
+        if half == 1:
+            start, start_ok = _date(year, 1, 1)
+            end, end_ok = _date(year, 6, 30)
+        else:
+            start, start_ok = _date(year, 7, 1)
+            end, end_ok = _date(year, 12, 31)
+        return start, end, start_ok & end_ok
+
+    # End of period: inception to the end of the current month/quarter/year
+
+    def end_of_period(self, days, period) -> Resolved:
+        if period == 'month':
+            return self.end_of_month(days)
+        if period == 'quarter':
+            return self.end_of_quarter(days)
+        if period == 'year':
+            return self.end_of_year(days)
+        return self._invalid(days)
+
+    def end_of_month(self, days, param=None) -> Resolved:
+        end = (days.astype(MONTH) + 1).astype(DAY) - 1
+        return self.default_from, end, True
+
+    def end_of_quarter(self, days, param=None) -> Resolved:
+        year, month, _ = _parts(days)
+        start, valid = _date(year, _quarter_start_month(month), 1)
+        return self.default_from, (start.astype(MONTH) + 3).astype(DAY) - 1, valid
+
+    def end_of_year(self, days, param=None) -> Resolved:
+        year, _, _ = _parts(days)
+        end, valid = _date(year, 12, 31)
+        return self.default_from, end, valid
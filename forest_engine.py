@@ -0,0 +1,188 @@
+"""
+Flattened random-forest inference
+Compiles a trained MultiOutputClassifier of random forests into packed NumPy node arrays
+(feature, threshold, left, right, leaf values) covering every tree of every output, and
+evaluates all trees for a batch of rows with one vectorized traversal. Sparse inputs are read
+straight from their CSR arrays (never densified, so wide hashed features cost nothing). Inputs are cast to
+float32 and compared against the float64 thresholds, and per-tree leaf probabilities are
+summed in estimator order, as sklearn does, so probabilities and predictions are identical
+"""
+
+import json
+import logging
+import os
+from typing import Any, List, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+
+logger = logging.getLogger('IpruAI.ForestEngine')
+
+# Rows per traversal step; bounds the node arrays at chunk_rows x n_trees
+DEFAULT_CHUNK_ROWS = 256
+FOREST_PARAMS_FILE = "forest.json"
+FOREST_ARRAYS = ("feature", "threshold", "left", "right", "values", "roots")
+
+
+class FlatForest:
+    def __init__(self, feature: np.ndarray, threshold: np.ndarray, left: np.ndarray, right: np.ndarray,
+                 values: np.ndarray, roots: np.ndarray, output_slices: List[Tuple[int, int]],
+                 classes: List[np.ndarray], max_depth: int, n_features: int,
+                 chunk_rows: int = DEFAULT_CHUNK_ROWS):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.values = values
+        self.roots = roots
+        self.output_slices = output_slices
+        self.classes = classes
+        self.max_depth = max_depth
+        self.n_features = n_features
+        self.chunk_rows = chunk_rows
+
+    @classmethod
+    def from_model(cls, model: Any, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> "FlatForest":
+        """Compile a fitted MultiOutputClassifier whose estimators are tree forests; ValueError otherwise"""
+        outputs = getattr(model, 'estimators_', None)
+        if not outputs or not all(hasattr(forest, 'estimators_') for forest in outputs):
+            raise ValueError(f"{type(model).__name__} is not a multi-output forest")
+
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        output_slices, classes = [], []
+        max_classes = max(len(forest.classes_) for forest in outputs)
+        n_nodes = 0
+        max_depth = 0
+        for forest in outputs:
+            if getattr(forest, 'n_outputs_', 1) != 1:
+                raise ValueError("per-output forests must be single-output")
+            first_tree = len(roots)
+            n_classes = len(forest.classes_)
+            for estimator in forest.estimators_:
+                tree = estimator.tree_
+                leaf = tree.children_left == -1
+                index = np.arange(tree.node_count)
+                # Leaves point at themselves, so every tree can take max_depth steps
+                lefts.append(np.where(leaf, index, tree.children_left) + n_nodes)
+                rights.append(np.where(leaf, index, tree.children_right) + n_nodes)
+                features.append(np.where(leaf, 0, tree.feature))
+                thresholds.append(tree.threshold)
+                leaf_values = np.zeros((tree.node_count, max_classes), dtype=np.float64)
+                leaf_values[:, :n_classes] = tree.value[:, 0, :n_classes]
+                values.append(leaf_values)
+                roots.append(n_nodes)
+                n_nodes += tree.node_count
+                max_depth = max(max_depth, tree.max_depth)
+            output_slices.append((first_tree, len(roots)))
+            classes.append(forest.classes_)
+
+        return cls(
+            feature=np.concatenate(features).astype(np.intp),
+            threshold=np.concatenate(thresholds).astype(np.float64),
+            left=np.concatenate(lefts).astype(np.intp),
+            right=np.concatenate(rights).astype(np.intp),
+            values=np.concatenate(values),
+            roots=np.asarray(roots, dtype=np.intp),
+            output_slices=output_slices,
+            classes=classes,
+            max_depth=max_depth,
+            n_features=outputs[0].n_features_in_,
+            chunk_rows=chunk_rows
+        )
+
+    def save(self, directory: str):
+        """Node arrays as raw .npy files (memory-mappable) plus the output layout as JSON"""
+        os.makedirs(directory, exist_ok=True)
+        for name in FOREST_ARRAYS:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(directory, FOREST_PARAMS_FILE), 'w') as f:
+            json.dump({
+                "output_slices": [list(bounds) for bounds in self.output_slices],
+                "classes": [classes.tolist() for classes in self.classes],
+                "max_depth": int(self.max_depth),
+                "n_features": int(self.n_features),
+                "chunk_rows": self.chunk_rows
+            }, f)
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> "FlatForest":
+        with open(os.path.join(directory, FOREST_PARAMS_FILE), 'r') as f:
+            params = json.load(f)
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r' if mmap else None)
+                  for name in FOREST_ARRAYS}
+        return cls(output_slices=[tuple(bounds) for bounds in params["output_slices"]],
+                   classes=[np.asarray(classes) for classes in params["classes"]],
+                   max_depth=params["max_depth"], n_features=params["n_features"],
+                   chunk_rows=params["chunk_rows"], **arrays)
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+
+    def apply(self, X) -> np.ndarray:
+        """Leaf node (global index) reached in every tree, shape (n_samples, n_trees)"""
+        # sklearn trees evaluate float32 features against float64 thresholds
+        if sp.issparse(X):
+            X = X.astype(np.float32).tocsr()
+            X.sum_duplicates()  # canonical CSR: sorted column indices, as _sparse_values expects
+        else:
+            X = np.asarray(X, dtype=np.float32)
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"X has {X.shape[1]} features, the forest expects {self.n_features}")
+        leaves = np.empty((X.shape[0], self.n_trees), dtype=np.intp)
+        for start in range(0, X.shape[0], self.chunk_rows):
+            chunk = X[start:start + self.chunk_rows]
+            n_rows = chunk.shape[0]
+            rows = np.arange(n_rows)[:, None]
+            values = self._sparse_values(chunk) if sp.issparse(chunk) else lambda features: chunk[rows, features]
+            nodes = np.broadcast_to(self.roots, (n_rows, self.n_trees)).copy()
+            for _ in range(self.max_depth):
+                go_left = values(self.feature[nodes]) <= self.threshold[nodes]
+                nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+            leaves[start:start + n_rows] = nodes
+        return leaves
+
+    def _sparse_values(self, chunk: sp.csr_matrix):
+        """Lookup of chunk[row, features[row, tree]] from the CSR arrays, by binary search over (row, column) keys"""
+        n_rows = chunk.shape[0]
+        row_of_entry = np.repeat(np.arange(n_rows, dtype=np.int64), np.diff(chunk.indptr))
+        # Row-major keys are ascending in canonical CSR; the sentinel keeps every search position in range
+        keys = np.append(row_of_entry * self.n_features + chunk.indices, np.iinfo(np.int64).max)
+        data = np.append(chunk.data, np.float32(0))
+        row_offsets = np.arange(n_rows, dtype=np.int64)[:, None] * self.n_features
+
+        def values(features: np.ndarray) -> np.ndarray:
+            queries = row_offsets + features
+            positions = np.searchsorted(keys, queries)
+            return np.where(keys[positions] == queries, data[positions], np.float32(0))
+        return values
+
+    def _proba_from_leaves(self, leaves: np.ndarray) -> List[np.ndarray]:
+        leaf_values = self.values[leaves]
+        probabilities = []
+        for (first, last), classes in zip(self.output_slices, self.classes):
+            # cumsum adds the trees one after another like sklearn's accumulation (np.sum is pairwise)
+            summed = np.cumsum(leaf_values[:, first:last, :len(classes)], axis=1)[:, -1]
+            probabilities.append(summed / (last - first))
+        return probabilities
+
+    def predict_proba(self, X) -> List[np.ndarray]:
+        """Per-output class probabilities, as MultiOutputClassifier.predict_proba"""
+        return self._proba_from_leaves(self.apply(X))
+
+    def _predict_from_proba(self, probabilities: List[np.ndarray]) -> np.ndarray:
+        return np.asarray([classes.take(np.argmax(proba, axis=1), axis=0)
+                           for proba, classes in zip(probabilities, self.classes)]).T
+
+    def predict(self, X) -> np.ndarray:
+        """Per-output class labels, shape (n_samples, n_outputs), as MultiOutputClassifier.predict"""
+        return self._predict_from_proba(self.predict_proba(X))
+
+    def predict_with_proba(self, X) -> Tuple[np.ndarray, List[np.ndarray]]:
+        """predict and predict_proba from a single traversal"""
+        probabilities = self.predict_proba(X)
+        return self._predict_from_proba(probabilities), probabilities
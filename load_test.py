@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+HTTP Load Generator for the Email Parser API
+Drives main.py's FastAPI app in-process over ASGI or a running uvicorn server with
+closed-loop (fixed concurrency) or open-loop (Poisson arrivals) traffic drawn from the
+seeded corpora, and reports throughput, error rate and latency percentiles split by
+whether the ML fallback was invoked
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from build_corpora import iter_corpus
+from perf_stats import summarize_latencies
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+logging.getLogger('httpx').setLevel(logging.WARNING)  # one INFO line per request otherwise
+
+RESULTS_DIR = 'load_results'
+FALLBACK_CORPUS_PATH = 'training_data/human_language_training.json'
+SERVER_STARTUP_TIMEOUT = 600  # seconds; spaCy + model load before /health answers
+
+
+def _split_email(text: str) -> Dict[str, str]:
+    """Turn a corpus text into the API's subject/body payload"""
+    if text.startswith("Subject:") and "\nBody:" in text:
+        subject, body = text.split("\nBody:", 1)
+        return {"subject": subject[len("Subject:"):].strip(), "body": body.strip()}
+    return {"subject": "", "body": text}
+
+
+class RequestMix:
+    """Weighted pool of request payloads drawn from one or more corpora"""
+
+    def __init__(self, sources: List[Tuple[str, float]], per_source_limit: int = 10000, seed: int = 42):
+        self.rng = random.Random(seed)
+        self.pools: List[List[Dict[str, str]]] = []
+        self.weights: List[float] = []
+        self.names: List[str] = []
+
+        for path, weight in sources:
+            if path.endswith(".json"):
+                with open(path, 'r') as f:
+                    texts = [sample["text"] for sample in json.load(f)[:per_source_limit]]
+            else:
+                texts = [case["input_text"] for case in iter_corpus(path, limit=per_source_limit)]
+            if not texts:
+                raise ValueError(f"Corpus {path} is empty")
+            self.pools.append([_split_email(text) for text in texts])
+            self.weights.append(weight)
+            self.names.append(path)
+            logger.info(f"📚 {len(texts):,} requests from {path} (weight {weight})")
+
+    def next(self) -> Dict[str, str]:
+        pool = self.rng.choices(self.pools, weights=self.weights)[0]
+        return self.rng.choice(pool)
+
+
+class LoadTest:
+    def __init__(self, mix: RequestMix, url: Optional[str] = None, timeout: float = 60.0,
+                 debug_timings: bool = False):
+        self.mix = mix
+        self.url = url
+        self.timeout = timeout
+        self.debug_timings = debug_timings
+        self.samples: List[Tuple[float, float, Optional[bool], int]] = []  # (latency ms, service ms, ml, status)
+        self.errors: Counter = Counter()
+
+    def _client(self):
+        try:
+            import httpx
+        except ImportError:
+            raise ImportError("Load testing requires httpx (pip install httpx)")
+
+        if self.url:
+            limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+            return httpx.AsyncClient(base_url=self.url, timeout=self.timeout, limits=limits)
+
+        # In-process: the app (and its parser) is loaded into this process and called over ASGI
+        from main import app
+        logging.getLogger('IpruAI').setLevel(logging.WARNING)
+        return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadtest",
+                                 timeout=self.timeout)
+
+    async def _send(self, client, scheduled_at: Optional[float] = None):
+        """One request; latency counts from the scheduled arrival in open-loop mode"""
+        payload = dict(self.mix.next(), debug_timings=self.debug_timings)
+        sent_at = time.perf_counter()
+        try:
+            response = await client.post("/parse-email", json=payload)
+            done_at = time.perf_counter()
+            ml_invoked = None
+            if response.status_code == 200:
+                metadata = response.json().get("metadata", {})
+                ml_invoked = metadata.get("ml_invoked", metadata.get("ml_fallback_used"))
+            else:
+                self.errors[f"http_{response.status_code}"] += 1
+            status = response.status_code
+        except Exception as e:
+            done_at = time.perf_counter()
+            self.errors[type(e).__name__] += 1
+            ml_invoked, status = None, 0
+        start = scheduled_at if scheduled_at is not None else sent_at
+        self.samples.append(((done_at - start) * 1000, (done_at - sent_at) * 1000, ml_invoked, status))
+
+    async def run_closed_loop(self, concurrency: int, requests: int = 0, duration: float = 0,
+                              warmup: int = 0) -> Dict[str, Any]:
+        """N virtual users each send their next request as soon as the previous one returns"""
+        async with self._client() as client:
+            for _ in range(warmup):
+                await self._send(client)
+            self.samples.clear()
+            self.errors.clear()
+
+            remaining = [requests]
+            deadline = time.perf_counter() + duration if duration else None
+
+            async def user():
+                while True:
+                    if deadline is not None and time.perf_counter() >= deadline:
+                        return
+                    if deadline is None:
+                        if remaining[0] <= 0:
+                            return
+                        remaining[0] -= 1
+                    await self._send(client)
+
+            wall_start = time.perf_counter()
+            await asyncio.gather(*(user() for _ in range(concurrency)))
+            wall_time = time.perf_counter() - wall_start
+
+        return self._report("closed", wall_time, {"concurrency": concurrency})
+
+    async def run_open_loop(self, rate: float, requests: int = 0, duration: float = 0,
+                            max_in_flight: int = 1000, warmup: int = 0, seed: int = 42) -> Dict[str, Any]:
+        """Poisson arrivals at `rate` req/s regardless of how fast responses come back"""
+        arrivals = random.Random(seed)
+        async with self._client() as client:
+            for _ in range(warmup):
+                await self._send(client)
+            self.samples.clear()
+            self.errors.clear()
+
+            in_flight = set()
+            dropped = 0
+            sent = 0
+            wall_start = time.perf_counter()
+            next_arrival = wall_start
+            while True:
+                if requests and sent >= requests:
+                    break
+                if duration and next_arrival - wall_start >= duration:
+                    break
+                delay = next_arrival - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                if len(in_flight) >= max_in_flight:
+                    # Shed instead of queueing unboundedly in the generator; counted as errors
+                    dropped += 1
+                    self.errors["dropped_max_in_flight"] += 1
+                else:
+                    task = asyncio.create_task(self._send(client, scheduled_at=next_arrival))
+                    in_flight.add(task)
+                    task.add_done_callback(in_flight.discard)
+                sent += 1
+                next_arrival += arrivals.expovariate(rate)
+            if in_flight:
+                await asyncio.gather(*in_flight)
+            wall_time = time.perf_counter() - wall_start
+
+        return self._report("open", wall_time, {"target_rate_per_sec": rate, "max_in_flight": max_in_flight,
+                                                 "dropped": dropped})
+
+    def _report(self, mode: str, wall_time: float, settings: Dict[str, Any]) -> Dict[str, Any]:
+        completed = len(self.samples)
+        failed = sum(1 for _, _, _, status in self.samples if status != 200) + self.errors["dropped_max_in_flight"]
+        attempted = completed + self.errors["dropped_max_in_flight"]
+        ok = [s for s in self.samples if s[3] == 200]
+
+        report = {
+            "timestamp": datetime.now().isoformat(),
+            "target": self.url or "in-process ASGI",
+            "mode": mode,
+            **settings,
+            "corpora": dict(zip(self.mix.names, self.mix.weights)),
+            "requests": attempted,
+            "successful": len(ok),
+            "error_rate": round(failed / attempted, 4) if attempted else 0.0,
+            "errors": dict(self.errors),
+            "wall_time_s": round(wall_time, 3),
+            "throughput_per_sec": round(len(ok) / wall_time, 2) if wall_time else 0.0,
+            "ml_fallback_rate": round(sum(1 for s in ok if s[2]) / len(ok), 4) if ok else 0.0,
+            "latency_ms": summarize_latencies(s[0] for s in ok),
+            "rule_only_latency_ms": summarize_latencies(s[0] for s in ok if not s[2]),
+            "ml_fallback_latency_ms": summarize_latencies(s[0] for s in ok if s[2]),
+        }
+        if mode == "open":
+            # Latency above includes time queued behind earlier requests; service time excludes it
+            report["service_time_ms"] = summarize_latencies(s[1] for s in ok)
+        return report
+
+
+class LocalServer:
+    """uvicorn main:app launched as a subprocess for the duration of a run"""
+
+    def __init__(self, port: int, workers: int = 1):
+        self.port = port
+        self.workers = workers
+        self.process = None
+
+    def __enter__(self):
+        import httpx
+
+        command = [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+                   "--port", str(self.port), "--workers", str(self.workers), "--log-level", "warning"]
+        logger.info(f"🚀 Launching {' '.join(command)}")
+        self.process = subprocess.Popen(command)
+        url = f"http://127.0.0.1:{self.port}"
+        deadline = time.time() + SERVER_STARTUP_TIMEOUT
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with code {self.process.returncode}")
+            try:
+                if httpx.get(f"{url}/health", timeout=2).status_code == 200:
+                    logger.info(f"✅ Server ready at {url}")
+                    return url
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.5)
+        self.process.terminate()
+        raise RuntimeError(f"Server did not become healthy within {SERVER_STARTUP_TIMEOUT}s")
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+def _parse_sources(values: Optional[List[str]]) -> List[Tuple[str, float]]:
+    """PATH or PATH:WEIGHT entries"""
+    if not values:
+        return [(FALLBACK_CORPUS_PATH, 1.0)]
+    sources = []
+    for value in values:
+        path, _, weight = value.rpartition(":")
+        if path and weight.replace(".", "", 1).isdigit():
+            sources.append((path, float(weight)))
+        else:
+            sources.append((value, 1.0))
+    return sources
+
+
+def _log_report(report: Dict[str, Any]):
+    logger.info(f"\n📊 LOAD TEST RESULTS ({report['mode']}-loop, {report['target']}):")
+    logger.info(f"   Requests: {report['requests']:,} | Successful: {report['successful']:,} | "
+                f"Error rate: {report['error_rate']:.2%} {report['errors'] or ''}")
+    logger.info(f"   Throughput: {report['throughput_per_sec']:.1f} req/s over {report['wall_time_s']:.1f}s | "
+                f"ML fallback rate: {report['ml_fallback_rate']:.1%}")
+    for label, key in [("All", "latency_ms"), ("Rule-only", "rule_only_latency_ms"),
+                       ("ML fallback", "ml_fallback_latency_ms"), ("Service", "service_time_ms")]:
+        lat = report.get(key)
+        if lat and lat["count"]:
+            logger.info(f"   {label:11} latency: p50={lat['p50']:.2f}ms p90={lat['p90']:.2f}ms "
+                        f"p99={lat['p99']:.2f}ms max={lat['max']:.2f}ms (n={lat['count']:,})")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Load test the email parser API')
+    target = arg_parser.add_mutually_exclusive_group()
+    target.add_argument('--url', help='Running server, e.g. http://localhost:5000 (default: in-process ASGI)')
+    target.add_argument('--launch', action='store_true', help='Launch uvicorn main:app locally for the run')
+    arg_parser.add_argument('--port', type=int, default=5055, help='Port for --launch')
+    arg_parser.add_argument('--server-workers', type=int, default=1, help='uvicorn workers for --launch')
+    arg_parser.add_argument('--corpus', nargs='+',
+                            help='Request sources as PATH[:WEIGHT] (corpora/*.jsonl.gz or training JSON)')
+    arg_parser.add_argument('--per-corpus', type=int, default=10000, help='Max requests loaded per corpus')
+    arg_parser.add_argument('--concurrency', type=int, default=8, help='Closed-loop virtual users')
+    arg_parser.add_argument('--rate', type=float, help='Open-loop Poisson arrival rate (req/s)')
+    arg_parser.add_argument('--max-in-flight', type=int, default=1000, help='Open-loop outstanding request cap')
+    arg_parser.add_argument('--requests', type=int, default=1000, help='Requests to send (ignored with --duration)')
+    arg_parser.add_argument('--duration', type=float, default=0, help='Run for this many seconds instead')
+    arg_parser.add_argument('--warmup', type=int, default=10, help='Untimed requests before measuring')
+    arg_parser.add_argument('--seed', type=int, default=42, help='Seed for the request mix and arrivals')
+    arg_parser.add_argument('--debug-timings', action='store_true', help='Request per-stage timings too')
+    arg_parser.add_argument('--output', help='Report JSON path (default load_results/load_test_<timestamp>.json)')
+    args = arg_parser.parse_args()
+
+    mix = RequestMix(_parse_sources(args.corpus), args.per_corpus, args.seed)
+    requests = 0 if args.duration else args.requests
+
+    def run(url):
+        test = LoadTest(mix, url=url, debug_timings=args.debug_timings)
+        if args.rate:
+            return asyncio.run(test.run_open_loop(args.rate, requests, args.duration, args.max_in_flight,
+                                                  args.warmup, args.seed))
+        return asyncio.run(test.run_closed_loop(args.concurrency, requests, args.duration, args.warmup))
+
+    if args.launch:
+        with LocalServer(args.port, args.server_workers) as url:
+            report = run(url)
+    else:
+        report = run(args.url)
+
+    _log_report(report)
+    output = args.output or os.path.join(RESULTS_DIR, f"load_test_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"Report written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,14 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from datetime import datetime
 import logging
 import os
+from parser_registry import ParserRegistry
+from ml_gate import AdaptiveMLGate
 from email_parser import IpruAIEmailParser
+from online_learner import FeedbackStore, OnlineLearner, DEFAULT_FEEDBACK_PATH
+from typing import Optional
 import json
 
 # Configure enhanced logging
@@ -60,11 +65,46 @@ logger = logging.getLogger('IpruAI')
 logger.setLevel(logging.DEBUG)
 
 app = FastAPI(title="IpruAI Email Parser API 🤖", version="1.0.0")
-parser = IpruAIEmailParser()
+# The registry owns the active parser; reloads swap it without restarting the process
+registry = ParserRegistry()
+
+# Operator corrections are always stored; the online learner only runs when enabled in config
+online_config = registry.parser.model_config["ml_model"].get("online_learning", {})
+feedback_store = FeedbackStore(online_config.get("feedback_path", DEFAULT_FEEDBACK_PATH))
+online_learner = OnlineLearner.from_config(registry.parser) if online_config.get("enabled", False) else None
+
+if online_learner:
+    registry.on_swap(online_learner.republish)
+
+# Load-adaptive ML gating: fewer ML fallbacks under queueing or slow ML, circuit breaker on failures
+gating_config = registry.parser.model_config.get("production", {}).get("adaptive_gating", {})
+ml_gate = AdaptiveMLGate.from_config(registry.parser.model_config) if gating_config.get("enabled", False) else None
+
+if ml_gate:
+    registry.parser.ml_gate = ml_gate
+    registry.on_swap(lambda new_parser: ml_gate.update_config(new_parser.model_config))
+
+    @app.middleware("http")
+    async def track_in_flight(request: Request, call_next):
+        # Entered before the request waits for the event loop, so queued requests count as pressure
+        if request.url.path != "/parse-email":
+            return await call_next(request)
+        with ml_gate.track_request():
+            return await call_next(request)
 
 class EmailRequest(BaseModel):
     subject: str
     body: str
+    debug_timings: bool = False  # Adds per-stage timings to metadata
+    reference_date: Optional[str] = None  # ISO date/datetime relative dates resolve against (default: now)
+
+class FeedbackRequest(BaseModel):
+    subject: str
+    body: str
+    statement_types: list  # Corrected statement types, e.g. ["Portfolio_Appraisal"]
+    statement_category: list = []
+    operator: Optional[str] = None
+    comment: Optional[str] = None
 
 class EmailResponse(BaseModel):
     statement_category: list
@@ -83,6 +123,10 @@ class EmailResponse(BaseModel):
 
 @app.post("/parse-email", response_model=EmailResponse)
 async def parse_email(request: EmailRequest):
+    try:
+        reference_date = IpruAIEmailParser.resolve_reference_date(request.reference_date)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid reference_date: {request.reference_date}")
     try:
         start_time = datetime.now()
         
@@ -94,8 +138,12 @@ async def parse_email(request: EmailRequest):
         logger.debug(f"Body length: {len(request.body)} chars")
         logger.debug(f"Log file: {log_filename}")
         
-        # Parse email
-        result = parser.parse_email(full_text)
+        # Parse email with the parser active when the request started, even if a reload swaps it meanwhile
+        parser = registry.parser
+        # Off the event loop, so concurrent requests overlap and the gate's in-flight count reflects the backlog
+        result = await run_in_threadpool(parser.parse_email, full_text, debug_timings=request.debug_timings,
+                                         reference_date=reference_date)
+        result['metadata']['parser_version'] = parser.version
         
         processing_time = (datetime.now() - start_time).total_seconds() * 1000
         result['metadata']['processing_time_ms'] = round(processing_time, 2)
@@ -116,8 +164,57 @@ async def parse_email(request: EmailRequest):
         logger.debug(f"Request details - Subject: {request.subject[:100]}, Body: {request.body[:200]}...")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+@app.post("/feedback")
+async def feedback(request: FeedbackRequest):
+    known_types = set(registry.parser.statement_keywords["pms"].keys()) | {"AIF_Statement"}
+    unknown = [t for t in request.statement_types if t not in known_types]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown statement types: {unknown}")
+    
+    full_text = f"Subject: {request.subject}\nBody: {request.body}"
+    feedback_store.append({
+        "text": full_text,
+        "statement_types": request.statement_types,
+        "statement_category": request.statement_category,
+        "operator": request.operator,
+        "comment": request.comment,
+        "received_at": datetime.now().isoformat()
+    })
+    logger.info(f"📝 Correction stored: {request.statement_types}")
+    
+    if online_learner:
+        online_learner.notify()
+    return {
+        "accepted": True,
+        "online_learning": online_learner.status() if online_learner else {"enabled": False}
+    }
+
+@app.post("/admin/reload")
+async def reload_parser(force: bool = False):
+    # Configs, regexes and models are rebuilt in a worker thread; requests keep using the active parser
+    result = await run_in_threadpool(registry.reload, force)
+    if result.get("error"):
+        raise HTTPException(status_code=500, detail=f"Reload failed: {result['error']}")
+    return result
+
+@app.on_event("startup")
+async def start_background_tasks():
+    if online_learner:
+        online_learner.start()
+        logger.info("🧠 Online learner started")
+    hot_reload = registry.parser.model_config.get("hot_reload", {})
+    if hot_reload.get("watch", False):
+        registry.start_watcher(hot_reload.get("interval_s", 5.0))
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    if online_learner:
+        online_learner.stop()
+    registry.stop()
+
 @app.get("/health")
 async def health_check():
+    parser = registry.parser
     ml_available = parser.ml_model is not None
     spacy_available = parser.nlp is not None
     return {
@@ -126,6 +223,9 @@ async def health_check():
         "ml_fallback_available": ml_available,
         "spacy_model_loaded": spacy_available,
         "ml_threshold": parser.model_config.get("ml_fallback_threshold", 60.0),
+        "parser": registry.status(),
+        "online_learning": online_learner.status() if online_learner else {"enabled": False},
+        "ml_gate": ml_gate.status(parser.model_config.get("ml_fallback_threshold", 60.0)) if ml_gate else {"enabled": False},
         "timestamp": datetime.now().isoformat()
     }
 
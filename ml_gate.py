@@ -0,0 +1,184 @@
+"""
+Load-adaptive gating of the ML fallback
+The gate watches requests in flight and an EWMA of recent ML latency (decaying while no ML call
+is admitted, so a gate that shed ML under slow calls recovers), and moves the effective
+fallback threshold from the configured one down toward production.min_threshold as pressure
+builds (ML only runs when confidence < threshold, so a lower threshold means fewer ML calls).
+A circuit breaker skips ML entirely for a cooldown after repeated failures or over-budget calls
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger('IpruAI.MLGate')
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class AdaptiveMLGate:
+    def __init__(self, min_threshold: float = 30.0, max_threshold: float = 80.0,
+                 target_in_flight: int = 4, latency_budget_ms: float = 1000.0, ewma_alpha: float = 0.2,
+                 breaker_failures: int = 3, breaker_cooldown_s: float = 30.0, latency_half_life_s: float = 10.0):
+        self._lock = threading.Lock()
+        self.configure(min_threshold, max_threshold, target_in_flight, latency_budget_ms, ewma_alpha,
+                       breaker_failures, breaker_cooldown_s, latency_half_life_s)
+
+        self.in_flight = 0
+        self.ml_latency_ewma_ms = None
+        self._last_ml_at = 0.0
+        self.state = CLOSED
+        self._consecutive_bad = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+        self.ml_calls = 0
+        self.ml_failures = 0
+        self.ml_slow_calls = 0
+        self.skipped_pressure = 0
+        self.skipped_circuit_open = 0
+        self.breaker_trips = 0
+
+    @classmethod
+    def from_config(cls, model_config: Dict[str, Any]) -> "AdaptiveMLGate":
+        gate = cls()
+        gate.update_config(model_config)
+        return gate
+
+    def configure(self, min_threshold: float, max_threshold: float, target_in_flight: int,
+                  latency_budget_ms: float, ewma_alpha: float, breaker_failures: int, breaker_cooldown_s: float,
+                  latency_half_life_s: float = 10.0):
+        self.min_threshold = min_threshold
+        self.max_threshold = max_threshold
+        self.target_in_flight = max(1, target_in_flight)
+        self.latency_budget_ms = latency_budget_ms
+        self.ewma_alpha = ewma_alpha
+        self.breaker_failures = max(1, breaker_failures)
+        self.breaker_cooldown_s = breaker_cooldown_s
+        self.latency_half_life_s = max(1e-3, latency_half_life_s)
+
+    def update_config(self, model_config: Dict[str, Any]):
+        """Pick up band and controller settings from model_config (at startup and after hot reloads)"""
+        production = model_config.get("production", {})
+        gating = production.get("adaptive_gating", {})
+        self.configure(
+            production.get("min_threshold", 30.0),
+            production.get("max_threshold", 80.0),
+            gating.get("target_in_flight", 4),
+            gating.get("latency_budget_ms", 1000.0),
+            gating.get("ewma_alpha", 0.2),
+            gating.get("breaker_failures", 3),
+            gating.get("breaker_cooldown_s", 30.0),
+            gating.get("latency_half_life_s", 10.0)
+        )
+
+    @contextmanager
+    def track_request(self):
+        """Count a request as in flight for its whole lifetime, including time spent queued behind others"""
+        with self._lock:
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def ml_latency_ms(self) -> Optional[float]:
+        """ML latency EWMA, halved every latency_half_life_s without an ML call so shed load lets it recover"""
+        if self.ml_latency_ewma_ms is None:
+            return None
+        idle_s = time.monotonic() - self._last_ml_at
+        return self.ml_latency_ewma_ms * 0.5 ** (idle_s / self.latency_half_life_s)
+
+    def pressure(self) -> float:
+        """0 when idle, 1 at target_in_flight other requests or a mean ML latency at the budget"""
+        queue_pressure = min(1.0, max(0, self.in_flight - 1) / self.target_in_flight)
+        latency_pressure = 0.0
+        latency_ms = self.ml_latency_ms()
+        if latency_ms is not None:
+            # Start backing off at half the budget
+            latency_pressure = min(1.0, max(0.0, 2 * latency_ms / self.latency_budget_ms - 1))
+        return max(queue_pressure, latency_pressure)
+
+    def effective_threshold(self, base_threshold: float) -> float:
+        base_threshold = min(self.max_threshold, max(self.min_threshold, base_threshold))
+        return base_threshold - self.pressure() * (base_threshold - self.min_threshold)
+
+    def admit(self, confidence: float, base_threshold: float) -> Optional[str]:
+        """Called when confidence < base_threshold; None lets ML run, otherwise the reason it is skipped"""
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self._opened_at < self.breaker_cooldown_s:
+                    self.skipped_circuit_open += 1
+                    return "circuit_open"
+                self.state = HALF_OPEN
+                logger.info("🔌 ML circuit half-open, sending a trial request")
+            if self.state == HALF_OPEN:
+                if self._trial_in_flight:
+                    self.skipped_circuit_open += 1
+                    return "circuit_open"
+                self._trial_in_flight = True
+                return None
+        if confidence >= self.effective_threshold(base_threshold):
+            with self._lock:
+                self.skipped_pressure += 1
+            return "load_pressure"
+        return None
+
+    def record_ml(self, latency_ms: float, ok: bool):
+        """Feed back the outcome of an admitted ML call"""
+        with self._lock:
+            self.ml_calls += 1
+            previous_ms = self.ml_latency_ms()
+            if previous_ms is None:
+                self.ml_latency_ewma_ms = latency_ms
+            else:
+                self.ml_latency_ewma_ms = previous_ms + self.ewma_alpha * (latency_ms - previous_ms)
+            self._last_ml_at = time.monotonic()
+
+            slow = latency_ms > self.latency_budget_ms
+            if not ok:
+                self.ml_failures += 1
+            if slow:
+                self.ml_slow_calls += 1
+
+            if ok and not slow:
+                self._consecutive_bad = 0
+                if self.state == HALF_OPEN:
+                    self.state = CLOSED
+                    self._trial_in_flight = False
+                    logger.info("🔌 ML circuit closed")
+                return
+
+            self._consecutive_bad += 1
+            if self.state == HALF_OPEN or self._consecutive_bad >= self.breaker_failures:
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+                self._consecutive_bad = 0
+                self.breaker_trips += 1
+                reason = "failed" if not ok else f"took {latency_ms:.0f} ms"
+                logger.warning(f"⚡ ML circuit opened for {self.breaker_cooldown_s}s (last call {reason})")
+
+    def status(self, base_threshold: Optional[float] = None) -> Dict[str, Any]:
+        latency_ms = self.ml_latency_ms()
+        status = {
+            "enabled": True,
+            "circuit": self.state,
+            "in_flight": self.in_flight,
+            "pressure": round(self.pressure(), 3),
+            "ml_latency_ewma_ms": round(latency_ms, 2) if latency_ms is not None else None,
+            "latency_budget_ms": self.latency_budget_ms,
+            "ml_calls": self.ml_calls,
+            "ml_failures": self.ml_failures,
+            "ml_slow_calls": self.ml_slow_calls,
+            "skipped_pressure": self.skipped_pressure,
+            "skipped_circuit_open": self.skipped_circuit_open,
+            "degraded": self.skipped_pressure + self.skipped_circuit_open,
+            "breaker_trips": self.breaker_trips
+        }
+        if base_threshold is not None:
+            status["effective_threshold"] = round(self.effective_threshold(base_threshold), 2)
+        return status
@@ -0,0 +1,247 @@
+"""
+Online learning from operator corrections
+Corrections posted to /feedback are appended to a JSONL store; a background thread
+partial_fits an SGD multi-output model on hashed features of the new corrections and
+publishes each snapshot atomically (temp file + os.replace, then one reference swap on
+the parser), so request handling never waits on training
+"""
+
+import copy
+import json
+import logging
+import os
+import random
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger('IpruAI.OnlineLearner')
+
+DEFAULT_FEEDBACK_PATH = 'feedback/corrections.jsonl'
+DEFAULT_SNAPSHOT_DIR = 'models/online'
+SNAPSHOT_FILE = 'snapshot.joblib'
+
+
+class FeedbackStore:
+    """Append-only JSONL store of labeled corrections, read incrementally by byte offset"""
+
+    def __init__(self, path: str = DEFAULT_FEEDBACK_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def append(self, record: Dict[str, Any]):
+        line = json.dumps(record, default=str) + "\n"
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def read_from(self, offset: int) -> Tuple[List[Dict[str, Any]], int]:
+        """Complete records appended after `offset`, and the offset to resume from"""
+        if not os.path.exists(self.path):
+            return [], offset
+        records = []
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break  # partially written line; pick it up next time
+                offset += len(raw)
+                if raw.strip():
+                    records.append(json.loads(raw))
+        return records, offset
+
+
+class OnlineLearner:
+    """Background partial_fit learner over a FeedbackStore that publishes snapshots to a parser"""
+
+    def __init__(self, parser, store: FeedbackStore, snapshot_dir: str = DEFAULT_SNAPSHOT_DIR,
+                 update_interval: float = 30.0, min_batch: int = 1, correction_weight: float = 5.0,
+                 bootstrap_size: int = 2000, publish: bool = True):
+        self.parser = parser
+        self.store = store
+        self.snapshot_dir = snapshot_dir
+        self.update_interval = update_interval
+        self.min_batch = min_batch
+        self.correction_weight = correction_weight
+        self.bootstrap_size = bootstrap_size
+        self.publish = publish
+
+        self.label_names = list(parser.statement_keywords["pms"].keys()) + ["AIF_Statement"]
+        # Imported here, not at module level: the API imports FeedbackStore even when online learning is off
+        from featurizers import HashingFeaturizer
+        # No fitted IDF: the featurizer has to stay stateless for incremental updates
+        self.featurizer = HashingFeaturizer(n_features=2 ** 18, use_idf=False)
+        self.model = None
+        self.offset = 0
+        self.updates = 0
+        self.corrections_seen = 0
+        self.last_update = None
+
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_config(cls, parser) -> "OnlineLearner":
+        config = parser.model_config["ml_model"].get("online_learning", {})
+        return cls(
+            parser,
+            FeedbackStore(config.get("feedback_path", DEFAULT_FEEDBACK_PATH)),
+            snapshot_dir=config.get("snapshot_dir", DEFAULT_SNAPSHOT_DIR),
+            update_interval=config.get("update_interval_s", 30.0),
+            min_batch=config.get("min_batch", 1),
+            correction_weight=config.get("correction_weight", 5.0),
+            bootstrap_size=config.get("bootstrap_size", 2000),
+            publish=config.get("serve_online_model", True)
+        )
+
+    def _new_model(self):
+        from sklearn.linear_model import SGDClassifier
+        from sklearn.multioutput import MultiOutputClassifier
+        return MultiOutputClassifier(SGDClassifier(loss='log_loss', alpha=1e-5, random_state=42))
+
+    def _label_vector(self, statement_types: List[str]) -> List[int]:
+        return [1 if name in statement_types else 0 for name in self.label_names]
+
+    def _features(self, texts: List[str]):
+        feature_strings = [self.parser._extract_ml_features(text, self.parser.extract_identifiers(text))
+                           for text in texts]
+        return self.featurizer.transform(feature_strings)
+
+    def _partial_fit(self, texts: List[str], label_rows: List[List[int]], weight: float = 1.0):
+        X = self._features(texts)
+        y = np.array(label_rows)
+        if self.model is None:
+            self.model = self._new_model()
+            self.model.partial_fit(X, y, classes=[np.array([0, 1])] * len(self.label_names),
+                                   sample_weight=np.full(len(texts), weight))
+        else:
+            self.model.partial_fit(X, y, sample_weight=np.full(len(texts), weight))
+
+    def bootstrap(self):
+        """Seed the model from synthetic training data so early corrections refine it rather than define it"""
+        # A private generator: the global random state is shared with the request threads
+        rng = random.Random(self.parser.model_config["training"].get("random_seed", 42))
+        samples = self.parser.generate_training_data(self.bootstrap_size, rng=rng)
+        texts = [sample["text"] for sample in samples]
+        labels = [self._label_vector(sample["labels"].get("statement_types", [])) for sample in samples]
+        self._partial_fit(texts, labels)
+        logger.info(f"🌱 Online model bootstrapped on {len(texts)} synthetic samples")
+
+    def load_snapshot(self) -> bool:
+        path = os.path.join(self.snapshot_dir, SNAPSHOT_FILE)
+        if not os.path.exists(path):
+            return False
+        import joblib
+        snapshot = joblib.load(path)
+        if snapshot["label_names"] != self.label_names:
+            logger.warning("Online snapshot labels differ from current statement keywords; ignoring it")
+            return False
+        self.model = snapshot["model"]
+        self.featurizer = snapshot["featurizer"]
+        self.offset = snapshot["offset"]
+        self.updates = snapshot["updates"]
+        self.corrections_seen = snapshot["corrections_seen"]
+        self.last_update = snapshot["created_at"]
+        logger.info(f"📦 Loaded online snapshot ({self.corrections_seen} corrections, {self.updates} updates)")
+        return True
+
+    def _write_snapshot(self):
+        import joblib
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        path = os.path.join(self.snapshot_dir, SNAPSHOT_FILE)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        self.last_update = datetime.now().isoformat()
+        joblib.dump({
+            "model": self.model,
+            "featurizer": self.featurizer,
+            "label_names": self.label_names,
+            "offset": self.offset,
+            "updates": self.updates,
+            "corrections_seen": self.corrections_seen,
+            "created_at": self.last_update
+        }, tmp_path)
+        os.replace(tmp_path, path)
+
+    def _publish(self):
+        if self.publish and self.model is not None:
+            # Requests already inside _ml_fallback_parse keep the pair they read
+            self.parser.swap_ml_components(self.model, self.featurizer)
+
+    def republish(self, parser):
+        """Follow a hot reload: serve the current model from the new parser"""
+        self.parser = parser
+        self._publish()
+
+    def update_once(self) -> int:
+        """Learn from corrections appended since the last update; returns how many were applied"""
+        records, new_offset = self.store.read_from(self.offset)
+        records = [r for r in records if r.get("text") and isinstance(r.get("statement_types"), list)]
+        if len(records) < self.min_batch:
+            return 0
+
+        # Train a copy so the published model is never mutated while requests use it
+        if self.model is not None:
+            self.model = copy.deepcopy(self.model)
+        self._partial_fit([r["text"] for r in records],
+                          [self._label_vector(r["statement_types"]) for r in records],
+                          weight=self.correction_weight)
+        self.offset = new_offset
+        self.updates += 1
+        self.corrections_seen += len(records)
+        self._write_snapshot()
+        self._publish()
+        logger.info(f"🧠 Online model updated with {len(records)} corrections "
+                    f"(total {self.corrections_seen}, update #{self.updates})")
+        return len(records)
+
+    def start(self):
+        """Start the background thread; it loads or bootstraps the model before publishing it"""
+        self._thread = threading.Thread(target=self._run, name="online-learner", daemon=True)
+        self._thread.start()
+
+    def notify(self):
+        """Wake the learner early (called after each correction is stored)"""
+        self._wakeup.set()
+
+    def stop(self, timeout: float = 10.0):
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _run(self):
+        try:
+            if not self.load_snapshot():
+                self.bootstrap()
+                self._write_snapshot()
+            self._publish()
+        except Exception as e:
+            logger.error(f"Online learner failed to initialize: {e}")
+            return
+        while not self._stop.is_set():
+            self._wakeup.wait(self.update_interval)
+            self._wakeup.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.update_once()
+            except Exception as e:
+                logger.error(f"Online update failed: {e}")
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "enabled": True,
+            "serving": self.publish,
+            "corrections_seen": self.corrections_seen,
+            "updates": self.updates,
+            "last_update": self.last_update,
+            "running": bool(self._thread and self._thread.is_alive())
+        }
@@ -0,0 +1,110 @@
+"""
+Hot reload of parser configs and model artifacts
+The registry holds the active IpruAIEmailParser. A reload builds a complete replacement off
+the request path (reusing the spaCy pipeline and model when unchanged) and then swaps one
+reference, so requests that already took the old parser finish on it
+"""
+
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from email_parser import IpruAIEmailParser
+
+logger = logging.getLogger('IpruAI.Registry')
+
+
+class ParserRegistry:
+    def __init__(self, parser: Optional[IpruAIEmailParser] = None):
+        self._parser = parser or IpruAIEmailParser.from_snapshot()
+        self._reload_lock = threading.Lock()
+        self._on_swap: List[Callable[[IpruAIEmailParser], None]] = []
+        self._watcher = None
+        self._stop = threading.Event()
+        self.reloads = 0
+        self.last_reload_error = None
+
+    @property
+    def parser(self) -> IpruAIEmailParser:
+        """Active parser; take it once per request and use that reference throughout"""
+        return self._parser
+
+    @property
+    def version(self) -> str:
+        return self._parser.version
+
+    def on_swap(self, callback: Callable[[IpruAIEmailParser], None]):
+        """Run after every swap with the new parser (e.g. to re-publish online-learning snapshots)"""
+        self._on_swap.append(callback)
+
+    def is_stale(self) -> bool:
+        """Cheap check: config bytes or artifact mtimes differ from the active parser's"""
+        current = self._parser
+        try:
+            return (IpruAIEmailParser.compute_config_version() != current.config_version or
+                    IpruAIEmailParser.compute_artifact_version(current.model_config) != current.artifact_version)
+        except OSError:
+            return False
+
+    def reload(self, force: bool = False) -> Dict[str, Any]:
+        """Build a new parser and swap it in; the active parser stays in place if the build fails"""
+        with self._reload_lock:
+            previous = self._parser
+            if not force and not self.is_stale():
+                return {"reloaded": False, "version": previous.version}
+
+            started = datetime.now()
+            try:
+                candidate = IpruAIEmailParser(previous=previous)
+                if candidate.ml_enabled and candidate.ml_model is None and previous.ml_model is not None:
+                    # _load_ml_model swallows load errors; don't silently drop to rules-only (unless configured)
+                    raise RuntimeError("ML model failed to load")
+            except Exception as e:
+                self.last_reload_error = f"{datetime.now().isoformat()}: {e}"
+                logger.error(f"❌ Reload failed, keeping version {previous.version}: {e}")
+                return {"reloaded": False, "version": previous.version, "error": str(e)}
+
+            self._parser = candidate
+            self.reloads += 1
+            self.last_reload_error = None
+            for callback in self._on_swap:
+                try:
+                    callback(candidate)
+                except Exception as e:
+                    logger.error(f"Post-reload callback failed: {e}")
+
+            build_seconds = (datetime.now() - started).total_seconds()
+            logger.info(f"🔄 Parser reloaded {previous.version} -> {candidate.version} in {build_seconds:.2f}s")
+            return {
+                "reloaded": True,
+                "previous_version": previous.version,
+                "version": candidate.version,
+                "build_seconds": round(build_seconds, 3)
+            }
+
+    def start_watcher(self, interval: float = 5.0):
+        """Poll config/artifact fingerprints in a daemon thread and reload on change"""
+        def watch():
+            while not self._stop.wait(interval):
+                if self.is_stale():
+                    self.reload()
+
+        self._watcher = threading.Thread(target=watch, name="parser-reload-watcher", daemon=True)
+        self._watcher.start()
+        logger.info(f"👀 Watching configs and model artifacts every {interval}s")
+
+    def stop(self):
+        self._stop.set()
+
+    def status(self) -> Dict[str, Any]:
+        parser = self._parser
+        return {
+            "version": parser.version,
+            "config_version": parser.config_version,
+            "artifact_version": parser.artifact_version,
+            "loaded_at": parser.loaded_at,
+            "reloads": self.reloads,
+            "last_reload_error": self.last_reload_error,
+            "watching": bool(self._watcher and self._watcher.is_alive())
+        }
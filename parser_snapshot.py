@@ -0,0 +1,211 @@
+"""
+Warm-start snapshot of an initialized IpruAIEmailParser
+Building a parser unpickles the random forest (hundreds of ms for 2,200 trees) and compiles it
+for flat inference. A snapshot keeps the inference-ready model instead: the FlatForest node
+arrays and the featurizer (compact trie vocabulary or hashing IDF) as memory-mappable files
+(the pickled model when inference_engine is "sklearn"). Bundles live in versioned directories
+named after the config hash and model artifact fingerprint; a manifest is checked against the
+current configs on load and a stale or missing bundle is rebuilt from a freshly built parser.
+Compiled regexes are not stored: pickling a pattern only records its source, so the rule tables
+are recompiled from the validated configs, which takes a few milliseconds.
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from email_parser import CONFIG_FILES, IpruAIEmailParser
+
+logger = logging.getLogger('IpruAI.Snapshot')
+
+SNAPSHOT_FORMAT = 1
+DEFAULT_SNAPSHOT_DIR = "cache/parser_snapshot"
+MANIFEST_FILE = "manifest.json"
+KEEP_BUNDLES = 2
+
+
+class ParserSnapshot:
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or DEFAULT_SNAPSHOT_DIR
+
+    @staticmethod
+    def current_versions() -> Tuple[str, str]:
+        """(config hash, artifact fingerprint) of the files on disk right now"""
+        with open(CONFIG_FILES[2], 'r') as f:
+            model_config = json.load(f)
+        return IpruAIEmailParser.compute_config_version(), IpruAIEmailParser.compute_artifact_version(model_config)
+
+    def bundle_path(self, config_version: str, artifact_version: str) -> str:
+        return os.path.join(self.directory, f"v{SNAPSHOT_FORMAT}-{config_version}-{artifact_version}")
+
+    def stale_reason(self) -> Optional[str]:
+        """Why the bundle for the current configs and artifacts can't be used; None when it can"""
+        config_version, artifact_version = self.current_versions()
+        path = self.bundle_path(config_version, artifact_version)
+        try:
+            with open(os.path.join(path, MANIFEST_FILE), 'r') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return f"no bundle for config {config_version} and artifacts {artifact_version}"
+        if manifest.get("format") != SNAPSHOT_FORMAT:
+            return f"format {manifest.get('format')} (expected {SNAPSHOT_FORMAT})"
+        if manifest.get("config_version") != config_version:
+            return f"built for config {manifest.get('config_version')}, configs are now {config_version}"
+        if manifest.get("artifact_version") != artifact_version:
+            return f"built for artifacts {manifest.get('artifact_version')}, artifacts are now {artifact_version}"
+        return None
+
+    def build(self, parser: Optional[IpruAIEmailParser] = None) -> Dict[str, Any]:
+        """Write a bundle for `parser` (a freshly built one by default) and prune older bundles"""
+        import joblib
+        from featurizers import COMPACT_FILES, CompactVectorizer, HashingFeaturizer
+        parser = parser or IpruAIEmailParser()
+        start = time.perf_counter()
+        final_path = self.bundle_path(parser.config_version, parser.artifact_version)
+        tmp_path = f"{final_path}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+
+        ml_model, vectorizer = parser._ml_components
+        model_kind = None
+        if ml_model is not None:
+            # None unless inference_engine is "flat" (and the model compiles), so the engine setting holds
+            forest = parser._inference_forest(ml_model)
+            if forest is not None:
+                forest.save(os.path.join(tmp_path, "forest"))
+                model_kind = "flat"
+            else:
+                joblib.dump(ml_model, os.path.join(tmp_path, "model.joblib"))
+                model_kind = "joblib"
+
+        vectorizer_kind = None
+        if vectorizer is not None:
+            vectorizer_dir = os.path.join(tmp_path, "vectorizer")
+            if isinstance(vectorizer, HashingFeaturizer):
+                vectorizer.save(vectorizer_dir)
+                vectorizer_kind = "hashing"
+            elif isinstance(vectorizer, CompactVectorizer):
+                os.makedirs(vectorizer_dir)
+                model_path = parser.model_config["ml_model"]["model_path"]
+                for name in COMPACT_FILES:
+                    shutil.copy2(os.path.join(model_path, name), vectorizer_dir)
+                vectorizer_kind = "compact"
+            else:
+                CompactVectorizer.export(vectorizer, vectorizer_dir)
+                vectorizer_kind = "compact"
+
+        manifest = {
+            "format": SNAPSHOT_FORMAT,
+            "config_version": parser.config_version,
+            "artifact_version": parser.artifact_version,
+            "model": model_kind,
+            "vectorizer": vectorizer_kind,
+            "created_at": datetime.now().isoformat(),
+            "python": sys.version.split()[0],
+            "numpy": np.__version__
+        }
+        # Manifest last: a bundle without one is incomplete and ignored
+        with open(os.path.join(tmp_path, MANIFEST_FILE), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+        try:
+            os.rename(tmp_path, final_path)
+        except OSError:
+            # Another worker published the same version first; theirs is equivalent
+            shutil.rmtree(tmp_path, ignore_errors=True)
+        self._prune(keep=final_path)
+        logger.info(f"📸 Parser snapshot {os.path.basename(final_path)} written in {(time.perf_counter() - start) * 1000:.0f}ms "
+                    f"(model: {model_kind}, vectorizer: {vectorizer_kind})")
+        return manifest
+
+    def _prune(self, keep: str):
+        """Remove all but the newest KEEP_BUNDLES bundles; processes still mapping old files keep their pages"""
+        bundles = sorted((os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                          if os.path.exists(os.path.join(self.directory, name, MANIFEST_FILE))),
+                         key=os.path.getmtime, reverse=True)
+        for path in bundles[KEEP_BUNDLES:]:
+            if path != keep:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def load_components(self) -> Tuple[Any, Any]:
+        """(model, vectorizer) from the current bundle, memory-mapped; only the modules a bundle needs are imported"""
+        path = self.bundle_path(*self.current_versions())
+        with open(os.path.join(path, MANIFEST_FILE), 'r') as f:
+            manifest = json.load(f)
+        model = vectorizer = None
+        if manifest["model"] == "flat":
+            from forest_engine import FlatForest
+            model = FlatForest.load(os.path.join(path, "forest"))
+        elif manifest["model"] == "joblib":
+            import joblib
+            model = joblib.load(os.path.join(path, "model.joblib"))
+        if manifest["vectorizer"] == "hashing":
+            from featurizers import HashingFeaturizer
+            vectorizer = HashingFeaturizer.load(os.path.join(path, "vectorizer"))
+        elif manifest["vectorizer"] == "compact":
+            from featurizers import CompactVectorizer
+            vectorizer = CompactVectorizer.load(os.path.join(path, "vectorizer"))
+        return model, vectorizer
+
+    def load_parser(self, rebuild: bool = True) -> IpruAIEmailParser:
+        """Parser started from the snapshot; a stale or unreadable bundle falls back to a full build
+        (and is rebuilt from it when `rebuild`)"""
+        start = time.perf_counter()
+        reason = self.stale_reason()
+        if reason is None:
+            try:
+                parser = IpruAIEmailParser(ml_components=self.load_components())
+                logger.info(f"⚡ Parser {parser.version} started from snapshot in "
+                            f"{(time.perf_counter() - start) * 1000:.1f}ms")
+                return parser
+            except Exception as e:
+                reason = f"unreadable ({e})"
+        logger.info(f"Parser snapshot in {self.directory} not used: {reason}")
+        parser = IpruAIEmailParser()
+        if rebuild and parser.ml_enabled and parser.ml_model is None:
+            # _load_ml_model swallows load errors; a model-less bundle would pin later workers to rules-only
+            logger.warning("ML model did not load, not building a parser snapshot")
+        elif rebuild:
+            try:
+                self.build(parser)
+            except Exception as e:
+                logger.warning(f"Parser snapshot build failed: {e}")
+        return parser
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Build or check the parser warm-start snapshot')
+    arg_parser.add_argument('--dir', help=f'Snapshot directory (default snapshot.path or {DEFAULT_SNAPSHOT_DIR})')
+    arg_parser.add_argument('--check', action='store_true', help='Only report whether the current bundle is usable')
+    args = arg_parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    with open(CONFIG_FILES[2], 'r') as f:
+        snapshot = ParserSnapshot(args.dir or json.load(f).get("snapshot", {}).get("path"))
+    reason = snapshot.stale_reason()
+    if args.check:
+        logger.info("Parser snapshot is current" if reason is None else f"Parser snapshot is stale: {reason}")
+        sys.exit(0 if reason is None else 1)
+
+    start = time.perf_counter()
+    parser = IpruAIEmailParser()
+    full_build = time.perf_counter() - start
+    if parser.ml_enabled and parser.ml_model is None:
+        logger.error("ML model did not load, not building a parser snapshot")
+        sys.exit(1)
+    snapshot.build(parser)
+    start = time.perf_counter()
+    snapshot.load_parser(rebuild=False)
+    logger.info(f"Full build {full_build * 1000:.0f}ms, snapshot start {(time.perf_counter() - start) * 1000:.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Latency statistics helpers shared by the benchmark, stress test and load test tools
+"""
+
+import math
+import sys
+from typing import Dict, Iterable, List
+
+PERCENTILES = (50, 90, 95, 99)
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Linear-interpolated percentile of an already sorted list (numpy's default method)"""
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * pct / 100.0
+    lower = math.floor(rank)
+    upper = math.ceil(rank)
+    if lower == upper:
+        return float(sorted_values[lower])
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (rank - lower)
+
+def summarize_latencies(values: Iterable[float], digits: int = 3) -> Dict[str, float]:
+    """Count, mean, spread and p50/p90/p95/p99/max of a latency sample"""
+    ordered = sorted(values)
+    count = len(ordered)
+    if count == 0:
+        return {"count": 0}
+
+    mean = sum(ordered) / count
+    variance = sum((v - mean) ** 2 for v in ordered) / (count - 1) if count > 1 else 0.0
+    summary = {
+        "count": count,
+        "mean": round(mean, digits),
+        "stdev": round(math.sqrt(variance), digits),
+        "min": round(ordered[0], digits),
+    }
+    for pct in PERCENTILES:
+        summary[f"p{pct}"] = round(percentile(ordered, pct), digits)
+    summary["max"] = round(ordered[-1], digits)
+    return summary
+
+def peak_rss_mb(include_children: bool = False) -> Dict[str, float]:
+    """Peak resident set size of this process (and optionally its reaped children) in MB"""
+    try:
+        import resource
+    except ImportError:
+        # Windows: no getrusage, fall back to psutil's peak working set when available
+        try:
+            import psutil
+            info = psutil.Process().memory_info()
+            return {"self": round(getattr(info, "peak_wset", info.rss) / (1024 * 1024), 1)}
+        except ImportError:
+            return {}
+
+    # ru_maxrss is kilobytes on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    peaks = {"self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1)}
+    if include_children:
+        peaks["children_max"] = round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale, 1)
+    return peaks
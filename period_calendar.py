@@ -0,0 +1,220 @@
+"""
+Calendar of relative period expressions
+Phrases like "current fy", "last quarter", "ytd" or "eom" only change meaning when the date
+changes, so their (from, to) ranges are computed once per reference day into a table, and
+parameterized ones ("last 3 months", "q3 24", "fy 23-24") are memoized on their parameters.
+Ranges come from financial_calendar.FinancialCalendar. Rules are tried in the order
+extract_date_range has always used them; a rule without a valid range falls through to the next
+"""
+
+import logging
+import re
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Any, Callable, Dict, Hashable, List, NamedTuple, Optional, Tuple
+
+from financial_calendar import FinancialCalendar
+
+logger = logging.getLogger('IpruAI.PeriodCalendar')
+
+DateRange = Tuple[date, date]
+
+LAST_N_PATTERN = re.compile(r'\b(?:last|past|previous)\s+(\d+)\s+(days?|months?|years?|weeks?)\b')
+QUARTER_PATTERNS = (re.compile(r'\bq([1-4])\s+(\d{2,4})\b'),
+                    re.compile(r'\b([1-4])(?:st|nd|rd|th)?\s+quarter\s+(\d{2,4})\b'))
+HALF_YEAR_PATTERNS = (re.compile(r'\bh([1-2])\s+(\d{2,4})\b'),
+                      re.compile(r'\b(first|second)\s+half\s+(\d{2,4})\b'))
+
+
+class PeriodRule(NamedTuple):
+    pattern: str
+    regex: Any
+    period: str                                       # FinancialCalendar period name
+    key: Optional[Callable[[str], Hashable]] = None   # parameter read from the email text
+    keys: Optional[Tuple[Hashable, ...]] = None       # finite parameter domain, kept in the day table
+    dated: bool = True                                # depends on the reference day
+
+
+def _first_keyword(*keywords: str) -> Callable[[str], Optional[str]]:
+    """The first keyword found anywhere in the text (the helpers look at the whole email)"""
+    def key(text: str) -> Optional[str]:
+        for keyword in keywords:
+            if keyword in text:
+                return keyword
+        return None
+    return key
+
+
+def _group(pattern: str, index: int) -> Callable[[str], str]:
+    compiled = re.compile(pattern)
+    # Raises AttributeError when the pattern is absent, which skips the rule like the old lambdas did
+    return lambda text: compiled.search(text).group(index)
+
+
+def _groups(pattern: str) -> Callable[[str], Optional[Tuple[str, ...]]]:
+    compiled = re.compile(pattern)
+
+    def key(text: str) -> Optional[Tuple[str, ...]]:
+        match = compiled.search(text)
+        return match.groups() if match else None
+    return key
+
+
+class PeriodCalendar:
+    def __init__(self, default_from_date: date, max_days: int = 64, memo_size: int = 4096):
+        self.engine = FinancialCalendar(default_from_date)
+        self.max_days = max_days
+        self._tables: "OrderedDict[date, Dict[Tuple[int, Hashable], Optional[DateRange]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._memo = lru_cache(maxsize=memo_size)(self._resolve)
+        self.rules = self._build_rules()
+
+    def _build_rules(self) -> List[PeriodRule]:
+        # (pattern, FinancialCalendar period, parameter from the text, finite parameter domain, dated)
+        rules = [
+            # Financial years
+            (r'\b(current|this)\s+fy\b', 'current_fy'),
+            (r'\b(current|this)\s+financial\s+year\b', 'current_fy'),
+            (r'\b(last|previous)\s+fy\b', 'last_fy'),
+            (r'\b(last|previous)\s+financial\s+year\b', 'last_fy'),
+            (r'\bnext\s+fy\b', 'next_fy'),
+            (r'\bfy\s*(\d{2})[-\s]*(\d{2})\b', 'fy_range', _groups(r'\bfy\s*(\d{2})[-\s]*(\d{2})\b'), None, False),
+            (r'\bfy\s*(\d{4})[-\s]*(\d{2,4})\b', 'fy_range', _groups(r'\bfy\s*(\d{4})[-\s]*(\d{2,4})\b'), None, False),
+            (r'\bfy\s*(\d{2,4})\b', 'specific_fy', _group(r'\bfy\s*(\d{2,4})\b', 1), None, False),
+            (r'\bfinancial\s+year\s*(\d{2})[-\s]*(\d{2})\b', 'fy_range',
+             _groups(r'\bfinancial\s+year\s*(\d{2})[-\s]*(\d{2})\b'), None, False),
+            (r'\bfinancial\s+year\s*(\d{4})[-\s]*(\d{2,4})\b', 'fy_range',
+             _groups(r'\bfinancial\s+year\s*(\d{4})[-\s]*(\d{2,4})\b'), None, False),
+
+            # Current periods
+            (r'\b(current|this)\s+(year|month|quarter)\b', 'current_period',
+             _group(r'\b(current|this)\s+(year|month|quarter)\b', 2), ('year', 'month', 'quarter')),
+            (r'\b(last|previous)\s+(year|month|quarter)\b', 'last_period',
+             _group(r'\b(last|previous)\s+(year|month|quarter)\b', 2), ('year', 'month', 'quarter')),
+
+            # To-date patterns
+            (r'\bytd\b|\byear\s+to\s+date\b', 'ytd'),
+            (r'\bmtd\b|\bmonth\s+to\s+date\b', 'mtd'),
+            (r'\bqtd\b|\bquarter\s+to\s+date\b', 'qtd'),
+            (r'\bwtd\b|\bweek\s+to\s+date\b', 'wtd'),
+
+            # Specific day references
+            (r'\byesterday\b', 'yesterday'),
+            (r'\btoday\b', 'today'),
+            (r'\btomorrow\b', 'tomorrow'),
+
+            # Last N periods
+            (r'\blast\s+(\d+)\s+(days?|months?|years?|weeks?)\b', 'last_n', self._last_n_key),
+            (r'\bpast\s+(\d+)\s+(days?|months?|years?|weeks?)\b', 'last_n', self._last_n_key),
+            (r'\bprevious\s+(\d+)\s+(days?|months?|years?|weeks?)\b', 'last_n', self._last_n_key),
+
+            # Week patterns
+            (r'\blast\s+(week|fortnight)\b', 'last_week', _first_keyword('week', 'fortnight'), ('week', 'fortnight')),
+            (r'\bthis\s+(week|month|year)\b', 'this_period',
+             _first_keyword('week', 'month', 'year'), ('week', 'month', 'year')),
+            (r'\bcurrent\s+(week|month|year)\b', 'this_period',
+             _first_keyword('week', 'month', 'year'), ('week', 'month', 'year')),
+
+            # Quarter patterns
+            (r'\bq[1-4]\s+(\d{2,4})\b', 'quarter', self._quarter_key, None, False),
+            (r'\b(\d{1})(?:st|nd|rd|th)?\s+quarter\s+(\d{2,4})\b', 'quarter', self._quarter_key, None, False),
+            (r'\blast\s+quarter\b', 'last_quarter'),
+            (r'\bthis\s+quarter\b', 'current_quarter'),
+            (r'\bcurrent\s+quarter\b', 'current_quarter'),
+
+            # Half-year patterns
+            (r'\bh[1-2]\s+(\d{2,4})\b', 'half_year', self._half_year_key, None, False),
+            (r'\b(first|second)\s+half\s+(\d{2,4})\b', 'half_year', self._half_year_key, None, False),
+
+            # End of period patterns
+            (r'\bend\s+of\s+(month|quarter|year)\b', 'end_of_period',
+             _first_keyword('month', 'quarter', 'year'), ('month', 'quarter', 'year')),
+            (r'\beom\b', 'end_of_month'),
+            (r'\beoq\b', 'end_of_quarter'),
+            (r'\beoy\b', 'end_of_year')
+        ]
+        return [PeriodRule(pattern, re.compile(pattern), *rest) for pattern, *rest in rules]
+
+    def lookup(self, trigger_text: str, text: str, now: datetime) -> Optional[Tuple[str, DateRange]]:
+        """First rule whose pattern is in `trigger_text` and resolves to a range, as (pattern, range)
+
+        Parameters are read from `text` (the lowercased email) even when the trigger is a
+        spelling-corrected copy of it.
+        """
+        day = now.date()
+        table = None
+        for index, rule in enumerate(self.rules):
+            if not rule.regex.search(trigger_text):
+                continue
+            try:
+                key = rule.key(text) if rule.key is not None else None
+            except Exception as e:
+                logger.debug(f"Pattern {rule.pattern} failed: {e}")
+                continue
+            if rule.key is None or rule.keys is not None:
+                if table is None:
+                    table = self.day_table(day)
+                result = table.get((index, key))
+            else:
+                result = self._memo(index, key, day if rule.dated else None)
+            if result:
+                return rule.pattern, result
+        return None
+
+    def day_table(self, day: date) -> Dict[Tuple[int, Hashable], Optional[DateRange]]:
+        """Ranges of every parameterless (and finite-parameter) rule for one reference day"""
+        table = self._tables.get(day)
+        if table is not None:
+            return table
+        table = {}
+        for index, rule in enumerate(self.rules):
+            if rule.key is None:
+                table[(index, None)] = self._resolve(index, None, day)
+            elif rule.keys is not None:
+                for key in rule.keys:
+                    table[(index, key)] = self._resolve(index, key, day)
+        with self._lock:
+            self._tables[day] = table
+            while len(self._tables) > self.max_days:
+                self._tables.popitem(last=False)
+        return table
+
+    def _resolve(self, index: int, key: Hashable, day: Optional[date]) -> Optional[DateRange]:
+        rule = self.rules[index]
+        try:
+            return self.engine.resolve_one(rule.period, day, key)
+        except Exception as e:
+            logger.debug(f"Pattern {rule.pattern} failed: {e}")
+            return None
+
+    def status(self) -> Dict[str, Any]:
+        memo = self._memo.cache_info()
+        return {"days_cached": len(self._tables), "memo_size": memo.currsize,
+                "memo_hits": memo.hits, "memo_misses": memo.misses}
+
+    # Parameters read from the email text
+
+    @staticmethod
+    def _last_n_key(text: str) -> Optional[Tuple[int, str]]:
+        match = LAST_N_PATTERN.search(text)
+        return (int(match.group(1)), match.group(2)) if match else None
+
+    @staticmethod
+    def _quarter_key(text: str) -> Optional[Tuple[int, int]]:
+        for pattern in QUARTER_PATTERNS:
+            match = pattern.search(text)
+            if match:
+                return int(match.group(1)), int(match.group(2))
+        return None
+
+    @staticmethod
+    def _half_year_key(text: str) -> Optional[Tuple[int, int]]:
+        h_match = HALF_YEAR_PATTERNS[0].search(text)
+        if h_match:
+            return int(h_match.group(1)), int(h_match.group(2))
+        h_match = HALF_YEAR_PATTERNS[1].search(text)
+        if h_match:
+            return 1 if h_match.group(1) == 'first' else 2, int(h_match.group(2))
+        return None
@@ -10,9 +10,13 @@ from datetime import datetime, date, timedelta
 from email_parser import IpruAIEmailParser
 import pandas as pd
 
+# Relative-date expectations below ("yesterday" = 2025-08-10, "last quarter" = Q1 FY26, ...) were written on this day
+REFERENCE_DATE = date(2025, 8, 11)
+
 class RealTimeTestSuite:
-    def __init__(self):
+    def __init__(self, reference_date: date = REFERENCE_DATE):
         self.parser = IpruAIEmailParser()
+        self.reference_date = reference_date
         
     def get_hard_test_cases(self):
         """100 unique, challenging real-world test cases"""
@@ -153,7 +157,7 @@ class RealTimeTestSuite:
             
             try:
                 # Parse the input
-                result = self.parser.parse_email(test_case["input"])
+                result = self.parser.parse_email(test_case["input"], reference_date=self.reference_date)
                 processing_time = (time.time() - start_time) * 1000
                 total_time += processing_time
                 
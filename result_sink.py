@@ -0,0 +1,117 @@
+"""
+Streaming result sinks for large stress runs
+Per-case rows are written to JSONL or Parquet as they complete and read back lazily,
+so a run never holds every parsed case in memory
+"""
+
+import json
+import logging
+import os
+from typing import Any, Dict, Iterator, List
+
+logger = logging.getLogger(__name__)
+
+SINK_FORMATS = ("jsonl", "parquet")
+# Batches held back while some column is still all-None, before falling back to string for it
+MAX_PENDING_BATCHES = 10
+
+
+class StreamingResultSink:
+    """Append-only per-case result writer; rows are flat dicts of scalars"""
+
+    def __init__(self, path: str, fmt: str = "jsonl", batch_size: int = 1000):
+        if fmt not in SINK_FORMATS:
+            raise ValueError(f"Unsupported sink format {fmt}, expected one of {SINK_FORMATS}")
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.fmt = fmt
+        self.batch_size = batch_size
+        self.rows_written = 0
+        self._batch: List[Dict[str, Any]] = []
+        self._flush_at = batch_size
+        self._parquet_writer = None
+
+        if fmt == "parquet":
+            try:
+                import pyarrow  # noqa: F401
+                import pyarrow.parquet  # noqa: F401
+            except ImportError:
+                raise ImportError("Parquet sink requires pyarrow (pip install pyarrow)")
+            self._file = None
+        else:
+            self._file = open(path, 'w', encoding='utf-8')
+
+    def write(self, row: Dict[str, Any]):
+        if self.fmt == "jsonl":
+            self._file.write(json.dumps(row, default=str))
+            self._file.write("\n")
+        else:
+            self._batch.append(row)
+            if len(self._batch) >= self._flush_at:
+                self._flush_parquet()
+        self.rows_written += 1
+
+    def _flush_parquet(self, final: bool = False):
+        if not self._batch:
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self._parquet_writer is None:
+            table = pa.Table.from_pylist(self._batch)
+            untyped = [field for field in table.schema if pa.types.is_null(field.type)]
+            if untyped and not final and len(self._batch) < self.batch_size * MAX_PENDING_BATCHES:
+                # The first batch fixes the file schema; wait until all-None columns have seen a value
+                self._flush_at += self.batch_size
+                return
+            if untyped:
+                logger.debug(f"Parquet sink: no values yet for {[field.name for field in untyped]}, writing them as string")
+                table = table.cast(pa.schema([field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+                                              for field in table.schema]))
+            self._parquet_writer = pq.ParquetWriter(self.path, table.schema)
+        else:
+            # Cast column by column to the file schema: null and int columns widen to it, and a lossy
+            # conversion (a fraction into an int column) raises instead of truncating
+            table = pa.Table.from_pylist(self._batch)
+            schema = self._parquet_writer.schema
+            columns = [table.column(field.name).cast(field.type) if field.name in table.column_names
+                       else pa.nulls(table.num_rows, field.type) for field in schema]
+            table = pa.Table.from_arrays(columns, schema=schema)
+        self._parquet_writer.write_table(table)
+        self._batch = []
+        self._flush_at = self.batch_size
+
+    def close(self):
+        if self.fmt == "jsonl":
+            if self._file and not self._file.closed:
+                self._file.close()
+        else:
+            self._flush_parquet(final=True)
+            if self._parquet_writer is not None:
+                self._parquet_writer.close()
+                self._parquet_writer = None
+        logger.info(f"Result sink closed: {self.rows_written:,} rows in {self.path}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def iter_sink_rows(path: str) -> Iterator[Dict[str, Any]]:
+    """Lazily read rows back from a JSONL or Parquet sink file"""
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(path)
+        for batch in parquet_file.iter_batches():
+            yield from batch.to_pylist()
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
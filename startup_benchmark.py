@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for the parser and the API module
+Starts a fresh interpreter per run with `python -X importtime`, imports email_parser (or main),
+builds the parser and times the first requests, for a rules-only configuration
+(ml_model.enabled false) and the full-ML one. Each configuration runs from a scratch directory
+with its own copy of config/ and the shared models/ and cache/, so the checked-in configs are
+never edited. Reports import, build and first-request times, the slowest top-level imports and
+which heavy modules each stage pulled in, and checks import times against startup.import_budget_ms
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+from typing import Any, Dict, List
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('IpruAI.StartupBenchmark')
+
+DEFAULT_RESULTS_DIR = 'benchmarks'
+MODEL_CONFIG_PATH = 'config/model_config.json'
+TARGETS = ("email_parser", "main")
+# Overrides merged into ml_model for each configuration
+CONFIGURATIONS = {
+    "rules_only": {"enabled": False},
+    "full_ml": {"enabled": True}
+}
+# Modules whose import dominates a cold start; reported per stage so a stray eager import shows up
+HEAVY_MODULES = ("sklearn", "scipy", "spacy", "joblib", "marisa_trie", "dateparser", "datefinder")
+# Shared with the child by symlink: artifacts, and snapshot bundles (with snapshot.enabled) so later runs start warm
+SHARED_DIRS = ("models", "cache")
+PROBE_EMAILS = [
+    ("period", "Please send the capital gain statement for PAN ABCPE1234F for current fy"),
+    ("explicit_dates", "Need transaction statement from 5th March 2023 till 20 Sept 2023 for client D1234567"),
+    ("ambiguous", "kindly share the report asap")
+]
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+# Runs in the child; prints one JSON line with the timings
+CHILD_SCRIPT = """
+import json, sys, time
+HEAVY = %(heavy)r
+loaded = lambda: [name for name in HEAVY if name in sys.modules]
+start = time.perf_counter()
+import %(target)s as target
+imported = time.perf_counter()
+stages = {"import": loaded()}
+if %(target)r == "main":
+    parser = target.registry.parser  # built while main was imported
+else:
+    parser = target.IpruAIEmailParser.from_snapshot()
+built = time.perf_counter()
+stages["build"] = loaded()
+requests = []
+for name, text in %(probes)r:
+    request_start = time.perf_counter()
+    result = parser.parse_email(text)
+    requests.append({"probe": name, "ms": (time.perf_counter() - request_start) * 1000,
+                     "method": result["metadata"]["parsing_method"], "modules": loaded()})
+print(json.dumps({"import_ms": (imported - start) * 1000, "build_ms": (built - imported) * 1000,
+                  "ready_ms": (built - start) * 1000, "ml_loaded": parser.ml_model is not None,
+                  "stages": stages, "requests": requests}))
+"""
+
+
+def parse_importtime(stderr: str) -> Dict[str, int]:
+    """Cumulative import time in microseconds of every top-level package in -X importtime output"""
+    cumulative = {}
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            root = match.group(4).split('.')[0]
+            cumulative[root] = max(cumulative.get(root, 0), int(match.group(2)))
+    return cumulative
+
+
+def prepare_workdir(configuration: str) -> str:
+    """Scratch directory with config/ (ml_model overridden for `configuration`) and links to the shared dirs"""
+    workdir = tempfile.mkdtemp(prefix=f"startup_{configuration}_")
+    shutil.copytree('config', os.path.join(workdir, 'config'))
+    with open(MODEL_CONFIG_PATH, 'r') as f:
+        model_config = json.load(f)
+    model_config["ml_model"].update(CONFIGURATIONS[configuration])
+    with open(os.path.join(workdir, MODEL_CONFIG_PATH), 'w') as f:
+        json.dump(model_config, f, indent=2)
+    for name in SHARED_DIRS:
+        os.makedirs(name, exist_ok=True)
+        os.symlink(os.path.abspath(name), os.path.join(workdir, name))
+    return workdir
+
+
+def run_once(target: str, workdir: str) -> Dict[str, Any]:
+    """One cold start of `target` in a fresh interpreter"""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [os.getcwd(), env.get("PYTHONPATH")]))
+    script = CHILD_SCRIPT % {"target": target, "heavy": HEAVY_MODULES, "probes": PROBE_EMAILS}
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", script], cwd=workdir, env=env,
+                               capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"{target} failed to start:\n{completed.stderr[-2000:]}")
+    run = json.loads(completed.stdout.strip().splitlines()[-1])
+    run["import_us"] = parse_importtime(completed.stderr)
+    return run
+
+
+def summarize(runs: List[Dict[str, Any]], target: str, top: int) -> Dict[str, Any]:
+    """Medians over the runs; module lists and parsing methods come from the last run"""
+    median = lambda values: round(statistics.median(values), 2)
+    last = runs[-1]
+    imports = {name: median([run["import_us"].get(name, 0) for run in runs]) / 1000
+               for name in last["import_us"] if name != target}
+    return {
+        "runs": len(runs),
+        "import_ms": median([run["import_ms"] for run in runs]),
+        "build_ms": median([run["build_ms"] for run in runs]),
+        "ready_ms": median([run["ready_ms"] for run in runs]),
+        "ml_loaded": last["ml_loaded"],
+        "first_requests": [{
+            "probe": request["probe"],
+            "ms": median([run["requests"][i]["ms"] for run in runs]),
+            "method": request["method"],
+            "modules": request["modules"]
+        } for i, request in enumerate(last["requests"])],
+        "modules_after_import": last["stages"]["import"],
+        "modules_after_build": last["stages"]["build"],
+        # Everything imported during the run, including what the build and the first requests pulled in
+        "top_imports_ms": dict(sorted(imports.items(), key=lambda item: -item[1])[:top])
+    }
+
+
+def check_budget(results: Dict[str, Any], budget: Dict[str, Dict[str, float]]) -> List[str]:
+    """Import times over startup.import_budget_ms (per configuration and target), as messages"""
+    failures = []
+    for configuration, targets in results["configurations"].items():
+        for target, summary in targets.items():
+            limit = budget.get(configuration, {}).get(target)
+            if limit is not None and summary["import_ms"] > limit:
+                failures.append(f"{configuration}/{target}: import {summary['import_ms']:.0f}ms > budget {limit:.0f}ms")
+    return failures
+
+
+def run_benchmark(runs: int, configurations: List[str], targets: List[str], top: int) -> Dict[str, Any]:
+    results = {
+        "timestamp": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "runs": runs,
+        "configurations": {}
+    }
+    for configuration in configurations:
+        workdir = prepare_workdir(configuration)
+        try:
+            results["configurations"][configuration] = {}
+            for target in targets:
+                run_once(target, workdir)  # warms the page cache (and builds the snapshot bundle when snapshot.enabled)
+                summary = summarize([run_once(target, workdir) for _ in range(runs)], target, top)
+                results["configurations"][configuration][target] = summary
+                requests = ", ".join(f"{r['probe']} {r['ms']:.1f}ms" for r in summary["first_requests"])
+                logger.info(f"🚀 {configuration:10} {target:12} import {summary['import_ms']:7.1f}ms  "
+                            f"build {summary['build_ms']:7.1f}ms  first requests: {requests}")
+                logger.info(f"   heavy modules after import: {summary['modules_after_import'] or 'none'}, "
+                            f"after build: {summary['modules_after_build'] or 'none'}")
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Cold-start import and first-request benchmark')
+    arg_parser.add_argument('--runs', type=int, default=5, help='Timed cold starts per configuration and target')
+    arg_parser.add_argument('--configurations', nargs='+', choices=list(CONFIGURATIONS), default=list(CONFIGURATIONS))
+    arg_parser.add_argument('--targets', nargs='+', choices=TARGETS, default=list(TARGETS))
+    arg_parser.add_argument('--top', type=int, default=10, help='Slowest top-level imports to report')
+    arg_parser.add_argument('--output', help='Results JSON path (default benchmarks/startup_<timestamp>.json)')
+    args = arg_parser.parse_args()
+
+    with open(MODEL_CONFIG_PATH, 'r') as f:
+        budget = json.load(f).get("startup", {}).get("import_budget_ms", {})
+    results = run_benchmark(args.runs, args.configurations, args.targets, args.top)
+    failures = check_budget(results, budget)
+    results["budget"] = {"import_budget_ms": budget, "exceeded": failures}
+    for failure in failures:
+        logger.error(f"❌ {failure}")
+
+    output = args.output or os.path.join(
+        DEFAULT_RESULTS_DIR, f"startup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    logger.info(f"Results written to {output}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
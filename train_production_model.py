@@ -4,18 +4,37 @@ Production-ready ML Model Trainer for Email Parser
 Comprehensive training with enhanced features and validation
 """
 
+import copy
+import io
 import json
+import math
 import os
+import time
+import random
 import logging
-from typing import List, Dict, Tuple
+import argparse
+import tempfile
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Optional, Tuple
 import numpy as np
+from sklearn.base import clone
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.svm import LinearSVC
+from sklearn.calibration import CalibratedClassifierCV
 from sklearn.multioutput import MultiOutputClassifier
 from sklearn.model_selection import train_test_split, cross_val_score
 from sklearn.metrics import classification_report, accuracy_score, f1_score
 import joblib
-from email_parser import IpruAIEmailParser
+from joblib import Parallel, delayed
+from email_parser import IpruAIEmailParser, ML_FEATURE_VERSION
+from feature_cache import FeatureCache, DEFAULT_CACHE_DIR
+from featurizers import (HashingFeaturizer, StructuredFeaturizer, CompactVectorizer, FEATURIZER_TYPES, COMPACT_FILES,
+                         join_feature_parts)
+from forest_engine import FlatForest
+from build_corpora import iter_corpus
 import matplotlib.pyplot as plt
 import seaborn as sns
 from datetime import datetime
@@ -23,10 +42,59 @@ from datetime import datetime
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class ProductionMLTrainer:
-    def __init__(self):
-        self.parser = IpruAIEmailParser()
-        self.vectorizer = TfidfVectorizer(
+# Identifier extraction workers only need the compiled regexes, not spaCy or the model
+_identifier_parser = None
+
+def _init_identifier_worker():
+    global _identifier_parser
+    _identifier_parser = IpruAIEmailParser.__new__(IpruAIEmailParser)
+    _identifier_parser.load_configs()
+    _identifier_parser._compile_regex_patterns()
+
+def _extract_identifiers_chunk(texts: List[str]) -> List[Dict]:
+    return [_identifier_parser.extract_identifiers(text) for text in texts]
+
+MODEL_BACKENDS = ("random_forest", "logistic_regression", "linear_svm")
+
+def build_model(backend: str = "random_forest", params: Dict = None) -> MultiOutputClassifier:
+    """Multi-output classifier for ml_model.backend; every backend exposes predict_proba for the parser
+    
+    `params` override the estimator's defaults (e.g. from a hyperparameter search).
+    """
+    if backend == "random_forest":
+        estimator = RandomForestClassifier(
+            n_estimators=200,  # Increased for better performance
+            max_depth=15,  # Prevent overfitting
+            min_samples_split=5,
+            min_samples_leaf=2,
+            random_state=42,
+            n_jobs=-1,
+            class_weight='balanced'  # Handle class imbalance
+        )
+    elif backend == "logistic_regression":
+        estimator = LogisticRegression(
+            C=4.0,
+            solver='liblinear',
+            max_iter=1000,
+            class_weight='balanced'
+        )
+    elif backend == "linear_svm":
+        # LinearSVC has no predict_proba; sigmoid calibration provides it for _calculate_ml_confidence
+        estimator = CalibratedClassifierCV(
+            LinearSVC(C=0.5, class_weight='balanced', max_iter=5000),
+            method='sigmoid',
+            cv=3
+        )
+    else:
+        raise ValueError(f"Unknown ml_model.backend {backend}, expected one of {MODEL_BACKENDS}")
+    if params:
+        estimator.set_params(**params)
+    return MultiOutputClassifier(estimator)
+
+def build_featurizer(featurizer: str = "tfidf", params: Dict = None):
+    """Text featurizer for ml_model.featurizer; both share tokenization, n-grams and stop words"""
+    if featurizer == "tfidf":
+        vectorizer = TfidfVectorizer(
             max_features=8000,  # Increased for better feature coverage
             ngram_range=(1, 4),  # Include 4-grams for better phrase capture
             stop_words='english',
@@ -34,25 +102,180 @@ class ProductionMLTrainer:
             max_df=0.95,  # Ignore terms that appear in more than 95% of documents
             sublinear_tf=True  # Use sublinear tf scaling
         )
-        self.model = MultiOutputClassifier(
-            RandomForestClassifier(
-                n_estimators=200,  # Increased for better performance
-                max_depth=15,  # Prevent overfitting
-                min_samples_split=5,
-                min_samples_leaf=2,
-                random_state=42,
-                n_jobs=-1,
-                class_weight='balanced'  # Handle class imbalance
-            )
-        )
+        return vectorizer.set_params(**params) if params else vectorizer
+    if featurizer == "hashing":
+        return HashingFeaturizer(**{
+            "n_features": 2 ** 18,
+            "ngram_range": (1, 4),
+            "stop_words": 'english',
+            "min_df": 2,
+            "max_df": 0.95,
+            "sublinear_tf": True,
+            **(params or {})
+        })
+    if featurizer == "structured":
+        return StructuredFeaturizer(**{
+            "max_features": 8000,
+            "ngram_range": (1, 4),
+            "stop_words": 'english',
+            "min_df": 2,
+            "max_df": 0.95,
+            "sublinear_tf": True,
+            **(params or {})
+        })
+    raise ValueError(f"Unknown ml_model.featurizer {featurizer}, expected one of {FEATURIZER_TYPES}")
+
+def featurizer_input(featurizer, features: List[Tuple[str, List[str]]]) -> List:
+    """(text, tokens) feature pairs as the featurizer takes them: as-is when structured, joined strings otherwise"""
+    return features if getattr(featurizer, "takes_parts", False) else join_feature_parts(features)
+
+def export_compact_vectorizer(model_path: str = "models/spacy_model") -> Dict:
+    """Export model_path/vectorizer.joblib as a CompactVectorizer next to it and measure both artifacts
+    
+    Reports file size, load time and loaded heap (tracemalloc) of the pickled vectorizer and of the
+    memory-mapped export; mapped pages are shared page cache rather than per-process heap.
+    """
+    source_path = os.path.join(model_path, "vectorizer.joblib")
+    vectorizer = joblib.load(source_path)
+    params = CompactVectorizer.export(vectorizer, model_path, source_path=source_path)
+    
+    def measure(load):
+        start = time.perf_counter()
+        load()
+        load_time = time.perf_counter() - start
+        tracemalloc.start()
+        loaded = load()
+        heap_bytes, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return loaded, round(load_time * 1000, 2), round(heap_bytes / (1024 * 1024), 3)
+    
+    pickled, pickled_load_ms, pickled_heap_mb = measure(lambda: joblib.load(source_path))
+    compact, compact_load_ms, compact_heap_mb = measure(lambda: CompactVectorizer.load(model_path))
+    report = {
+        "source": params["source"],
+        "vocabulary_terms": len(compact.trie),
+        "stop_words_dropped": len(getattr(pickled, "stop_words_", None) or ()),
+        "pickled_mb": round(os.path.getsize(source_path) / (1024 * 1024), 3),
+        "compact_mb": round(sum(os.path.getsize(os.path.join(model_path, name)) for name in COMPACT_FILES)
+                            / (1024 * 1024), 3),
+        "pickled_load_ms": pickled_load_ms,
+        "compact_load_ms": compact_load_ms,
+        "pickled_heap_mb": pickled_heap_mb,
+        "compact_heap_mb": compact_heap_mb
+    }
+    logger.info(f"📦 Compact vectorizer: {report['vocabulary_terms']} terms, {report['stop_words_dropped']} "
+                f"stop_words_ dropped; {report['pickled_mb']} -> {report['compact_mb']} MB on disk, load "
+                f"{pickled_load_ms} -> {compact_load_ms} ms, heap {pickled_heap_mb} -> {compact_heap_mb} MB")
+    return report
+
+# Hyperparameter search: featurizer and backend are drawn first, then each of their parameters
+SEARCH_SPACE = {
+    "featurizer": {
+        "tfidf": {"max_features": [4000, 8000, 16000], "ngram_range": [(1, 2), (1, 3), (1, 4)], "min_df": [1, 2, 3]},
+        "hashing": {"n_features": [2 ** 16, 2 ** 18], "ngram_range": [(1, 2), (1, 3), (1, 4)], "min_df": [1, 2, 3]},
+        "structured": {"max_features": [4000, 8000, 16000], "ngram_range": [(1, 2), (1, 3), (1, 4)], "min_df": [1, 2, 3]}
+    },
+    "backend": {
+        "random_forest": {"n_estimators": [50, 100, 200], "max_depth": [10, 15, 25, None],
+                          "min_samples_leaf": [1, 2, 4]},
+        "logistic_regression": {"C": [0.5, 1.0, 2.0, 4.0, 8.0, 16.0]},
+        "linear_svm": {"estimator__C": [0.1, 0.25, 0.5, 1.0, 2.0]}
+    }
+}
+
+def sample_candidates(n: int, seed: int = 42, space: Dict = SEARCH_SPACE) -> List[Dict]:
+    """Up to n distinct random configurations from the search space"""
+    rng = random.Random(seed)
+    candidates, seen = [], set()
+    for _ in range(n * 20):
+        if len(candidates) >= n:
+            break
+        featurizer = rng.choice(sorted(space["featurizer"]))
+        backend = rng.choice(sorted(space["backend"]))
+        candidate = {
+            "featurizer": featurizer,
+            "featurizer_params": {k: rng.choice(v) for k, v in space["featurizer"][featurizer].items()},
+            "backend": backend,
+            "model_params": {k: rng.choice(v) for k, v in space["backend"][backend].items()}
+        }
+        key = json.dumps(candidate, sort_keys=True, default=str)
+        if key not in seen:
+            seen.add(key)
+            candidate["id"] = f"c{len(candidates):02d}"
+            candidates.append(candidate)
+    return candidates
+
+def _fit_candidate(candidate: Dict, X_train, y_train, X_val, y_val):
+    """Fit one candidate on a (sub)sample; runs in a joblib worker. Returns (model, macro F1, error)"""
+    params = dict(candidate["model_params"])
+    if candidate["backend"] == "random_forest":
+        params["n_jobs"] = 1  # parallelism comes from running candidates side by side
+    try:
+        model = build_model(candidate["backend"], params)
+        model.fit(X_train, y_train)
+        y_pred = model.predict(X_val)
+    except Exception as e:  # e.g. a label with a single class in a small subsample
+        return None, float('-inf'), str(e)
+    f1s = [f1_score(y_val[:, i], y_pred[:, i], average='binary', zero_division=0)
+           for i in range(y_val.shape[1]) if np.sum(y_val[:, i]) > 0]
+    return model, float(np.mean(f1s)) if f1s else 0.0, None
+
+def _first_trees(forest: RandomForestClassifier, k: int) -> RandomForestClassifier:
+    """Shallow copy of a fitted forest that votes with its first k trees (the trees themselves are shared)"""
+    sub_forest = copy.copy(forest)
+    sub_forest.estimators_ = forest.estimators_[:k]
+    sub_forest.n_estimators = len(sub_forest.estimators_)
+    return sub_forest
+
+def prune_forest(model: MultiOutputClassifier, trees_per_output: List[int]) -> MultiOutputClassifier:
+    """Copy of a multi-output forest keeping the first k trees of each output's forest"""
+    pruned = copy.copy(model)
+    pruned.estimators_ = [_first_trees(forest, k) for forest, k in zip(model.estimators_, trees_per_output)]
+    pruned.estimator = clone(model.estimator).set_params(n_estimators=max(trees_per_output))
+    return pruned
+
+def count_nodes(model: MultiOutputClassifier) -> Tuple[int, int]:
+    """(trees, tree nodes) across every output's forest"""
+    trees = [tree for forest in model.estimators_ for tree in forest.estimators_]
+    return len(trees), sum(tree.tree_.node_count for tree in trees)
+
+def _label_f1s(y_true: np.ndarray, y_pred: np.ndarray) -> List[Optional[float]]:
+    """Binary F1 per label, None where the labels have no positives to score"""
+    return [f1_score(y_true[:, i], y_pred[:, i], average='binary', zero_division=0) if np.sum(y_true[:, i]) > 0
+            else None for i in range(y_true.shape[1])]
+
+def _macro_f1(f1s: List[Optional[float]]) -> float:
+    scored = [f1 for f1 in f1s if f1 is not None]
+    return float(np.mean(scored)) if scored else 0.0
+
+class ProductionMLTrainer:
+    def __init__(self, use_cache: bool = True, cache_dir: str = DEFAULT_CACHE_DIR, corpus_path: str = None,
+                 backend: str = None, featurizer: str = None):
+        self.parser = IpruAIEmailParser()
+        self.backend = backend or self.parser.model_config["ml_model"].get("backend", "random_forest")
+        self.featurizer = featurizer or self.parser.model_config["ml_model"].get("featurizer", "tfidf")
+        self.feature_cache = FeatureCache(cache_dir) if use_cache else None
+        self.feature_key = None
+        self.corpus_path = corpus_path
+        self.vectorizer = build_featurizer(self.featurizer)
+        self.model = build_model(self.backend)
         self.label_names = None
         
-    def prepare_training_data(self, size: int = 2000) -> Tuple[List[str], np.ndarray, List[str]]:
+    def prepare_training_data(self, size: int = 2000) -> Tuple[List[Tuple[str, List[str]]], np.ndarray, List[str]]:
         """Generate and prepare comprehensive training data"""
-        logger.info(f"Generating {size} training samples...")
-        
-        # Generate synthetic data
-        training_data = self.parser.generate_training_data(size)
+        if self.corpus_path:
+            logger.info(f"Loading up to {size} training samples from {self.corpus_path}...")
+            training_data = [
+                {"text": case["input_text"], "labels": {"statement_types": case["expected"].get("statement_types", [])}}
+                for case in iter_corpus(self.corpus_path, limit=size)
+            ]
+        else:
+            logger.info(f"Generating {size} training samples...")
+            # Seeded so repeat runs produce the same corpus (and hit the feature cache)
+            rng = random.Random(self.parser.model_config["training"].get("random_seed", 42))
+            
+            # Generate synthetic data
+            training_data = self.parser.generate_training_data(size, rng=rng)
         
         # Prepare features and labels
         texts = []
@@ -64,15 +287,27 @@ class ProductionMLTrainer:
         
         logger.info(f"Training for {len(self.label_names)} statement types: {self.label_names}")
         
+        if self.feature_cache:
+            corpus_hash = FeatureCache.corpus_hash(
+                [sample["text"] for sample in training_data],
+                [sample["labels"].get("statement_types", []) for sample in training_data])
+            nlp = self.parser.nlp
+            spacy_model = self.parser.model_config["ml_model"]["spacy_model"] if nlp else None
+            self.feature_key = FeatureCache.feature_key(
+                corpus_hash, ML_FEATURE_VERSION, spacy_model, self.label_names, self.parser.regex_patterns,
+                spacy_version=nlp.meta.get("version") if nlp else None)
+            cached = self.feature_cache.load_features(self.feature_key)
+            if cached:
+                texts, labels = cached
+                return texts, labels, self.label_names
+        
+        # Extract features for all samples up front: identifiers in a process pool, spaCy via nlp.pipe
+        all_features = self.extract_features([sample["text"] for sample in training_data])
+        
         for i, sample in enumerate(training_data):
             try:
-                text = sample["text"]
                 sample_labels = sample["labels"]
-                
-                # Extract features using the parser's method
-                identifiers = self.parser.extract_identifiers(text)
-                features = self.parser._extract_ml_features(text, identifiers)
-                texts.append(features)
+                texts.append(all_features[i])
                 
                 # Create multi-label output vector
                 label_vector = [0] * len(self.label_names)
@@ -94,7 +329,69 @@ class ProductionMLTrainer:
                 continue
         
         logger.info(f"Prepared {len(texts)} training samples")
-        return texts, np.array(labels), self.label_names
+        labels = np.array(labels)
+        if self.feature_cache:
+            self.feature_cache.store_features(self.feature_key, texts, labels, {
+                "corpus_hash": corpus_hash,
+                "corpus_path": self.corpus_path,
+                "feature_version": ML_FEATURE_VERSION,
+                "spacy_model": spacy_model,
+                "label_names": self.label_names
+            })
+        return texts, labels, self.label_names
+    
+    def vectorize(self, texts: List[Tuple[str, List[str]]]):
+        """Fit the vectorizer and transform, or reuse a cached fit for the same features and params"""
+        self.vectorizer, X = self._fit_featurizer(self.vectorizer, texts)
+        return X
+    
+    def _fit_featurizer(self, featurizer, texts: List[Tuple[str, List[str]]], fit_rows: Optional[np.ndarray] = None):
+        """(featurizer, X) for all texts; with fit_rows the featurizer is fit on those rows only"""
+        def fit_transform():
+            if fit_rows is None:
+                return featurizer.fit_transform(featurizer_input(featurizer, texts))
+            featurizer.fit(featurizer_input(featurizer, [texts[i] for i in fit_rows]))
+            return featurizer.transform(featurizer_input(featurizer, texts))
+        
+        if self.feature_cache and self.feature_key:
+            params = {"type": type(featurizer).__name__, **featurizer.get_params()}
+            if fit_rows is not None:
+                params["fit_rows"] = [int(i) for i in fit_rows]
+            matrix_key = FeatureCache.matrix_key(params)
+            cached = self.feature_cache.load_matrix(self.feature_key, matrix_key)
+            if cached:
+                return cached
+            X = fit_transform()
+            self.feature_cache.store_matrix(self.feature_key, matrix_key, featurizer, X)
+            return featurizer, X
+        return featurizer, fit_transform()
+    
+    def extract_features(self, texts: List[str]) -> List[Tuple[str, List[str]]]:
+        """Batched equivalent of extract_identifiers + _extract_ml_feature_parts per text"""
+        training_config = self.parser.model_config["training"]
+        workers = training_config.get("identifier_workers", 0) or os.cpu_count() or 1
+        batch_size = training_config.get("spacy_batch_size", 256)
+        n_process = training_config.get("spacy_n_process", 1)
+        
+        start = time.perf_counter()
+        if workers > 1 and len(texts) >= 1000:
+            chunk_size = max(100, len(texts) // (workers * 4))
+            chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_identifier_worker) as pool:
+                identifiers_list = [ids for chunk in pool.map(_extract_identifiers_chunk, chunks) for ids in chunk]
+        else:
+            workers = 1
+            identifiers_list = [self.parser.extract_identifiers(text) for text in texts]
+        identifiers_time = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        features = self.parser._extract_ml_features_batch(texts, identifiers_list, batch_size, n_process)
+        features_time = time.perf_counter() - start
+        
+        logger.info(f"Extracted features for {len(texts)} samples: identifiers {identifiers_time:.2f}s "
+                    f"({workers} process(es)), ML features {features_time:.2f}s "
+                    f"(nlp.pipe batch_size={batch_size}, n_process={n_process})")
+        return features
     
     def train_model(self, size: int = 2000, test_size: float = 0.2):
         """Train the production ML model with comprehensive evaluation"""
@@ -105,7 +402,7 @@ class ProductionMLTrainer:
         
         # Vectorize features
         logger.info("Vectorizing features...")
-        X = self.vectorizer.fit_transform(texts)
+        X = self.vectorize(texts)
         logger.info(f"Feature matrix shape: {X.shape}")
         
         # Split data (remove stratify due to class imbalance)
@@ -117,7 +414,7 @@ class ProductionMLTrainer:
         logger.info(f"Test set: {X_test.shape[0]} samples")
         
         # Train model
-        logger.info("Training model...")
+        logger.info(f"Training model ({self.backend})...")
         self.model.fit(X_train, y_train)
         
         # Evaluate on test set
@@ -179,10 +476,387 @@ class ProductionMLTrainer:
                 logger.info(f"Skipping CV for {label_names[i]} - insufficient samples ({np.sum(y_train[:, i])})")
         
         # Feature importance analysis
-        self.analyze_feature_importance()
+        if self.backend == "random_forest":
+            self.analyze_feature_importance()
         
         return overall_accuracy, results
     
+    def compare_backends(self, size: int = 2000, test_size: float = 0.2,
+                         backends: Tuple[str, ...] = MODEL_BACKENDS, latency_samples: int = 200) -> List[Dict]:
+        """Fit every backend on the same split; report per-label F1, single-email latency,
+        batch throughput and artifact size"""
+        texts, labels, label_names = self.prepare_training_data(size)
+        X = self.vectorize(texts)
+        X_train, X_test, y_train, y_test = train_test_split(X, labels, test_size=test_size, random_state=42)
+        single_rows = [X_test[i] for i in range(min(latency_samples, X_test.shape[0]))]
+        
+        rows = []
+        for backend in backends:
+            logger.info(f"⚖️  Fitting {backend}...")
+            model = build_model(backend)
+            start = time.perf_counter()
+            model.fit(X_train, y_train)
+            fit_time = time.perf_counter() - start
+            
+            y_pred = model.predict(X_test)
+            per_label_f1 = {
+                name: round(f1_score(y_test[:, i], y_pred[:, i], average='binary', zero_division=0), 3)
+                for i, name in enumerate(label_names) if np.sum(y_test[:, i]) > 0
+            }
+            
+            # Same calls the parser makes per fallback request: predict + predict_proba on one row
+            single_ms = []
+            for row in single_rows:
+                start = time.perf_counter()
+                model.predict(row)
+                model.predict_proba(row)
+                single_ms.append((time.perf_counter() - start) * 1000)
+            single_ms.sort()
+            
+            start = time.perf_counter()
+            model.predict_proba(X_test)
+            batch_time = time.perf_counter() - start
+            
+            buffer = io.BytesIO()
+            joblib.dump(model, buffer)
+            artifact_bytes = buffer.tell()
+            buffer.seek(0)
+            start = time.perf_counter()
+            joblib.load(buffer)
+            load_time = time.perf_counter() - start
+            
+            rows.append({
+                "backend": backend,
+                "macro_f1": round(float(np.mean(list(per_label_f1.values()))), 3) if per_label_f1 else 0.0,
+                "per_label_f1": per_label_f1,
+                "single_email_p50_ms": round(single_ms[len(single_ms) // 2], 3),
+                "single_email_p99_ms": round(single_ms[int(len(single_ms) * 0.99)], 3),
+                "batch_throughput_per_sec": round(X_test.shape[0] / batch_time, 1),
+                "artifact_mb": round(artifact_bytes / (1024 * 1024), 2),
+                "load_time_ms": round(load_time * 1000, 1),
+                "fit_time_s": round(fit_time, 2)
+            })
+        
+        self._log_comparison(rows, label_names)
+        return rows
+    
+    def compare_featurizers(self, size: int = 2000, test_size: float = 0.2,
+                            featurizers: Tuple[str, ...] = FEATURIZER_TYPES) -> List[Dict]:
+        """Train the configured backend on each featurizer; report artifact size, load time,
+        loaded memory, per-email transform latency and the macro-F1 delta against TF-IDF"""
+        texts, labels, label_names = self.prepare_training_data(size)
+        rows = []
+        for kind in featurizers:
+            logger.info(f"⚖️  Fitting {kind} featurizer + {self.backend}...")
+            featurizer, X = self._fit_featurizer(build_featurizer(kind), texts)
+            X_train, X_test, y_train, y_test = train_test_split(X, labels, test_size=test_size, random_state=42)
+            model = build_model(self.backend)
+            model.fit(X_train, y_train)
+            y_pred = model.predict(X_test)
+            f1s = [f1_score(y_test[:, i], y_pred[:, i], average='binary', zero_division=0)
+                   for i in range(len(label_names)) if np.sum(y_test[:, i]) > 0]
+            
+            with tempfile.TemporaryDirectory() as tmp:
+                if kind == "hashing":
+                    featurizer.save(tmp)
+                    load = lambda: HashingFeaturizer.load(tmp)
+                else:
+                    joblib.dump(featurizer, os.path.join(tmp, "vectorizer.joblib"))
+                    load = lambda: joblib.load(os.path.join(tmp, "vectorizer.joblib"))
+                artifact_bytes = sum(os.path.getsize(os.path.join(tmp, name)) for name in os.listdir(tmp))
+                
+                tracemalloc.start()
+                start = time.perf_counter()
+                loaded = load()
+                load_time = time.perf_counter() - start
+                loaded_bytes, _ = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                
+                transform_ms = []
+                for text in texts[:200]:
+                    start = time.perf_counter()
+                    loaded.transform(featurizer_input(loaded, [text]))
+                    transform_ms.append((time.perf_counter() - start) * 1000)
+                transform_ms.sort()
+                del loaded
+            
+            rows.append({
+                "featurizer": kind,
+                "n_features": X.shape[1],
+                "macro_f1": round(float(np.mean(f1s)), 4) if f1s else 0.0,
+                "artifact_mb": round(artifact_bytes / (1024 * 1024), 2),
+                "load_time_ms": round(load_time * 1000, 1),
+                "loaded_heap_mb": round(loaded_bytes / (1024 * 1024), 2),
+                "transform_p50_ms": round(transform_ms[len(transform_ms) // 2], 3)
+            })
+        
+        baseline = next((row["macro_f1"] for row in rows if row["featurizer"] == "tfidf"), None)
+        logger.info(f"\n📊 Featurizer comparison ({self.backend}):")
+        logger.info(f"{'featurizer':12} {'columns':>8} {'macroF1':>8} {'ΔF1':>8} {'MB':>7} {'load ms':>8} "
+                    f"{'heap MB':>8} {'xform ms':>9}")
+        for row in rows:
+            row["macro_f1_delta"] = round(row["macro_f1"] - baseline, 4) if baseline is not None else None
+            delta = f"{row['macro_f1_delta']:+8.4f}" if row["macro_f1_delta"] is not None else f"{'-':>8}"
+            logger.info(f"{row['featurizer']:12} {row['n_features']:8d} {row['macro_f1']:8.4f} {delta} "
+                        f"{row['artifact_mb']:7.2f} {row['load_time_ms']:8.1f} {row['loaded_heap_mb']:8.2f} "
+                        f"{row['transform_p50_ms']:9.3f}")
+        return rows
+    
+    def search(self, size: int = 2000, test_size: float = 0.2, n_candidates: int = None, n_jobs: int = None,
+               seed: int = None) -> Tuple[Dict, List[Dict]]:
+        """Successive-halving search over featurizer and model hyperparameters
+        
+        Every candidate starts on a small subsample of the training split; after each round only the
+        best 1/eta by objective (macro-F1 minus a per-email latency penalty) go on to eta times more
+        samples, the last round using the full split. Fits run in parallel with joblib on the cached
+        matrices; latency is then measured serially, uncontended, for each surviving fit. The winner's
+        model and featurizer are left on the trainer for save_model.
+        """
+        search_config = self.parser.model_config["training"].get("search", {})
+        n_candidates = n_candidates or search_config.get("n_candidates", 24)
+        n_jobs = n_jobs or search_config.get("n_jobs", -1)
+        seed = seed if seed is not None else self.parser.model_config["training"].get("random_seed", 42)
+        eta = search_config.get("eta", 3)
+        latency_weight = search_config.get("latency_weight", 0.05)
+        latency_ref_ms = search_config.get("latency_ref_ms", 100.0)
+        latency_samples = search_config.get("latency_samples", 50)
+        
+        texts, labels, label_names = self.prepare_training_data(size)
+        train_idx, val_idx = train_test_split(np.arange(len(texts)), test_size=test_size, random_state=42)
+        y_val = labels[val_idx]
+        val_texts = [texts[i] for i in val_idx[:latency_samples]]
+        
+        candidates = sample_candidates(n_candidates, seed)
+        # One featurizer and X per distinct featurizer config, shared by all its candidates; fit on the
+        # training split only, so the validation rows' vocabulary and IDF don't leak into the scores
+        matrices = {}
+        for candidate in candidates:
+            key = json.dumps([candidate["featurizer"], candidate["featurizer_params"]], sort_keys=True, default=str)
+            if key not in matrices:
+                featurizer = build_featurizer(candidate["featurizer"], candidate["featurizer_params"])
+                matrices[key] = self._fit_featurizer(featurizer, texts, fit_rows=train_idx)
+            candidate["_matrix"] = key
+        
+        # Nested subsamples of the training split: round r uses the first resources[r] rows of one permutation
+        order = np.random.RandomState(seed).permutation(len(train_idx))
+        min_resource = search_config.get("min_resource", 200)
+        rounds = max(1, min(int(math.log(len(candidates), eta)) + 1,
+                            int(math.log(max(1, len(train_idx) / min_resource), eta)) + 1))
+        resources = [int(len(train_idx) / eta ** (rounds - 1 - r)) for r in range(rounds)]
+        logger.info(f"🔎 Successive halving: {len(candidates)} candidates, {len(matrices)} featurizer configs, "
+                    f"rounds on {resources} samples (eta={eta}, n_jobs={n_jobs})")
+        
+        leaderboard = {c["id"]: {"id": c["id"], "featurizer": c["featurizer"], "featurizer_params": c["featurizer_params"],
+                                 "backend": c["backend"], "model_params": c["model_params"], "rounds": []}
+                       for c in candidates}
+        survivors = candidates
+        fitted = {}
+        for round_no, resource in enumerate(resources):
+            rows = train_idx[order[:resource]]
+            start = time.perf_counter()
+            outcomes = Parallel(n_jobs=n_jobs)(
+                delayed(_fit_candidate)(c, matrices[c["_matrix"]][1][rows], labels[rows],
+                                        matrices[c["_matrix"]][1][val_idx], y_val)
+                for c in survivors)
+            fit_time = time.perf_counter() - start
+            
+            scored = []
+            for candidate, (model, macro_f1, error) in zip(survivors, outcomes):
+                entry = {"round": round_no, "samples": resource, "macro_f1": round(macro_f1, 4) if error is None else None}
+                if error is None:
+                    featurizer = matrices[candidate["_matrix"]][0]
+                    single_ms = []
+                    for text in val_texts:
+                        t0 = time.perf_counter()
+                        X_one = featurizer.transform(featurizer_input(featurizer, [text]))
+                        model.predict(X_one)
+                        model.predict_proba(X_one)
+                        single_ms.append((time.perf_counter() - t0) * 1000)
+                    latency_ms = float(np.median(single_ms))
+                    score = macro_f1 - latency_weight * latency_ms / latency_ref_ms
+                    entry.update({"latency_p50_ms": round(latency_ms, 3), "score": round(score, 4)})
+                    fitted[candidate["id"]] = model
+                    scored.append((score, candidate))
+                else:
+                    entry["error"] = error
+                leaderboard[candidate["id"]]["rounds"].append(entry)
+            
+            scored.sort(key=lambda item: item[0], reverse=True)
+            keep = max(1, math.ceil(len(scored) / eta)) if round_no < len(resources) - 1 else 1
+            logger.info(f"  round {round_no}: {len(survivors)} fits on {resource} samples in {fit_time:.1f}s, "
+                        f"best {scored[0][1]['id']} score {scored[0][0]:.4f}" if scored else
+                        f"  round {round_no}: every fit failed")
+            for candidate in survivors:
+                if candidate["id"] not in [c["id"] for _, c in scored[:keep]]:
+                    fitted.pop(candidate["id"], None)
+            survivors = [c for _, c in scored[:keep]]
+            if not survivors:
+                raise RuntimeError("Hyperparameter search: every candidate failed to fit")
+        
+        winner = survivors[0]
+        self.featurizer = winner["featurizer"]
+        self.backend = winner["backend"]
+        self.vectorizer = matrices[winner["_matrix"]][0]
+        self.model = fitted[winner["id"]]
+        
+        ranked = sorted(leaderboard.values(), key=lambda row: (
+            -len(row["rounds"]), -(row["rounds"][-1].get("score") or float('-inf'))))
+        for rank, row in enumerate(ranked, 1):
+            final = row["rounds"][-1]
+            row.update({"rank": rank, "final_samples": final["samples"], "final_score": final.get("score"),
+                        "final_macro_f1": final.get("macro_f1"), "final_latency_p50_ms": final.get("latency_p50_ms")})
+        
+        logger.info("\n🏆 Search leaderboard (top 10):")
+        logger.info(f"{'rank':>4} {'id':4} {'backend':20} {'featurizer':10} {'samples':>7} {'macroF1':>8} "
+                    f"{'p50 ms':>8} {'score':>8}")
+        for row in ranked[:10]:
+            f1 = f"{row['final_macro_f1']:8.4f}" if row['final_macro_f1'] is not None else f"{'-':>8}"
+            ms = f"{row['final_latency_p50_ms']:8.3f}" if row['final_latency_p50_ms'] is not None else f"{'-':>8}"
+            score = f"{row['final_score']:8.4f}" if row['final_score'] is not None else f"{'-':>8}"
+            logger.info(f"{row['rank']:4d} {row['id']:4} {row['backend']:20} {row['featurizer']:10} "
+                        f"{row['final_samples']:7d} {f1} {ms} {score}")
+        return leaderboard[winner["id"]], ranked
+
+    def compress(self, size: int = 2000, test_size: float = 0.2, max_f1_drop: float = None) -> Tuple[Dict, List[Dict]]:
+        """Smallest sub-forest or distilled student within max_f1_drop macro-F1 of the full forest
+
+        A validation split (training.val_split of the training data) is held back for selection. The
+        full forest is fit on the rest; pruning keeps, for each label, the fewest leading trees from
+        training.compression.tree_grid whose validation F1 is within max_f1_drop of that label's
+        full-forest F1. Students are small forests fit on the full forest's predictions for the fitting
+        rows. Every candidate is profiled (artifact size, load time, loaded heap, single-email latency);
+        the one with the fewest tree nodes within budget on validation is left on the trainer for
+        save_model, and the F1 drops reported are measured on the test split, which selection never saw.
+        """
+        if self.backend != "random_forest":
+            raise ValueError(f"Compression prunes random forests, not {self.backend}")
+        compression_config = self.parser.model_config["training"].get("compression", {})
+        max_f1_drop = max_f1_drop if max_f1_drop is not None else compression_config.get("max_f1_drop", 0.01)
+        tree_grid = compression_config.get("tree_grid", [5, 10, 20, 50, 100])
+        students = compression_config.get("students", [])
+        latency_samples = compression_config.get("latency_samples", 50)
+
+        texts, labels, label_names = self.prepare_training_data(size)
+        X = self.vectorize(texts)
+        X_train, X_test, y_train, y_test = train_test_split(X, labels, test_size=test_size, random_state=42)
+        val_size = self.parser.model_config["training"].get("val_split", 0.2)
+        X_fit, X_val, y_fit, y_val = train_test_split(X_train, y_train, test_size=val_size, random_state=42)
+        single_rows = [X_test[i] for i in range(min(latency_samples, X_test.shape[0]))]
+
+        logger.info(f"🗜️  Fitting the full forest on {X_fit.shape[0]} samples ({X_val.shape[0]} held for selection)...")
+        teacher = build_model(self.backend)
+        teacher.fit(X_fit, y_fit)
+        teacher_val_f1s = _label_f1s(y_val, teacher.predict(X_val))
+
+        trees_per_label = []
+        for i, forest in enumerate(teacher.estimators_):
+            n_trees = len(forest.estimators_)
+            keep = n_trees
+            # Labels without validation positives can't be scored, so they keep every tree
+            if teacher_val_f1s[i] is not None:
+                for k in sorted(k for k in tree_grid if k < n_trees):
+                    y_pred = _first_trees(forest, k).predict(X_val)
+                    if f1_score(y_val[:, i], y_pred, average='binary', zero_division=0) >= teacher_val_f1s[i] - max_f1_drop:
+                        keep = k
+                        break
+            trees_per_label.append(keep)
+
+        candidates = [("full", teacher, {}), ("pruned", prune_forest(teacher, trees_per_label),
+                                              {"trees_per_label": dict(zip(label_names, trees_per_label))})]
+        y_distill = teacher.predict(X_fit)
+        for params in students:
+            logger.info(f"🗜️  Distilling student {params}...")
+            student = build_model(self.backend, params)
+            student.fit(X_fit, y_distill)
+            candidates.append(("student", student, {"student_params": params}))
+
+        teacher_val_macro = _macro_f1(teacher_val_f1s)
+        teacher_macro = _macro_f1(_label_f1s(y_test, teacher.predict(X_test)))
+        rows, models = [], []
+        for kind, model, details in candidates:
+            val_drop = teacher_val_macro - _macro_f1(_label_f1s(y_val, model.predict(X_val)))
+            f1s = _label_f1s(y_test, model.predict(X_test))
+            n_trees, n_nodes = count_nodes(model)
+            row = {
+                "kind": kind,
+                **details,
+                "val_macro_f1_drop": round(val_drop, 4),
+                "selectable": val_drop <= max_f1_drop,
+                "macro_f1": round(_macro_f1(f1s), 4),
+                "macro_f1_drop": round(teacher_macro - _macro_f1(f1s), 4),
+                "within_budget": teacher_macro - _macro_f1(f1s) <= max_f1_drop,
+                "per_label_f1": {name: round(f1, 3) for name, f1 in zip(label_names, f1s) if f1 is not None},
+                "n_trees": n_trees,
+                "n_nodes": n_nodes,
+                **self._profile_model(model, single_rows)
+            }
+            rows.append(row)
+            models.append(model)
+
+        chosen = min((i for i, row in enumerate(rows) if row["selectable"]), key=lambda i: rows[i]["n_nodes"])
+        self.model = models[chosen]
+
+        logger.info(f"\n📊 Compression (max macro-F1 drop {max_f1_drop}; val drop selects, test F1 is held out):")
+        logger.info(f"{'candidate':10} {'trees':>6} {'nodes':>8} {'val drop':>8} {'macroF1':>8} {'F1 drop':>8} {'MB':>7} "
+                    f"{'load ms':>8} {'heap MB':>8} {'p50 ms':>8} {'flat ms':>8}")
+        for i, row in enumerate(rows):
+            logger.info(f"{row['kind']:10} {row['n_trees']:6d} {row['n_nodes']:8d} {row['val_macro_f1_drop']:+8.4f} "
+                        f"{row['macro_f1']:8.4f} {row['macro_f1_drop']:+8.4f} {row['artifact_mb']:7.2f} "
+                        f"{row['load_time_ms']:8.1f} {row['loaded_heap_mb']:8.2f} {row['single_email_p50_ms']:8.3f} "
+                        f"{row['flat_p50_ms']:8.3f}"
+                        f"{'  ✅ chosen' if i == chosen else '' if row['selectable'] else '  ❌ over budget'}"
+                        f"{'  ⚠️ over budget on test' if row['selectable'] and not row['within_budget'] else ''}")
+        return rows[chosen], rows
+
+    def _profile_model(self, model: MultiOutputClassifier, single_rows: List) -> Dict:
+        """Artifact size, load time, loaded heap and single-email predict + predict_proba latency"""
+        buffer = io.BytesIO()
+        joblib.dump(model, buffer)
+        artifact_bytes = buffer.tell()
+        buffer.seek(0)
+        start = time.perf_counter()
+        joblib.load(buffer)
+        load_time = time.perf_counter() - start
+
+        # Heap is traced on a second load so tracing overhead stays out of the load time
+        buffer.seek(0)
+        tracemalloc.start()
+        loaded = joblib.load(buffer)
+        loaded_bytes, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        single_ms, flat_ms = [], []
+        forest = FlatForest.from_model(loaded)
+        for row in single_rows:
+            start = time.perf_counter()
+            loaded.predict(row)
+            loaded.predict_proba(row)
+            single_ms.append((time.perf_counter() - start) * 1000)
+            start = time.perf_counter()
+            forest.predict_with_proba(row)
+            flat_ms.append((time.perf_counter() - start) * 1000)
+
+        return {
+            "artifact_mb": round(artifact_bytes / (1024 * 1024), 2),
+            "load_time_ms": round(load_time * 1000, 1),
+            "loaded_heap_mb": round(loaded_bytes / (1024 * 1024), 2),
+            "single_email_p50_ms": round(float(np.median(single_ms)), 3),
+            "flat_p50_ms": round(float(np.median(flat_ms)), 3)
+        }
+
+    def _log_comparison(self, rows: List[Dict], label_names: List[str]):
+        logger.info("\n📊 Backend comparison:")
+        logger.info(f"{'backend':20} {'macroF1':>8} {'p50 ms':>8} {'p99 ms':>8} {'batch/s':>10} {'MB':>7} {'load ms':>8}")
+        for row in rows:
+            logger.info(f"{row['backend']:20} {row['macro_f1']:8.3f} {row['single_email_p50_ms']:8.2f} "
+                        f"{row['single_email_p99_ms']:8.2f} {row['batch_throughput_per_sec']:10.1f} "
+                        f"{row['artifact_mb']:7.2f} {row['load_time_ms']:8.1f}")
+        logger.info("Per-label F1:")
+        logger.info(f"{'label':32} " + " ".join(f"{row['backend'][:12]:>12}" for row in rows))
+        for name in label_names:
+            logger.info(f"{name:32} " + " ".join(
+                f"{row['per_label_f1'][name]:12.3f}" if name in row['per_label_f1'] else f"{'-':>12}" for row in rows))
+    
     def analyze_feature_importance(self):
         """Analyze and log feature importance"""
         try:
@@ -203,35 +877,39 @@ class ProductionMLTrainer:
         except Exception as e:
             logger.warning(f"Feature importance analysis failed: {e}")
     
-    def save_model(self, model_path: str = "models/spacy_model"):
+    def save_model(self, model_path: str = "models/spacy_model", extra_metadata: Dict = None):
         """Save trained model and components"""
         os.makedirs(model_path, exist_ok=True)
         
         # Save model and vectorizer
         joblib.dump(self.model, f"{model_path}/model.joblib")
-        joblib.dump(self.vectorizer, f"{model_path}/vectorizer.joblib")
+        if self.featurizer == "hashing":
+            self.vectorizer.save(model_path)
+        else:
+            joblib.dump(self.vectorizer, f"{model_path}/vectorizer.joblib")
+            export_compact_vectorizer(model_path)
         
         # Save metadata
+        estimator_params = self.model.estimator.get_params(deep=False)
         metadata = {
-            "model_type": "RandomForest_MultiOutput_Production",
-            "vectorizer_type": "TfidfVectorizer_Enhanced",
+            "model_type": f"{type(self.model.estimator).__name__}_MultiOutput_Production",
+            "backend": self.backend,
+            "featurizer": self.featurizer,
+            "vectorizer_type": type(self.vectorizer).__name__,
             "features": "text + identifiers + spacy_entities + ngrams",
             "outputs": self.label_names,
             "training_size": self.parser.model_config["training"]["dataset_size"],
             "training_date": datetime.now().isoformat(),
             "model_version": "2.0_production",
             "vectorizer_params": {
-                "max_features": 8000,
-                "ngram_range": [1, 4],
-                "min_df": 2,
-                "max_df": 0.95
+                key: value for key, value in self.vectorizer.get_params().items()
+                if key in ("max_features", "n_features", "ngram_range", "min_df", "max_df", "sublinear_tf")
             },
             "model_params": {
-                "n_estimators": 200,
-                "max_depth": 15,
-                "min_samples_split": 5,
-                "min_samples_leaf": 2
-            }
+                key: value for key, value in estimator_params.items()
+                if isinstance(value, (int, float, str, bool)) or value is None
+            },
+            **(extra_metadata or {})
         }
         
         with open(f"{model_path}/metadata.json", "w") as f:
@@ -291,12 +969,97 @@ class ProductionMLTrainer:
 
 def main():
     """Main training function"""
-    logger.info("Starting production ML model training...")
+    arg_parser = argparse.ArgumentParser(description='Train the production ML fallback model')
+    arg_parser.add_argument('--size', type=int, help='Training samples (default training.dataset_size)')
+    arg_parser.add_argument('--corpus', help='Train on a seeded corpus file (build_corpora.py) instead of '
+                                             'freshly generated data')
+    arg_parser.add_argument('--no-cache', action='store_true', help='Recompute features and X from scratch')
+    arg_parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help='Feature cache directory')
+    arg_parser.add_argument('--backend', choices=MODEL_BACKENDS, help='Classifier (default ml_model.backend)')
+    arg_parser.add_argument('--compare', nargs='*', choices=MODEL_BACKENDS,
+                            help='Compare backends (default all) on one split instead of training')
+    arg_parser.add_argument('--featurizer', choices=FEATURIZER_TYPES, help='Text features (default ml_model.featurizer)')
+    arg_parser.add_argument('--compare-featurizers', action='store_true',
+                            help='Compare TF-IDF and hashing features (memory, load time, F1 delta) instead of training')
+    arg_parser.add_argument('--search', action='store_true',
+                            help='Successive-halving hyperparameter search (macro-F1 vs latency) instead of training')
+    arg_parser.add_argument('--candidates', type=int, help='Search candidates (default training.search.n_candidates)')
+    arg_parser.add_argument('--search-jobs', type=int, help='Parallel fits (default training.search.n_jobs)')
+    arg_parser.add_argument('--export-vectorizer', nargs='?', const='models/spacy_model', metavar='MODEL_DIR',
+                            help='Export MODEL_DIR/vectorizer.joblib as a memory-mapped trie vocabulary + IDF '
+                                 '(default models/spacy_model) and report the memory savings')
+    arg_parser.add_argument('--compress', action='store_true',
+                            help='Prune the forest / distill a student within an F1 budget instead of training')
+    arg_parser.add_argument('--max-f1-drop', type=float,
+                            help='Allowed macro-F1 drop for --compress (default training.compression.max_f1_drop)')
+    arg_parser.add_argument('--promote', action='store_true',
+                            help='Save the search or compression winner to models/spacy_model instead of '
+                                 'models/search_<timestamp> / models/compressed_<timestamp>')
+    args = arg_parser.parse_args()
+    
+    if args.export_vectorizer:
+        report = export_compact_vectorizer(args.export_vectorizer)
+        output = f"benchmarks/vectorizer_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        os.makedirs("benchmarks", exist_ok=True)
+        with open(output, "w") as f:
+            json.dump({"model_path": args.export_vectorizer, **report}, f, indent=2)
+        logger.info(f"Export report written to {output}")
+        return
+    
+    trainer = ProductionMLTrainer(use_cache=not args.no_cache, cache_dir=args.cache_dir, corpus_path=args.corpus,
+                                  backend=args.backend, featurizer=args.featurizer)
+    dataset_size = args.size or trainer.parser.model_config["training"]["dataset_size"]
+    
+    if args.compare is not None or args.compare_featurizers:
+        if args.compare_featurizers:
+            rows = trainer.compare_featurizers(size=dataset_size)
+            output = f"benchmarks/featurizer_comparison_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        else:
+            rows = trainer.compare_backends(size=dataset_size, backends=tuple(args.compare) or MODEL_BACKENDS)
+            output = f"benchmarks/backend_comparison_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        os.makedirs("benchmarks", exist_ok=True)
+        with open(output, "w") as f:
+            json.dump(rows, f, indent=2)
+        logger.info(f"Comparison written to {output}")
+        return
+    
+    if args.search:
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        winner, leaderboard = trainer.search(size=dataset_size, n_candidates=args.candidates, n_jobs=args.search_jobs)
+        model_path = "models/spacy_model" if args.promote else f"models/search_{timestamp}"
+        trainer.save_model(model_path, extra_metadata={"search": {
+            "candidate": winner["id"], "score": winner["final_score"], "macro_f1": winner["final_macro_f1"],
+            "latency_p50_ms": winner["final_latency_p50_ms"], "featurizer_params": winner["featurizer_params"],
+            "model_params": winner["model_params"]
+        }})
+        output = f"benchmarks/search_leaderboard_{timestamp}.json"
+        os.makedirs("benchmarks", exist_ok=True)
+        with open(output, "w") as f:
+            json.dump({"winner": winner["id"], "model_path": model_path, "leaderboard": leaderboard}, f,
+                      indent=2, default=str)
+        logger.info(f"🏆 Winner {winner['id']} ({winner['backend']} + {winner['featurizer']}) saved to {model_path}; "
+                    f"leaderboard written to {output}")
+        return
+    
+    if args.compress:
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        chosen, candidates = trainer.compress(size=dataset_size, max_f1_drop=args.max_f1_drop)
+        model_path = "models/spacy_model" if args.promote else f"models/compressed_{timestamp}"
+        trainer.save_model(model_path, extra_metadata={"compression": {
+            key: value for key, value in chosen.items() if key not in ("per_label_f1", "selectable", "within_budget")
+        }})
+        output = f"benchmarks/compression_{timestamp}.json"
+        os.makedirs("benchmarks", exist_ok=True)
+        with open(output, "w") as f:
+            json.dump({"chosen": chosen["kind"], "model_path": model_path, "candidates": candidates}, f,
+                      indent=2, default=str)
+        logger.info(f"🗜️  Compressed {chosen['kind']} model ({chosen['n_nodes']} nodes, {chosen['artifact_mb']} MB) "
+                    f"saved to {model_path}; candidates written to {output}")
+        return
     
-    trainer = ProductionMLTrainer()
+    logger.info(f"Starting production ML model training ({trainer.backend})...")
     
     # Train model with larger dataset
-    dataset_size = trainer.parser.model_config["training"]["dataset_size"]
     accuracy, results = trainer.train_model(size=dataset_size)
     
     # Save model